@@ -0,0 +1 @@
+# 效能量測腳本，從 backend 目錄以 `python -m benchmarks.<name>` 執行
@@ -0,0 +1,157 @@
+"""
+比較檢定結果轉成 JSON 內容與報表段落（serialize 階段）的時間與記憶體配置：
+
+- legacy：每個表格 pd.DataFrame(result).fillna("") 後再 to_dict(orient="records")（舊流程）
+- typed：轉成 ResultTable / SectionResult（新流程中由檢定的 run 完成），同一份欄式資料輸出成 JSON 與報表
+
+兩者的輸入都是檢定函式回傳的 dict-of-lists，typed 的時間包含建立 ResultTable。
+
+寫出 .json / .xlsx 的程式兩者共用，不列入量測。除了每個檢定的一般結果外，
+也量測批次模式（--measures 個分數欄位 / 欄位配對）這種大表格。
+
+    python -m benchmarks.bench_alloc --rows 2000 --measures 500 --repeat 20
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from stat_code import REGISTRY
+from stat_code.resultTable import ResultTable, SectionResult
+from costomTools.jobs import anova_sections
+from costomTools.reportWriter import section
+from .datasets import anova_frame, dataset, ttest_frame
+from .report import save_results
+
+
+def legacy_serialize(test, result):
+    """舊流程：每個表格先轉成 DataFrame 再轉回 records"""
+    def records(table):
+        df = pd.DataFrame(table).fillna("")
+        return {"columns": list(df.columns), "data": df.to_dict(orient="records")}
+
+    if "pretest" not in result:
+        return records(result), [section(None, result)]
+
+    sections = [{"title": f"{test.display_name}前測結果", **records(result["pretest"])}]
+    report = [section(None, result["pretest"])]
+    for title, table in result.get("tables", ()):
+        sections.append({"title": title, **records(table)})
+        report.append(section(title, table))
+    if result["post"]:
+        sections.append({"title": "事後比較", **records(result["posttest"])})
+        report.append(section("Post-hoc comparisons", result["posttest"]))
+    return {"sections": sections}, report
+
+
+def typed_serialize(test, result):
+    if "pretest" not in result:
+        table = ResultTable(result)
+        return table.to_json(), [section(None, table)]
+    sections, report = anova_sections(test, SectionResult.of(result))
+    return {"sections": sections}, report
+
+
+def raw(result):
+    """ResultTable / SectionResult -> 檢定函式原本回傳的 dict-of-lists"""
+    if isinstance(result, ResultTable):
+        return {column: list(values) for column, values in result.items()}
+    raw_result = {"post": result.post, "pretest": raw(result.pretest)}
+    if result.tables:
+        raw_result["tables"] = [(title, raw(table)) for title, table in result.tables]
+    if result.post:
+        raw_result["posttest"] = raw(result.posttest)
+    return raw_result
+
+
+def serialize(fn, test, result):
+    payload, report = fn(test, result)
+    for sec in report:  # 報表段落是 iterator，逐列讀完才算完整的輸出
+        for _ in sec["rows"]:
+            pass
+    return payload
+
+
+def measure(fn, repeat):
+    """回傳 (每次平均秒數, 記憶體峰值位元組)"""
+    fn()  # 先跑一次，排除 import 與快取
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    seconds = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak - baseline
+
+
+def cases(args):
+    """(名稱, 檢定, 結果)"""
+    for name in args.tests:
+        test = REGISTRY[name]
+        spec = REGISTRY.spec(name)
+        # 盡量找有事後比較的結果，表格較多
+        for seed in range(20):
+            result = test.run(dataset(spec, args.rows, args.groups, seed, "normal"))
+            if not isinstance(result, SectionResult) or result.post:
+                break
+        yield name, test, raw(result)
+
+    rng = np.random.default_rng(0)
+    df = anova_frame(args.rows, args.groups)
+    measures = pd.DataFrame(
+        rng.normal(50, 5, size=(args.rows, args.measures)) + pd.factorize(df["group"])[0][:, None],
+        columns=[f"m{i}" for i in range(args.measures)],
+    )
+    test = REGISTRY["anova"]
+    yield f"anova batch x{args.measures}", test, raw(test.run_batch(pd.concat([df[["group"]], measures], axis=1)))
+
+    base = ttest_frame(args.rows)
+    wide = pd.DataFrame({
+        f"c{i}": base["A" if i % 2 == 0 else "B"].to_numpy() + rng.normal(0, 1, args.rows)
+        for i in range(args.measures * 2)
+    })
+    test = REGISTRY["independentTtest"]
+    yield f"independentTtest batch x{args.measures}", test, raw(test.run_batch(wide))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tests", nargs="+", default=list(REGISTRY))
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--measures", type=int, default=500, help="批次模式的分數欄位 / 配對數")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="把結果另存成 JSON")
+    args = parser.parse_args()
+
+    results = []
+    for name, test, result in cases(args):
+        if serialize(legacy_serialize, test, result) != serialize(typed_serialize, test, result):
+            raise AssertionError(f"{name}: legacy 與 typed 的 JSON 內容不同")
+
+        row = {"case": name}
+        for mode, fn in (("legacy", legacy_serialize), ("typed", typed_serialize)):
+            seconds, peak = measure(lambda: serialize(fn, test, result), args.repeat)
+            row[f"{mode}_ms"] = seconds * 1000
+            row[f"{mode}_peak_kb"] = peak / 1024
+        results.append(row)
+        print(
+            f"{name:<30} legacy {row['legacy_ms']:8.2f} ms {row['legacy_peak_kb']:9.1f} KB   "
+            f"typed {row['typed_ms']:8.2f} ms {row['typed_peak_kb']:9.1f} KB   "
+            f"x{row['legacy_ms'] / row['typed_ms']:.1f}"
+        )
+
+    if args.output:
+        save_results(args.output, "alloc", results, **vars(args))
+
+
+if __name__ == "__main__":
+    main()
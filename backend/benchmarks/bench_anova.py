@@ -0,0 +1,95 @@
+"""
+比較 GroupStats 與舊流程（逐組布林遮罩 + pingouin）的 ANOVA 計算時間。
+
+    python -m benchmarks.bench_anova --rows 10000 100000 1000000 --groups 500
+
+舊流程的事後比較每組配對都要一次 studentized range 積分（約 10 ms），
+500 組就有 124,750 組配對，因此超過 --legacy-max-pairs 時只量到 omnibus 為止。
+"""
+import argparse
+import json
+import time
+import warnings
+
+import numpy as np
+import scipy.stats as st
+
+from stat_code.groupStats import GroupStats
+from .datasets import anova_frame
+
+
+def legacy_anova(data, max_pairs):
+    # user-006 之前 anova() 的計算步驟
+    groups = data["group"].unique()
+    for g in groups:
+        group_data = data.loc[data["group"] == g, "score"].dropna()
+        len(group_data), np.mean(group_data)
+    dataList = [data.loc[data["group"] == g, "score"].dropna().values for g in groups]
+    use_welch = any(st.shapiro(c).pvalue < 0.05 for c in dataList)
+
+    import pingouin as pg
+
+    if use_welch:
+        pg.welch_anova(data=data, dv="score", between="group")
+        posthoc = pg.pairwise_gameshowell
+    else:
+        pg.anova(data=data, dv="score", between="group")
+        posthoc = pg.pairwise_tukey
+    if len(groups) * (len(groups) - 1) // 2 <= max_pairs:
+        posthoc(data=data, dv="score", between="group")
+        return True
+    return False
+
+
+def grouped_anova(data):
+    gs = GroupStats(data["group"], data["score"])
+    use_welch = np.any(gs.shapiro()[:, 0] < 0.05)
+    if use_welch:
+        gs.welch()
+        gs.games_howell()
+    else:
+        gs.oneway()
+        gs.tukey_hsd()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - start, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--groups", type=int, nargs="+", default=[10, 500])
+    parser.add_argument("--legacy-max-pairs", type=int, default=500)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--output", help="把結果另存成 JSON")
+    args = parser.parse_args()
+    # 大樣本時 shapiro 會一直提醒 N > 5000，量測時不需要
+    warnings.filterwarnings("ignore", message=".*N > 5000.*")
+
+    results = []
+    for groups in args.groups:
+        for rows in args.rows:
+            df = anova_frame(rows, groups)
+            new_s, _ = timed(grouped_anova, df)
+            row = {"rows": rows, "groups": groups, "group_stats_s": new_s}
+            line = f"{rows:>9} rows {groups:>4} groups  GroupStats {new_s:8.3f}s"
+
+            if not args.skip_legacy:
+                old_s, full = timed(legacy_anova, df, args.legacy_max_pairs)
+                row.update(legacy_s=old_s, legacy_includes_posthoc=full, speedup=old_s / new_s)
+                note = "" if full else " (omnibus only)"
+                line += f"  legacy {old_s:8.3f}s{note}  x{old_s / new_s:.1f}"
+
+            results.append(row)
+            print(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+比較兩種處理 N 個檔案的方式（例如助教批改整班作業）：
+
+- 逐一上傳：每個檔案一次 /upload，全部完成後再呼叫 /stat/download_zip（目前前端的做法）
+- 批次上傳：一次 /stat/{test_name}/batch，讀完串流後以 batch_id 下載 zip
+
+    python -m benchmarks.bench_batch --test anova --files 30 --rows 2000
+    python -m benchmarks.bench_batch --url http://127.0.0.1:8000 --files 50
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import httpx
+
+from stat_code import REGISTRY
+from .bench_http import free_port, start_server, upload_path
+from .datasets import DISTRIBUTIONS, dataset, default_format, encode
+from .report import save_results
+
+
+def sequential(url, spec, payloads, filename):
+    with httpx.Client(base_url=url, timeout=None) as client:
+        start = time.perf_counter()
+        task_ids = []
+        for content in payloads:
+            r = client.post(upload_path(spec), files={"file": (filename, content)})
+            r.raise_for_status()
+            task_ids.append(r.json()["task_id"])
+        archive = client.post("/stat/download_zip", json=task_ids)
+        return time.perf_counter() - start, len(task_ids), len(archive.content)
+
+
+def batched(url, spec, payloads, filename):
+    files = [("files", (f"{i}_{filename}", content)) for i, content in enumerate(payloads)]
+    with httpx.Client(base_url=url, timeout=None) as client:
+        start = time.perf_counter()
+        first = None
+        with client.stream("POST", f"/stat/{spec.name}/batch", files=files) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                event = json.loads(line)
+                if event["event"] == "result" and first is None:
+                    first = time.perf_counter() - start
+                if event["event"] == "end":
+                    end = event
+        archive = client.get(end["download_url"])
+        return time.perf_counter() - start, end["done"], len(archive.content), first
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="已啟動的服務；未指定時在本機另開 uvicorn")
+    parser.add_argument("--test", default="anova", choices=list(REGISTRY))
+    parser.add_argument("--files", type=int, default=30)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--distribution", default="normal", choices=DISTRIBUTIONS)
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet", "arrow"])
+    parser.add_argument("--output", help="把結果另存成 JSON")
+    args = parser.parse_args()
+
+    spec = REGISTRY.spec(args.test)
+    fmt = args.format or default_format(args.rows)
+    filename = f"data.{fmt}"
+
+    def payloads(offset):
+        # 兩種方式用不同的 seed，避免結果快取讓後跑的一方佔便宜
+        return [
+            encode(dataset(spec, args.rows, args.groups, offset + i, args.distribution), fmt)
+            for i in range(args.files)
+        ]
+
+    with tempfile.TemporaryDirectory() as result_dir:
+        server = None
+        url = args.url
+        if url is None:
+            server, url = start_server(free_port(), result_dir, 1)
+        try:
+            seq_seconds, seq_done, seq_bytes = sequential(url, spec, payloads(0), filename)
+            batch_seconds, batch_done, batch_bytes, first = batched(url, spec, payloads(args.files), filename)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    results = [
+        {"mode": "sequential", "seconds": seq_seconds, "files": seq_done, "zip_bytes": seq_bytes},
+        {"mode": "batch", "seconds": batch_seconds, "files": batch_done, "zip_bytes": batch_bytes,
+         "first_result": first},
+    ]
+    for res in results:
+        print(f"{res['mode']:<10}  {res['seconds']:8.2f} s  files={res['files']}  zip={res['zip_bytes']} bytes")
+    print(f"batch 第一個結果 {first:.2f} s，整體 x{seq_seconds / batch_seconds:.2f}")
+
+    if args.output:
+        save_results(args.output, "batch", results, **vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+量測 StatExecutor 在不同 worker 數下的同時請求吞吐量。
+
+    python -m benchmarks.bench_executor --rows 2000 --jobs 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from costomTools import StatExecutor
+from costomTools.jobs import run_stat_job
+from .datasets import anova_frame, to_xlsx_bytes
+
+
+async def _run_batch(executor, content, jobs, out_dir):
+    tasks = [
+        executor.submit(run_stat_job, "anova", content, os.path.join(out_dir, f"{i}.xlsx"))
+        for i in range(jobs)
+    ]
+    await asyncio.gather(*tasks)
+
+
+async def measure(workers, content, jobs):
+    executor = StatExecutor(max_workers=workers, max_queue=jobs).start()
+    with tempfile.TemporaryDirectory() as out_dir:
+        # 先暖機，讓每個子行程都載入過 pandas / pingouin
+        await _run_batch(executor, content, workers, out_dir)
+
+        start = time.perf_counter()
+        await _run_batch(executor, content, jobs, out_dir)
+        elapsed = time.perf_counter() - start
+    executor.shutdown()
+    return {"workers": workers, "jobs": jobs, "seconds": elapsed, "jobs_per_sec": jobs / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=32)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", help="把結果另存成 JSON")
+    args = parser.parse_args()
+
+    content = to_xlsx_bytes(anova_frame(args.rows, args.groups))
+
+    workers = 1
+    results = []
+    while workers <= args.max_workers:
+        res = asyncio.run(measure(workers, content, args.jobs))
+        results.append(res)
+        print(f"workers={res['workers']:>3}  {res['jobs_per_sec']:8.2f} jobs/s  ({res['seconds']:.2f}s)")
+        workers *= 2
+
+    base = results[0]["jobs_per_sec"]
+    for res in results:
+        res["speedup"] = res["jobs_per_sec"] / base
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+對 FastAPI app 做 HTTP 壓測，回報 p50 / p99 延遲與每秒請求數。
+
+未指定 --url 時會在本機另開一個 uvicorn（結果寫到暫存目錄）。
+
+    python -m benchmarks.bench_http --test anova --rows 1000 --concurrency 8 --requests 200
+    python -m benchmarks.bench_http --url http://127.0.0.1:8000 --test independentTtest --variants 1
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from stat_code import REGISTRY
+from .datasets import DISTRIBUTIONS, dataset, default_format, encode
+from .report import BACKEND_DIR, percentile, save_results
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, result_dir, workers, **env_overrides):
+    env = dict(os.environ, RESULT_DIR=result_dir, WEB_CONCURRENCY=str(workers), **env_overrides)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{url}/stat/cache", timeout=1)
+            return proc, url
+        except httpx.HTTPError:
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn 啟動失敗")
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn 啟動逾時")
+
+
+def upload_path(spec):
+    prefix = "anova" if spec.result_layout == "sections" else "ttest"
+    return f"/{prefix}/{spec.name}/upload"
+
+
+async def drive(url, path, payloads, filename, concurrency, total):
+    latencies, statuses = [], Counter()
+    counter = iter(range(total))
+
+    async def client_loop(client):
+        for i in counter:
+            files = {"file": (filename, payloads[i % len(payloads)])}
+            start = time.perf_counter()
+            try:
+                r = await client.post(path, files=files)
+                statuses[r.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, statuses, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="既有服務的網址；不指定則自動啟動 uvicorn")
+    parser.add_argument("--server-workers", type=int, default=1, help="自動啟動時的 uvicorn worker 數")
+    parser.add_argument("--test", default="anova", choices=list(REGISTRY))
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--distribution", default="normal", choices=DISTRIBUTIONS)
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet", "arrow"])
+    parser.add_argument("--variants", type=int,
+                        help="不同內容的檔案數，預設每個請求都不同；設為 1 可量測結果快取命中的情況")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--output", help="把結果另存成 JSON")
+    args = parser.parse_args()
+
+    spec = REGISTRY.spec(args.test)
+    fmt = args.format or default_format(args.rows)
+    payloads = [
+        encode(dataset(spec, args.rows, args.groups, seed, args.distribution), fmt)
+        for seed in range(args.variants or args.requests)
+    ]
+
+    server = None
+    with tempfile.TemporaryDirectory() as result_dir:
+        url = args.url
+        if url is None:
+            server, url = start_server(free_port(), result_dir, args.server_workers)
+        try:
+            results = []
+            for concurrency in args.concurrency:
+                latencies, statuses, elapsed = asyncio.run(drive(
+                    url, upload_path(spec), payloads, f"data.{fmt}", concurrency, args.requests,
+                ))
+                res = {
+                    "concurrency": concurrency,
+                    "requests": args.requests,
+                    "seconds": elapsed,
+                    "rps": args.requests / elapsed,
+                    "p50": percentile(latencies, 50),
+                    "p90": percentile(latencies, 90),
+                    "p99": percentile(latencies, 99),
+                    "status": {str(k): v for k, v in statuses.items()},
+                }
+                results.append(res)
+                print(
+                    f"concurrency={concurrency:>3}  {res['rps']:8.2f} req/s  "
+                    f"p50={res['p50'] * 1000:8.1f} ms  p99={res['p99'] * 1000:8.1f} ms  {dict(statuses)}"
+                )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    if args.output:
+        save_results(args.output, "http", results, **vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+比較各種上傳格式的解析時間。
+
+    python -m benchmarks.bench_readers --sizes 1000 10000 100000
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import time
+from tempfile import NamedTemporaryFile
+
+import pandas as pd
+
+from costomTools.readers import READERS, has_module
+from .datasets import anova_frame, encode
+
+
+def legacy_read(content):
+    # 舊流程：先寫暫存檔，再用 openpyxl 讀
+    with NamedTemporaryFile(delete=False, suffix="xlsx") as tmp:
+        shutil.copyfileobj(io.BytesIO(content), tmp)
+        tmp_path = tmp.name
+    try:
+        return pd.read_excel(tmp_path, engine="openpyxl")
+    finally:
+        os.remove(tmp_path)
+
+
+def best_of(fn, content, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(content)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="把結果另存成 JSON")
+    args = parser.parse_args()
+
+    cases = [
+        ("xlsx (tempfile + openpyxl)", "xlsx", legacy_read),
+        ("xlsx (openpyxl)", "xlsx", lambda c: pd.read_excel(io.BytesIO(c), engine="openpyxl")),
+        ("csv", "csv", READERS["csv"]),
+    ]
+    if has_module("python_calamine"):
+        cases.append(("xlsx (calamine)", "xlsx", lambda c: pd.read_excel(io.BytesIO(c), engine="calamine")))
+    if has_module("pyarrow"):
+        cases.append(("parquet", "parquet", READERS["parquet"]))
+        cases.append(("arrow", "arrow", READERS["arrow"]))
+
+    results = []
+    for rows in args.sizes:
+        df = anova_frame(rows, groups=10)
+        encoded = {}
+        for label, fmt, reader in cases:
+            if fmt not in encoded:
+                encoded[fmt] = encode(df, fmt)
+            seconds = best_of(reader, encoded[fmt], args.repeat)
+            results.append({
+                "rows": rows,
+                "reader": label,
+                "bytes": len(encoded[fmt]),
+                "seconds": seconds,
+            })
+            print(f"{rows:>9} rows  {label:<28} {len(encoded[fmt]):>11} B  {seconds * 1000:10.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+量測冷啟動時各模組的 import 時間（每次都在新的 Python 行程中量）。
+
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import time
+t = time.perf_counter()
+{code}
+print(time.perf_counter() - t)
+"""
+
+# (名稱, 要量測的程式碼)
+CASES = [
+    ("numpy", "import numpy"),
+    ("pandas", "import pandas"),
+    ("scipy.stats", "import scipy.stats"),
+    ("pingouin", "import pingouin"),
+    ("openpyxl", "import openpyxl"),
+    ("stat_code (metadata only)", "import stat_code"),
+    ("stat_code.batch", "import stat_code.batch"),
+    ("stat_code.groupStats", "import stat_code.groupStats"),
+    ("costomTools.jobs", "import costomTools.jobs"),
+    ("worker warm-up (all tests)", "from costomTools.jobs import warmup; warmup('all')"),
+    ("main", "import main"),
+]
+
+
+def time_import(code, repeat):
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(code=code)],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if out.returncode != 0:
+            return None
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main():
+    sys.path.insert(0, BACKEND_DIR)
+    from stat_code import REGISTRY
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="把結果另存成 JSON")
+    args = parser.parse_args()
+
+    cases = CASES + [
+        (spec.module, f"import {spec.module}")
+        for spec in (REGISTRY.spec(name) for name in REGISTRY)
+    ]
+
+    results = []
+    for name, code in cases:
+        seconds = time_import(code, args.repeat)
+        results.append({"module": name, "seconds": seconds})
+        if seconds is None:
+            print(f"{name:<32} (not installed)")
+        else:
+            print(f"{name:<32} {seconds * 1000:9.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
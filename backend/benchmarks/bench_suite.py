@@ -0,0 +1,104 @@
+"""
+對 REGISTRY 中每個檢定、各種資料量 / 組數 / 分佈，量測完整流程（解析 → 計算 → 寫檔）
+與各階段的時間。
+
+    python -m benchmarks.bench_suite --rows 10 1000 100000 --groups 2 10 1000 --output suite.json
+    STAT_MAX_ROWS=0 python -m benchmarks.bench_suite --tests anova --rows 10000000 --groups 1000 --distributions skewed
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import warnings
+
+from stat_code import REGISTRY
+from costomTools.jobs import run_stat_job
+from .datasets import DISTRIBUTIONS, dataset, default_format, encode
+from .report import save_results
+
+
+def cases(args):
+    for name in args.tests:
+        spec = REGISTRY.spec(name)
+        # 只有 ANOVA 類的資料有組數（條件 / 水準數）可調
+        groups = args.groups if spec.result_layout == "sections" else [2]
+        for rows in args.rows:
+            for g in groups:
+                if g > rows:
+                    continue
+                for distribution in args.distributions:
+                    yield spec, rows, g, distribution
+
+
+def measure(spec, content, fmt, repeat, out_dir):
+    totals, stages, result = [], {}, None
+    for i in range(repeat):
+        path = os.path.join(out_dir, f"{spec.name}_{i}.xlsx")
+        start = time.perf_counter()
+        result = run_stat_job(spec.name, content, path, f"data.{fmt}")
+        totals.append(time.perf_counter() - start)
+        for stage, seconds in result["timings"]["stages"].items():
+            stages.setdefault(stage, []).append(seconds)
+    return {
+        "seconds": statistics.median(totals),
+        "stages": {stage: statistics.median(v) for stage, v in stages.items()},
+        "counts": result["timings"]["counts"],
+        "method": first_method(result["payload"]),
+    }
+
+
+def first_method(payload):
+    # 紀錄實際走到哪個分支（t-test / 無母數 / Welch）
+    rows = payload["sections"][0]["data"] if "sections" in payload else payload["data"]
+    for row in rows:
+        if row.get("Method"):
+            return row["Method"]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tests", nargs="+", default=list(REGISTRY))
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 1_000, 100_000])
+    parser.add_argument("--groups", type=int, nargs="+", default=[2, 10, 1000])
+    parser.add_argument("--distributions", nargs="+", default=list(DISTRIBUTIONS), choices=DISTRIBUTIONS)
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet", "arrow"],
+                        help="上傳格式，預設小資料用 xlsx、大資料用 parquet")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="把結果另存成 JSON")
+    args = parser.parse_args()
+
+    # 先載入所有檢定，避免第一個 case 把 import 時間算進去
+    REGISTRY.load(args.tests)
+    warnings.filterwarnings("ignore")
+
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for spec, rows, groups, distribution in cases(args):
+            fmt = args.format or default_format(rows)
+            content = encode(dataset(spec, rows, groups, args.seed, distribution), fmt)
+            res = measure(spec, content, fmt, args.repeat, out_dir)
+            res.update({
+                "test": spec.name,
+                "rows": rows,
+                "groups": groups,
+                "distribution": distribution,
+                "format": fmt,
+                "input_bytes": len(content),
+            })
+            results.append(res)
+
+            stages = "  ".join(f"{k}={v * 1000:.1f}" for k, v in res["stages"].items())
+            print(
+                f"{spec.name:<18} {rows:>9} rows {groups:>5} groups {distribution:<8} "
+                f"{res['seconds'] * 1000:10.1f} ms  [{stages}]  {res['method']}"
+            )
+
+    if args.output:
+        save_results(args.output, "suite", results, **vars(args))
+
+
+if __name__ == "__main__":
+    main()
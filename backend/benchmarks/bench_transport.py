@@ -0,0 +1,89 @@
+"""
+比較上傳內容從 API 行程交給 StatExecutor 子行程的兩種方式：
+
+- pickle：bytes 直接當參數，經過序列化、pipe 傳送與反序列化（舊流程）
+- shared：複製到 shared memory 一次，子行程以名稱 attach 後讀取（STAT_SHARED_MIN_BYTES）
+
+工作本身只回傳長度，量到的是傳輸的往返時間；同時量測 event loop 被卡住的最長時間
+（pickle 在主行程的 thread 中進行，會持有 GIL）。
+
+    python -m benchmarks.bench_transport --sizes 1 10 50 200 --repeat 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from costomTools import StatExecutor
+from .report import save_results
+
+
+def content_size(content):
+    return len(content)
+
+
+async def _loop_lag(stop):
+    # 每 1 ms 醒來一次，記錄實際間隔中最長的一次
+    worst = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.001)
+        now = time.perf_counter()
+        worst = max(worst, now - last - 0.001)
+        last = now
+    return worst
+
+
+async def measure(executor, content, repeat):
+    await executor.submit(content_size, b"warmup")
+    seconds, lags = [], []
+    for _ in range(repeat):
+        stop = asyncio.Event()
+        lag = asyncio.create_task(_loop_lag(stop))
+        start = time.perf_counter()
+        assert await executor.submit(content_size, content) == len(content)
+        seconds.append(time.perf_counter() - start)
+        stop.set()
+        lags.append(await lag)
+    return statistics.median(seconds), max(lags)
+
+
+async def run(sizes, repeat):
+    pickled = StatExecutor(max_workers=1, shared_min_bytes=0).start()
+    shared = StatExecutor(max_workers=1, shared_min_bytes=1).start()
+    results = []
+    try:
+        for mb in sizes:
+            content = os.urandom(int(mb * 1024 * 1024))
+            row = {"mb": mb}
+            for mode, executor in (("pickle", pickled), ("shared", shared)):
+                seconds, lag = await measure(executor, content, repeat)
+                row[f"{mode}_ms"] = seconds * 1000
+                row[f"{mode}_loop_lag_ms"] = lag * 1000
+            results.append(row)
+            print(
+                f"{mb:>7g} MB   pickle {row['pickle_ms']:8.1f} ms (lag {row['pickle_loop_lag_ms']:6.1f})   "
+                f"shared {row['shared_ms']:8.1f} ms (lag {row['shared_loop_lag_ms']:6.1f})   "
+                f"x{row['pickle_ms'] / row['shared_ms']:.1f}"
+            )
+    finally:
+        pickled.shutdown()
+        shared.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.1, 1, 10, 50, 200], help="上傳內容大小（MB）")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="把結果另存成 JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.sizes, args.repeat))
+    if args.output:
+        save_results(args.output, "transport", results, **vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+多 worker 模式的壓測：依序以不同的 uvicorn worker 數啟動服務，用相同的負載量測每秒請求數，
+並確認所有 worker 中只有一個是過期清除的 leader、任一 worker 都查得到別的 worker 送出的工作。
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --test anova --rows 5000 --concurrency 16 --requests 200
+    python -m benchmarks.bench_workers --workers 1 2 4 --stat-workers 1   # 固定每個 worker 的 process pool 大小
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+import httpx
+
+from stat_code import REGISTRY
+from .bench_http import drive, free_port, start_server, upload_path
+from .datasets import DISTRIBUTIONS, dataset, default_format, encode
+from .report import percentile, save_results
+
+
+def leaders(url, probes=50):
+    """用新的連線多次查 /stat/expiry，回傳 {pid: 是否為 leader}（連線由 OS 分給不同 worker）"""
+    seen = {}
+    for _ in range(probes):
+        info = httpx.get(f"{url}/stat/expiry", timeout=10).json()
+        seen[info["pid"]] = info["leader"]
+    return seen
+
+
+def cross_worker_check(url, spec, content, filename, jobs=10, timeout=60):
+    """送出 jobs 個非同步工作，每次查詢都開新連線；回傳全部都能查到結果並下載的工作數"""
+    task_ids = []
+    for _ in range(jobs):
+        r = httpx.post(
+            f"{url}/stat/{spec.name}/submit", files={"file": (filename, content)}, timeout=timeout,
+        )
+        task_ids.append(r.json()["task_id"])
+
+    ok = 0
+    deadline = time.time() + timeout
+    for task_id in task_ids:
+        while time.time() < deadline:
+            status = httpx.get(f"{url}/stat/status/{task_id}", timeout=10)
+            if status.status_code == 200 and status.json()["status"] in ("done", "failed"):
+                break
+            time.sleep(0.2)
+        result = httpx.get(f"{url}/stat/result/{task_id}", timeout=10)
+        download = httpx.get(f"{url}/stat/download/{task_id}", timeout=10)
+        ok += result.status_code == 200 and download.status_code == 200
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--stat-workers", type=int,
+                        help="每個 uvicorn worker 的 process pool 大小；預設為 CPU 數 / worker 數")
+    parser.add_argument("--test", default="anova", choices=list(REGISTRY))
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--distribution", default="normal", choices=DISTRIBUTIONS)
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet", "arrow"])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--output", help="把結果另存成 JSON")
+    args = parser.parse_args()
+
+    spec = REGISTRY.spec(args.test)
+    fmt = args.format or default_format(args.rows)
+    filename = f"data.{fmt}"
+    # 每個請求內容都不同，避免結果快取命中
+    payloads = [
+        encode(dataset(spec, args.rows, args.groups, seed, args.distribution), fmt)
+        for seed in range(args.requests)
+    ]
+    env = {"STAT_WORKERS": str(args.stat_workers)} if args.stat_workers else {}
+
+    results = []
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as result_dir:
+            server, url = start_server(free_port(), result_dir, workers, **env)
+            try:
+                # 先跑一輪讓每個 worker 的 process pool 都啟動並載入檢定
+                asyncio.run(drive(url, upload_path(spec), payloads, filename, workers * 2, workers * 4))
+                latencies, statuses, elapsed = asyncio.run(drive(
+                    url, upload_path(spec), payloads, filename, args.concurrency, args.requests,
+                ))
+                pids = leaders(url)
+                consistent = cross_worker_check(url, spec, payloads[0], filename)
+            finally:
+                server.terminate()
+                server.wait()
+
+        res = {
+            "workers": workers,
+            # 只算成功的請求；佇列滿時的 503 很快就回應，算進去會高估吞吐量
+            "rps": statuses[200] / elapsed,
+            "p50": percentile(latencies, 50),
+            "p99": percentile(latencies, 99),
+            "status": {str(k): v for k, v in statuses.items()},
+            "workers_seen": len(pids),
+            "leaders": sum(pids.values()),
+            "cross_worker_ok": consistent,
+        }
+        res["speedup"] = res["rps"] / results[0]["rps"] if results else 1.0
+        results.append(res)
+        print(
+            f"workers={workers:>2}  {res['rps']:8.2f} req/s  x{res['speedup']:.2f}  "
+            f"p50={res['p50'] * 1000:8.1f} ms  p99={res['p99'] * 1000:8.1f} ms  "
+            f"leaders={res['leaders']}/{res['workers_seen']}  cross-worker ok={consistent}/10  "
+            f"{dict(statuses)}"
+        )
+
+    if args.output:
+        save_results(args.output, "workers", results, **vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from costomTools.readers import has_module
+
+# normal：常態、等變異，走 t-test / One-way ANOVA
+# unequal：常態但變異數不同，t 檢定的 Levene 不通過而改走無母數（ANOVA 只看常態性，仍為 One-way）
+# skewed：對數常態，常態性檢定不通過，走無母數 / Welch ANOVA
+DISTRIBUTIONS = ("normal", "unequal", "skewed")
+
+# xlsx 超過這個列數時寫出太慢（且上限約 100 萬列），改用 parquet / csv
+XLSX_MAX_ROWS = 100_000
+
+
+def _draw(rng, distribution, loc, size, spread=1.0):
+    if distribution == "skewed":
+        return loc + rng.lognormal(mean=1.0, sigma=1.0, size=size) * 5
+    if distribution == "unequal":
+        return rng.normal(loc=loc, scale=5 * spread, size=size)
+    return rng.normal(loc=loc, scale=5, size=size)
+
+
+def anova_frame(rows: int, groups: int = 3, seed: int = 42, distribution: str = "normal"):
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, groups, size=rows)
+    means = np.linspace(50, 60, groups)
+    spread = np.linspace(1, 4, groups)[codes]
+    return pd.DataFrame({
+        "group": np.array([f"G{i}" for i in range(groups)])[codes],
+        "score": _draw(rng, distribution, means[codes], rows, spread),
+    })
+
+
+def ttest_frame(rows: int, seed: int = 42, distribution: str = "normal"):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "A": _draw(rng, distribution, 50, rows),
+        "B": _draw(rng, distribution, 52, rows, spread=4),
+    })
+
+
+def repeated_frame(rows: int, conditions: int = 3, seed: int = 42, distribution: str = "normal"):
+    """長格式重複量數資料：rows // conditions 位受試者，每位在每個條件各一筆"""
+    rng = np.random.default_rng(seed)
+    subjects = max(rows // conditions, 3)
+    codes = np.tile(np.arange(conditions), subjects)
+    means = np.linspace(50, 55, conditions)
+    subject_effect = np.repeat(rng.normal(0, 5, size=subjects), conditions)
+    return pd.DataFrame({
+        "subject": np.repeat(np.arange(subjects), conditions),
+        "condition": np.array([f"T{i}" for i in range(conditions)])[codes],
+        "score": subject_effect + _draw(rng, distribution, means[codes], len(codes)),
+    })
+
+
+def two_way_frame(rows: int, levels: int = 3, seed: int = 42, distribution: str = "normal"):
+    """factor_a（2 個水準）× factor_b（levels 個水準）的隨機分派資料"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 2, size=rows)
+    b = rng.integers(0, levels, size=rows)
+    return pd.DataFrame({
+        "factor_a": np.array(["A1", "A2"])[a],
+        "factor_b": np.array([f"B{i}" for i in range(levels)])[b],
+        "score": _draw(rng, distribution, 50 + 3 * a + 2 * b + 2 * a * b, rows),
+    })
+
+
+# 依檢定的 required_columns 決定資料格式；沒有對應的（t 檢定）為兩欄分數
+FRAMES = {
+    ("group", "score"): anova_frame,
+    ("subject", "condition", "score"): repeated_frame,
+    ("factor_a", "factor_b", "score"): two_way_frame,
+}
+
+
+def dataset(spec, rows: int, groups: int = 3, seed: int = 42, distribution: str = "normal"):
+    """依檢定需要的欄位產生對應格式的資料；groups 為組別 / 條件 / 水準數"""
+    frame = FRAMES.get(tuple(spec.required_columns))
+    if frame is not None:
+        return frame(rows, groups, seed, distribution)
+    return ttest_frame(rows, seed, distribution)
+
+
+def default_format(rows: int):
+    if rows <= XLSX_MAX_ROWS:
+        return "xlsx"
+    return "parquet" if has_module("pyarrow") else "csv"
+
+
+def encode(df: pd.DataFrame, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "xlsx":
+        df.to_excel(buf, index=False)
+    elif fmt == "csv":
+        df.to_csv(buf, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(buf, index=False)
+    elif fmt == "arrow":
+        df.reset_index(drop=True).to_feather(buf)
+    return buf.getvalue()
+
+
+def to_xlsx_bytes(df: pd.DataFrame) -> bytes:
+    return encode(df, "xlsx")
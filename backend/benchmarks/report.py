@@ -0,0 +1,44 @@
+import json
+import os
+import platform
+import subprocess
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(values, q):
+    """線性內插的百分位數（q 為 0–100），values 為空時回傳 None"""
+    values = sorted(values)
+    if not values:
+        return None
+    pos = (len(values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def save_results(path, benchmark, results, **params):
+    """結果附上 commit 與執行環境，方便比較不同 commit 之間的差異"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "benchmark": benchmark,
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "params": params,
+            "results": results,
+        }, f, indent=2, ensure_ascii=False)
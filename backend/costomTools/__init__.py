@@ -1,2 +1,12 @@
 from .santize import sanitize_filename
-from .writeAnovaResult import write_anova_postTest
\ No newline at end of file
+from .executor import StatExecutor, ExecutorBusy, JobTimeout, WorkerCrashed
+
+# reportWriter 依賴 openpyxl，第一次使用時才 import（web 行程不需要）
+_LAZY = {"ReportWriter": "reportWriter", "write_report": "reportWriter"}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        from importlib import import_module
+        return getattr(import_module(f".{_LAZY[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from urllib.parse import quote
+
+from .tasks import DONE
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class DownloadInfo:
+    """下載一個結果檔需要的資料；結果檔寫完後不會再改變，到期前都可以重複使用"""
+
+    __slots__ = ("task_id", "path", "filename", "size", "mtime", "etag", "expires")
+
+    def __init__(self, task_id, path, filename, size, mtime, etag, expires):
+        self.task_id = task_id
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+        self.expires = expires
+
+    def headers(self):
+        """ETag / Last-Modified / Cache-Control（瀏覽器在結果到期前可直接用快取）"""
+        max_age = max(0, int(self.expires - time.time()))
+        return {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.mtime, usegmt=True),
+            "Cache-Control": f"private, max-age={max_age}",
+        }
+
+
+def file_etag(path):
+    """以結果檔內容的 hash 作為 strong ETag，任何 worker / replica 算出來都相同"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()}"'
+
+
+def not_modified(if_none_match, etag):
+    """If-None-Match 是否符合 etag（RFC 9110：weak 比較，* 符合任何結果）"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def content_disposition(filename):
+    # 與 FileResponse 相同：非 ASCII 檔名（中文檢定名稱）以 RFC 5987 的 filename* 表示
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+class DownloadCache:
+    """
+    task_id -> DownloadInfo 的 LRU。命中時不查索引、不 stat 也不讀檔，
+    第一次下載時才查索引並計算結果檔的 hash；到期或被過期清除刪掉的項目移除。
+    """
+
+    def __init__(self, store, max_entries=1024):
+        self.store = store
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, task_id):
+        """已完成且未過期的結果檔資訊，沒有時回傳 None"""
+        with self._lock:
+            info = self._entries.get(task_id)
+            if info is not None and info.expires <= time.time():
+                del self._entries[task_id]
+                info = None
+            if info is not None:
+                self._entries.move_to_end(task_id)
+                self.hits += 1
+                return info
+            self.misses += 1
+
+        info = self._load(task_id)
+        if info is not None:
+            with self._lock:
+                self._entries[task_id] = info
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return info
+
+    def _load(self, task_id):
+        row = self.store.get(task_id)
+        if row is None or row["status"] != DONE or row["expires"] <= time.time():
+            return None
+        path = self.store.path(task_id)
+        try:
+            stat = os.stat(path)
+            etag = file_etag(path)
+        except FileNotFoundError:
+            return None
+        return DownloadInfo(
+            task_id,
+            path,
+            f"{row['original_name']}_{row['test_display']}.xlsx",
+            stat.st_size,
+            stat.st_mtime,
+            etag,
+            row["expires"],
+        )
+
+    def discard(self, task_id):
+        with self._lock:
+            self._entries.pop(task_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
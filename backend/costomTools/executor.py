@@ -0,0 +1,205 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib import import_module
+
+from .sharedBuffer import SHARED_MIN_BYTES, release, run_shared, share_args
+
+
+class ExecutorBusy(Exception):
+    """排隊的工作已達上限，呼叫端應回 503 並附上 Retry-After"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"executor saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobTimeout(Exception):
+    """單一工作超過 timeout 秒數"""
+
+
+class WorkerCrashed(Exception):
+    """子行程異常結束（OOM kill、segfault），process pool 已重建；呼叫端應回 503"""
+
+    def __init__(self):
+        super().__init__("統計檢定的子行程異常結束，請稍後再試")
+
+
+def run_job(target, *args):
+    """
+    子行程：target 為 "模組:函式"，在子行程中才 import。
+    web 行程送出工作（或設定 initializer）時只需要字串，不必載入檢定相關模組
+    """
+    module, _, name = target.partition(":")
+    return getattr(import_module(module), name)(*args)
+
+
+class StatExecutor:
+    """
+    把統計檢定（解析 / 計算 / 寫檔）丟到 process pool 執行，避免卡住 event loop。
+
+    - max_workers: 子行程數量
+    - max_queue:   除了執行中的工作外，最多還能排隊幾個
+    - timeout:     單一工作最長等待秒數
+    - initializer: 每個子行程啟動時執行一次（例如預先載入檢定），可為 "模組:函式"
+    - shared_min_bytes: 大於此大小的 bytes 參數以 shared memory 傳給子行程，0 為一律 pickle
+
+    子行程異常結束使 pool 損壞時換上新的 pool；工作逾時仍在執行時也換上新的 pool，
+    舊 pool 不再接新工作，其餘工作結束後終止卡住的子行程。所有狀態只在 event loop 上修改
+    """
+
+    def __init__(self, max_workers=None, max_queue=None, timeout=None, start_method=None,
+                 initializer=None, initargs=(), shared_min_bytes=SHARED_MIN_BYTES):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = self.max_workers * 4 if max_queue is None else max_queue
+        self.timeout = timeout
+        self.start_method = start_method or "spawn"
+        self.initializer = initializer
+        self.initargs = initargs
+        self.shared_min_bytes = shared_min_bytes
+
+        self._pool = None
+        self._inflight = 0
+        self._avg_seconds = 1.0
+        # 尚未結束的工作 -> 所屬 pool；逾時放棄的工作；已換下的 pool -> 其子行程
+        self._jobs = {}
+        self._abandoned = set()
+        self._retiring = {}
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    @property
+    def inflight(self):
+        return self._inflight
+
+    def _new_pool(self):
+        initializer, initargs = self.initializer, self.initargs
+        if isinstance(initializer, str):
+            initializer, initargs = run_job, (initializer, *initargs)
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=initializer,
+            initargs=initargs,
+        )
+
+    def start(self):
+        if self._pool is None:
+            self._pool = self._new_pool()
+        return self
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+        for processes in self._retiring.values():
+            for process in processes:
+                process.terminate()
+        self._retiring.clear()
+
+    def _replace_pool(self):
+        """換上新的 pool；舊 pool 不再接新工作，已送出的工作照常完成"""
+        old, self._pool = self._pool, self._new_pool()
+        if old is None:
+            return
+        # shutdown 後 _processes 會被清空，先記下子行程
+        self._retiring[old] = list((getattr(old, "_processes", None) or {}).values())
+        old.shutdown(wait=False)
+        self._reap(old)
+
+    def _reap(self, pool):
+        """已換下的 pool 剩下的工作都已逾時放棄時，終止它的子行程，釋放被卡住的 CPU"""
+        if pool not in self._retiring:
+            return
+        remaining = [f for f, p in self._jobs.items() if p is pool]
+        if not remaining:
+            del self._retiring[pool]
+        elif all(f in self._abandoned for f in remaining):
+            for process in self._retiring.pop(pool):
+                process.terminate()
+
+    def retry_after(self):
+        # 以平均工作時間估計排隊消化所需秒數
+        waiting = max(self._inflight - self.max_workers + 1, 1)
+        return max(1, math.ceil(self._avg_seconds * waiting / self.max_workers))
+
+    def _release(self, started, pool, cf_future):
+        self._inflight -= 1
+        elapsed = time.perf_counter() - started
+        self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+        self._jobs.pop(cf_future, None)
+        self._abandoned.discard(cf_future)
+        if not cf_future.cancelled() and isinstance(cf_future.exception(), BrokenProcessPool):
+            if pool is self._pool:
+                self._replace_pool()
+        self._reap(pool)
+
+    def dispatch(self, fn, *args):
+        """
+        同步送出工作並回傳 concurrent Future；佇列已滿時直接丟 ExecutorBusy。
+        fn 可為函式或 "模組:函式"（由 run_job 在子行程中 import）
+        """
+        if isinstance(fn, str):
+            fn, args = run_job, (fn, *args)
+        if self._pool is None:
+            raise RuntimeError("StatExecutor 尚未啟動")
+        if self._inflight >= self.capacity:
+            raise ExecutorBusy(self.retry_after())
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        self._inflight += 1
+
+        # 上傳內容放進 shared memory，子行程直接讀取，不經過 pickle 與 pipe
+        args, blocks = share_args(args, self.shared_min_bytes)
+        pool = self._pool
+        try:
+            if blocks:
+                cf_future = pool.submit(run_shared, fn, *args)
+            else:
+                cf_future = pool.submit(fn, *args)
+        except BaseException as e:
+            self._inflight -= 1
+            release(blocks)
+            if isinstance(e, BrokenProcessPool):
+                self._replace_pool()
+                raise WorkerCrashed() from e
+            raise
+        self._jobs[cf_future] = pool
+
+        # 名額在子行程真正結束時才釋放，timeout 後仍在跑的工作也算在排隊數內；
+        # shared memory 也在此時刪除（包含子行程異常結束、工作被取消）
+        cf_future.add_done_callback(
+            lambda f: loop.call_soon_threadsafe(self._release, started, pool, f)
+        )
+        if blocks:
+            cf_future.add_done_callback(lambda _: release(blocks))
+        return cf_future
+
+    async def wait(self, cf_future, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(cf_future), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            if not cf_future.cancel():
+                # 已在子行程中執行，無法取消：換上新的 pool，舊 pool 的其他工作結束後終止這個子行程
+                self._abandoned.add(cf_future)
+                pool = self._jobs.get(cf_future)
+                if pool is self._pool:
+                    self._replace_pool()
+                elif pool is not None:
+                    self._reap(pool)
+            raise JobTimeout(f"job exceeded {timeout}s")
+        except BrokenProcessPool as e:
+            raise WorkerCrashed() from e
+
+    async def submit(self, fn, *args, timeout=None):
+        return await self.wait(self.dispatch(fn, *args), timeout=timeout)
@@ -0,0 +1,142 @@
+import heapq
+import threading
+import time
+
+from .tasks import QUEUED, RUNNING
+
+
+class ExpiryScheduler:
+    """
+    以 min-heap 記錄每個結果的到期時間，到期當下才刪除，不再定期掃描整個結果目錄。
+
+    - 結果寫入索引時呼叫 schedule() 登記到期時間
+    - 啟動時 load() 從 ResultStore 重建一次 heap（重啟前的結果也會準時清除）
+    - 每次醒來最多刪 max_per_tick 筆，其餘留到下一輪，避免一次卡住太久
+    - 刪除前會再查一次索引：已被刪除的略過，到期時間被延後的重新排程；
+      仍在 queued / running 的工作不刪，除非已建立超過 stale_after 秒（行程異常結束留下的索引）
+    - 多 worker / 多 replica 時只有 leader 會 start()；其他行程寫入的結果不會進到
+      leader 的 heap，因此設定 poll_interval 時每隔這麼久也向索引查一次已到期的結果
+    """
+
+    def __init__(self, store, max_per_tick=200, on_delete=None, poll_interval=None, stale_after=4 * 60 * 60):
+        self.store = store
+        self.max_per_tick = max_per_tick
+        self.on_delete = on_delete
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+
+        self._heap = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+        self.deleted = 0
+        self.bytes_reclaimed = 0
+        self.errors = 0
+
+    def schedule(self, task_id, deadline):
+        # 沒有在執行（非 leader）時不記錄，避免 heap 只增不減；由 leader 輪詢索引處理
+        if self._thread is None:
+            return
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, task_id))
+            # 新項目比目前等待的還早到期時才需要叫醒
+            if self._heap[0][1] == task_id:
+                self._cond.notify()
+
+    def load(self):
+        entries = [(row["expires"], row["task_id"]) for row in self.store.deadlines()]
+        with self._cond:
+            self._heap.extend(entries)
+            heapq.heapify(self._heap)
+            self._cond.notify()
+        return len(entries)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="expiry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _due(self):
+        """
+        等到最早的項目到期，回傳這一輪要處理的 (deadline, task_id)；
+        到了輪詢時間回傳空 list，停止時回傳 None
+        """
+        with self._cond:
+            while not self._stopped:
+                now = time.time()
+                if self._heap and self._heap[0][0] <= now:
+                    batch = []
+                    while self._heap and self._heap[0][0] <= now and len(batch) < self.max_per_tick:
+                        batch.append(heapq.heappop(self._heap))
+                    return batch
+                timeout = self._heap[0][0] - now if self._heap else None
+                if self.poll_interval is not None:
+                    timeout = self.poll_interval if timeout is None else min(timeout, self.poll_interval)
+                if not self._cond.wait(timeout) and self.poll_interval is not None:
+                    return []
+            return None
+
+    def _poll(self):
+        try:
+            rows = self.store.expired(time.time(), limit=self.max_per_tick)
+        except Exception as e:
+            self.errors += 1
+            print("[CLEANUP ERROR] poll", e)
+            return []
+        return [(row["expires"], row["task_id"]) for row in rows]
+
+    def _run(self):
+        while True:
+            batch = self._due()
+            if batch is None:
+                return
+            if not batch:
+                batch = self._poll()
+            for _, task_id in batch:
+                self._expire(task_id)
+
+    def _expire(self, task_id):
+        try:
+            row = self.store.get(task_id)
+            if row is None:
+                return  # 已由其他流程刪除
+            now = time.time()
+            if row["expires"] > now:
+                self.schedule(task_id, row["expires"])
+                return
+            if row["status"] in (QUEUED, RUNNING) and row["created"] + self.stale_after > now:
+                # 工作還沒結束；完成 / 失敗時會重新設定到期時間
+                self.schedule(task_id, row["created"] + self.stale_after)
+                return
+            freed = self.store.delete(task_id)
+            self.deleted += 1
+            self.bytes_reclaimed += freed
+            if self.on_delete is not None:
+                self.on_delete(task_id)
+            print(f"[CLEANUP] removed {task_id} ({freed} bytes)")
+        except Exception as e:
+            self.errors += 1
+            print("[CLEANUP ERROR]", task_id, e)
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._heap)
+            next_due = self._heap[0][0] if self._heap else None
+        return {
+            "pending": pending,
+            "next_due": next_due,
+            "deleted": self.deleted,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "errors": self.errors,
+        }
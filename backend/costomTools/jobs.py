@@ -0,0 +1,248 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from stat_code import REGISTRY
+from stat_code.assumptions import use_store
+from stat_code.options import parse_columns, parse_pairs
+from stat_code.resultTable import ResultTable, SectionResult
+from .readers import iter_chunks, read_sheets
+from .uploads import check_chunked_upload, check_upload
+from .metrics import StageTimer
+from .profiler import profile_job
+from .reportWriter import section, write_workbook
+from .resultCache import code_version
+from .resultStore import atomic_path
+
+# 這裡的函式都在 StatExecutor 的子行程中執行，參數與回傳值必須能被 pickle
+
+CODE_VERSION = code_version()
+# sheet=all 時最多同時分析幾個工作表
+SHEET_THREADS = int(os.environ.get("STAT_SHEET_THREADS", 4))
+# 前提檢定快取（stat_code/assumptions.py）在結果目錄中的檔名，空字串為只用各子行程記憶體中的 LRU
+ASSUMPTION_STORE = os.environ.get("STAT_ASSUMPTION_STORE", "assumptions.sqlite3")
+
+
+def warmup(names="all"):
+    """StatExecutor 的 initializer：預先 import 檢定模組，第一個工作不用等載入"""
+    if names == "all":
+        REGISTRY.load()
+    else:
+        REGISTRY.load([n.strip() for n in names.split(",") if n.strip() in REGISTRY])
+
+
+def read_input(test_name, content, filename, options, timer):
+    """
+    先讀表頭決定欄位，只解析檢定需要的欄位（分組欄為 category）。
+    回傳 {工作表名稱: DataFrame}，非 Excel 檔的 key 為 None
+    """
+    spec = REGISTRY.spec(test_name)
+    with timer.stage("read"):
+        columns = check_upload(spec, content, filename, options)
+        # 批次模式沒有指定欄位時讀進全部欄位，略過 ID、標籤之類的文字欄位
+        skip_text = bool(options.get("batch")) and not (options.get("pairs") or options.get("columns"))
+        frames = read_sheets(content, filename, columns, spec.group_columns, skip_text=skip_text)
+    timer.count("input_bytes", len(content))
+    for df in frames.values():
+        timer.count("rows", len(df))
+        timer.count("columns", len(df.columns))
+    return frames
+
+
+def run_ttest_job(test, df, options, timer):
+    """單一表格的檢定；回傳 (JSON 內容, 報表段落)，兩者都直接由同一個 ResultTable 產生"""
+    with timer.stage("run"):
+        if options.get("batch"):
+            result = test.run_batch(
+                df,
+                pairs=parse_pairs(options.get("pairs")),
+                correction=options.get("correction", "holm"),
+                columns=parse_columns(options.get("columns")),
+            )
+        else:
+            result = test.run(df, options.get("resampling"))
+
+    with timer.stage("serialize"):
+        table = ResultTable(result)
+        payload = table.to_json()
+    return payload, [section(None, table)]
+
+
+def run_anova_job(test, df, options, timer):
+    """前測 + 事後比較的檢定；回傳 (JSON 內容, 報表段落)"""
+    with timer.stage("run"):
+        result = test.run(df, options.get("resampling"))
+
+    with timer.stage("serialize"):
+        sections, report = anova_sections(test, result)
+    return {"sections": sections}, report
+
+
+def analyze(test, df, options, timer):
+    if test.result_layout == "sections" and not options.get("batch"):
+        return run_anova_job(test, df, options, timer)
+    return run_ttest_job(test, df, options, timer)
+
+
+def analyze_sheets(test, frames, options, timer):
+    """
+    逐一分析每個工作表，回傳 [(工作表名稱, JSON 內容, 報表段落)]，順序與活頁簿相同。
+    多個工作表時以 thread 平行執行（numpy / scipy 的運算會釋放 GIL）
+    """
+    def run(item):
+        name, df = item
+        try:
+            return (name, *analyze(test, df, options, timer))
+        except ValueError as e:
+            if name is None or not options.get("sheet"):
+                raise
+            raise ValueError(f"工作表「{name}」{e}") from e
+
+    if len(frames) == 1 or SHEET_THREADS <= 1:
+        return [run(item) for item in frames.items()]
+    with ThreadPoolExecutor(max_workers=min(SHEET_THREADS, len(frames))) as pool:
+        return list(pool.map(run, frames.items()))
+
+
+def anova_sections(test, result):
+    """SectionResult -> (JSON 段落, 報表段落)；舊的 dict 結果也接受"""
+    result = SectionResult.of(result)
+    sections = [{"title": f"{test.display_name}前測結果", **result.pretest.to_json()}]
+    report = [section(None, result.pretest)]
+
+    # 重複量數 / 二因子 ANOVA 另有變異數分析表、球形檢定等 (標題, 表格)
+    for title, table in result.tables:
+        sections.append({"title": title, **table.to_json()})
+        report.append(section(title, table))
+
+    if result.post:
+        sections.append({"title": "事後比較", **result.posttest.to_json()})
+        report.append(section("Post-hoc comparisons", result.posttest))
+
+    return sections, report
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def write_result_json(json_path, payload):
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, default=_json_default)
+
+
+def run_stat_job(test_name: str, content: bytes, result_path: str, filename: str = None, options: dict = None):
+    """
+    依檢定的 result_layout 輸出單一表格或多段落（ANOVA），批次模式一律是單一表格；
+    options["sheet"] 為 "all" 時 JSON 為 {"test", "sheets": [{"sheet", ...}]}。
+    結果同時寫成 {task_id}.xlsx 與 {task_id}.json；
+    timings 為各階段秒數與輸入 / 輸出大小，profile 為取樣 profiler 的輸出檔（未啟用時為 None）
+    """
+    return _job_result(_run_stat_job, test_name, content, result_path, filename, options)
+
+
+def run_chunked_job(test_name: str, path: str, result_path: str, filename: str = None, options: dict = None):
+    """
+    分塊模式：逐塊讀取磁碟上的 CSV / Parquet（path），只累加檢定的可合併統計量
+    （見 stat_code.summaries），記憶體與檔案大小無關。輸出格式與 run_stat_job 相同
+    """
+    return _job_result(_run_chunked_job, test_name, path, result_path, filename, options)
+
+
+def _job_result(job, test_name, source, result_path, filename, options):
+    if ASSUMPTION_STORE:
+        use_store(os.path.join(os.path.dirname(result_path) or ".", ASSUMPTION_STORE))
+    name = os.path.splitext(os.path.basename(result_path))[0]
+    started_at = time.time()
+    (payload, timer), profile = profile_job(
+        job, name, test_name, source, result_path, filename, options
+    )
+    return {
+        "payload": payload,
+        "size": timer.counts["output_bytes"],
+        "started_at": started_at,
+        "finished_at": time.time(),
+        "timings": timer.to_dict(),
+        "profile": profile,
+    }
+
+
+def _run_stat_job(test_name, content, result_path, filename, options):
+    test = REGISTRY[test_name]
+    options = options or {}
+    timer = StageTimer()
+
+    frames = read_input(test_name, content, filename, options, timer)
+    results = analyze_sheets(test, frames, options, timer)
+
+    # sheet=all 時每個輸入工作表在報表中各佔一個工作表，JSON 以 sheets 列出；其餘維持單一表格
+    if options.get("sheet") == "all":
+        payload = {
+            "test": test.display_name,
+            "sheets": [{"sheet": name, **result} for name, result, _ in results],
+        }
+        sheets = {name: report for name, _, report in results}
+    else:
+        (_, result, report), = results
+        payload = {"test": test.display_name, **result}
+        sheets = {"Sheet1": report}
+
+    write_results(test, test_name, payload, sheets, result_path, options, timer)
+    return payload, timer
+
+
+def _run_chunked_job(test_name, path, result_path, filename, options):
+    test = REGISTRY[test_name]
+    spec = REGISTRY.spec(test_name)
+    options = options or {}
+    timer = StageTimer()
+
+    with timer.stage("read"):
+        columns = check_chunked_upload(spec, path, filename, options)
+    summary = test.new_summary(columns, options.get("seed", 0))
+    timer.count("input_bytes", os.path.getsize(path))
+    timer.count("columns", len(columns))
+
+    # 讀取與累加交錯進行，合在 scan 階段計時
+    with timer.stage("scan"):
+        for df in iter_chunks(path, filename, columns, spec.group_columns):
+            summary.update(df)
+            timer.count("rows", len(df))
+
+    with timer.stage("run"):
+        result = test.run_summary(summary)
+
+    with timer.stage("serialize"):
+        if test.result_layout == "sections":
+            sections, report = anova_sections(test, result)
+            result = {"sections": sections}
+        else:
+            table = ResultTable(result)
+            result, report = table.to_json(), [section(None, table)]
+
+    payload = {"test": test.display_name, **result}
+    write_results(test, test_name, payload, {"Sheet1": report}, result_path, options, timer)
+    return payload, timer
+
+
+def write_results(test, test_name, payload, sheets, result_path, options, timer):
+    # 先寫暫存檔再改名；.json 最後出現，其他 worker 看到 .json 時 .xlsx 一定已經完整
+    with timer.stage("write_xlsx"), atomic_path(result_path) as tmp:
+        write_workbook(tmp, sheets, metadata={
+            "test": test.display_name,
+            "test_name": test_name,
+            "options": options,
+            "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "code_version": CODE_VERSION,
+        })
+
+    json_path = os.path.splitext(result_path)[0] + ".json"
+    with timer.stage("write_json"), atomic_path(json_path) as tmp:
+        write_result_json(tmp, payload)
+
+    timer.count("output_bytes", os.path.getsize(result_path) + os.path.getsize(json_path))
@@ -0,0 +1,69 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows：沒有 flock，視為只有一個行程
+    fcntl = None
+
+
+class LeaderLock:
+    """
+    以結果目錄中的 lock 檔選出唯一的 leader（多個 uvicorn worker / 共用 volume 的多個 replica）。
+
+    只有 leader 執行過期清除等會動到共用檔案的背景工作。lock 由 OS 持有，
+    leader 行程結束（含當機）時自動釋放，其他行程每 retry_interval 秒重試一次並接手。
+    flock 在本機檔案系統與 NFSv4 上都有效。
+    """
+
+    def __init__(self, path, retry_interval=30):
+        self.path = path
+        self.retry_interval = retry_interval
+        self.is_leader = False
+        self._fd = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def try_acquire(self):
+        if self.is_leader:
+            return True
+        if fcntl is None:
+            self.is_leader = True
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        self.is_leader = True
+        return True
+
+    def start(self, on_elected):
+        """在背景持續嘗試取得 lock，成為 leader 時呼叫一次 on_elected()"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self.try_acquire():
+                if self._stop.wait(self.retry_interval):
+                    return
+            on_elected()
+
+        self._thread = threading.Thread(target=run, name="leader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._fd is not None:
+            os.close(self._fd)  # 關閉即釋放 flock
+            self._fd = None
+        self.is_leader = False
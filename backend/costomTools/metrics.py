@@ -0,0 +1,145 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 秒數用的預設 bucket（與 prometheus_client 相同）
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# 列數、欄數、位元組等大小用 10 的次方
+SIZE_BUCKETS = tuple(10 ** i for i in range(10))
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Histogram:
+    """
+    Prometheus 文字格式的 histogram（不依賴 prometheus_client）。
+    每組 label 值各自累計 bucket 次數、總和與筆數。
+    """
+
+    def __init__(self, name, help, labelnames=(), buckets=TIME_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(c), s, n)) for k, (c, s, n) in self._series.items())
+        for key, (counts, total, count) in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                le = _format_labels({**labels, "le": _format_value(float(bound))})
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines)
+
+
+def gauge(name, help, value, **labels):
+    """把目前的數值輸出成 gauge，給 /metrics 即時組出 executor、快取等狀態"""
+    return "\n".join([
+        f"# HELP {name} {help}",
+        f"# TYPE {name} gauge",
+        f"{name}{_format_labels(labels)} {_format_value(value)}",
+    ])
+
+
+class StageTimer:
+    """
+    在子行程中記錄每個階段（解析、計算、序列化、寫檔…）的秒數與輸入 / 輸出大小，
+    以 dict 回傳給主行程，再由主行程寫入 histogram。
+    多個 thread 同時記錄時（多工作表平行分析）秒數會相加。
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def count(self, name, value):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def to_dict(self):
+        return {"stages": self.stages, "counts": self.counts}
+
+
+class JobMetrics:
+    """上傳端點用到的 histogram：每個檢定各階段秒數、輸入列 / 欄數、輸出大小、整體延遲"""
+
+    def __init__(self):
+        self.request_seconds = Histogram(
+            "stat_request_seconds", "Upload to result latency, including queueing",
+            ("test", "endpoint", "cache"),
+        )
+        self.stage_seconds = Histogram(
+            "stat_stage_seconds", "Seconds spent in each pipeline stage", ("test", "stage"),
+        )
+        self.sizes = {
+            name: Histogram(f"stat_{name}", help, ("test",), SIZE_BUCKETS)
+            for name, help in (
+                ("input_bytes", "Uploaded file size in bytes"),
+                ("rows", "Rows in the uploaded table"),
+                ("columns", "Columns in the uploaded table"),
+                ("output_bytes", "Size of the written xlsx + json results"),
+            )
+        }
+
+    def observe_job(self, test_name, timings: dict):
+        for stage, seconds in timings["stages"].items():
+            self.stage_seconds.observe(seconds, test=test_name, stage=stage)
+        for name, value in timings["counts"].items():
+            if name in self.sizes:
+                self.sizes[name].observe(value, test=test_name)
+
+    def observe_request(self, test_name, endpoint, seconds, cache="miss"):
+        self.request_seconds.observe(seconds, test=test_name, endpoint=endpoint, cache=cache)
+
+    def render(self):
+        histograms = [self.request_seconds, self.stage_seconds, *self.sizes.values()]
+        return "\n".join(h.render() for h in histograms)
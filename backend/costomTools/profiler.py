@@ -0,0 +1,73 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# 設定 STAT_PROFILE_DIR 才會啟用取樣；只有超過 STAT_PROFILE_THRESHOLD 秒的工作會寫檔
+PROFILE_DIR = os.environ.get("STAT_PROFILE_DIR")
+PROFILE_THRESHOLD = float(os.environ.get("STAT_PROFILE_THRESHOLD", 5))
+PROFILE_INTERVAL = float(os.environ.get("STAT_PROFILE_INTERVAL", 0.005))
+
+
+class SamplingProfiler:
+    """
+    以背景 thread 每 interval 秒抓一次目標 thread 的 call stack，
+    輸出 flamegraph.pl / speedscope 可讀的 folded 格式（"a;b;c 次數"）。
+
+    只讀 sys._current_frames()，不掛 sys.setprofile，對被量測的程式影響很小。
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+def profile_job(fn, name, *args, **kwargs):
+    """
+    未設定 STAT_PROFILE_DIR 時直接執行 fn；否則邊取樣邊執行，
+    執行時間超過門檻時把 folded stack 寫到 {PROFILE_DIR}/{name}.folded。
+    回傳 (fn 的結果, profile 檔路徑或 None)
+    """
+    if not PROFILE_DIR:
+        return fn(*args, **kwargs), None
+
+    start = time.perf_counter()
+    with SamplingProfiler() as profiler:
+        result = fn(*args, **kwargs)
+    if time.perf_counter() - start < PROFILE_THRESHOLD:
+        return result, None
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    return result, profiler.dump(os.path.join(PROFILE_DIR, f"{name}.folded"))
@@ -0,0 +1,420 @@
+import csv
+import importlib.util
+import io
+import os
+
+import pandas as pd
+
+from .uploads import UploadTooLarge
+
+# 檔案格式 -> 讀取函式，讀取函式一律吃 bytes（及選用的 columns / max_rows / dtypes）、回傳 DataFrame
+READERS = {}
+# 檔案格式 -> 只讀表頭的函式，回傳欄位名稱 list
+HEADERS = {}
+# 檔案格式 -> 分塊讀取函式（分塊模式用），吃磁碟上的路徑、逐塊 yield DataFrame
+CHUNK_READERS = {}
+
+# 單一上傳檔最多幾列（0 為不限制），超過時回 413
+MAX_ROWS = int(os.environ.get("STAT_MAX_ROWS", 5_000_000))
+# 分塊模式每塊讀幾列
+CHUNK_ROWS = int(os.environ.get("STAT_CHUNK_ROWS", 200_000))
+# 分數欄位的 dtype；設成 float32 可省一半記憶體，但只有約 7 位有效數字
+SCORE_DTYPE = os.environ.get("STAT_SCORE_DTYPE", "float64")
+
+
+# 依檔頭判斷格式（順序即優先順序）
+MAGIC = [
+    (b"PK\x03\x04", "xlsx"),
+    (b"\xd0\xcf\x11\xe0", "xlsx"),  # 舊版 .xls (OLE2)
+    (b"PAR1", "parquet"),
+    (b"ARROW1", "arrow"),
+    (b"\xff\xff\xff\xff", "arrow_stream"),
+]
+
+EXTENSIONS = {
+    ".xlsx": "xlsx",
+    ".xls": "xlsx",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+    ".arrows": "arrow_stream",
+    ".csv": "csv",
+    ".tsv": "csv",
+    ".txt": "csv",
+}
+
+
+def register_reader(fmt):
+    def decorator(fn):
+        READERS[fmt] = fn
+        return fn
+    return decorator
+
+
+def register_header(fmt):
+    def decorator(fn):
+        HEADERS[fmt] = fn
+        return fn
+    return decorator
+
+
+def register_chunk_reader(fmt):
+    def decorator(fn):
+        CHUNK_READERS[fmt] = fn
+        return fn
+    return decorator
+
+
+def has_module(name):
+    return importlib.util.find_spec(name) is not None
+
+
+def excel_engine():
+    """有安裝 python-calamine 時用 calamine（Rust 實作，比 openpyxl 快很多）"""
+    return "calamine" if has_module("python_calamine") else "openpyxl"
+
+
+def _require(module, fmt):
+    if not has_module(module):
+        raise ValueError(f"伺服器未安裝 {module}，無法讀取 {fmt} 檔案")
+
+
+def sniff_format(content: bytes, filename: str = None):
+    for magic, fmt in MAGIC:
+        if content.startswith(magic):
+            return fmt
+
+    ext = os.path.splitext(filename or "")[1].lower()
+    return EXTENSIONS.get(ext, "csv")
+
+
+def _usecols(columns):
+    # 以名稱比對；直接給 list 時數字欄名會被當成欄位位置
+    if columns is None:
+        return None
+    wanted = {str(c) for c in columns}
+    return lambda c: str(c) in wanted
+
+
+def _nrows(max_rows):
+    # 多讀一列，才知道是否超過上限
+    return max_rows + 1 if max_rows else None
+
+
+def _check_rows(n, max_rows):
+    if max_rows and n > max_rows:
+        raise UploadTooLarge(f"資料超過 {max_rows} 列的上限")
+
+
+@register_reader("xlsx")
+def read_xlsx(content: bytes, columns=None, max_rows=None, dtypes=None):
+    return pd.read_excel(
+        io.BytesIO(content),
+        engine=excel_engine(),
+        usecols=_usecols(columns),
+        nrows=_nrows(max_rows),
+        dtype=dtypes,
+    )
+
+
+@register_header("xlsx")
+def xlsx_header(content: bytes):
+    if not content.startswith(b"PK"):
+        return list(pd.read_excel(io.BytesIO(content), engine=excel_engine(), nrows=0).columns)
+
+    return next(iter(sheet_headers(content).values()))
+
+
+def _first_row(ws):
+    # openpyxl read-only 只解析第一列，不必載入整張工作表
+    row = next(ws.iter_rows(max_row=1, values_only=True), ())
+    return [f"Unnamed: {i}" if v is None else v for i, v in enumerate(row)]
+
+
+def select_sheets(names, sheet=None):
+    """sheet：None 為第一個工作表、"all" 為全部、數字為索引（從 0 開始），其餘視為工作表名稱"""
+    if sheet is None:
+        return names[:1]
+    if sheet == "all":
+        return list(names)
+    if sheet in names:
+        return [sheet]
+    if str(sheet).isdigit() and int(sheet) < len(names):
+        return [names[int(sheet)]]
+    raise ValueError(f"找不到工作表：{sheet}")
+
+
+def sheet_headers(content: bytes, filename: str = None, sheet=None):
+    """
+    {工作表名稱: 表頭}。非 Excel 檔視為只有一個工作表，名稱為 None。
+    """
+    fmt = sniff_format(content, filename)
+    if fmt != "xlsx":
+        if sheet not in (None, "all", "0"):
+            raise ValueError("只有 Excel 檔案可以指定工作表")
+        return {None: HEADERS[fmt](content)}
+
+    if not content.startswith(b"PK"):
+        xl = pd.ExcelFile(io.BytesIO(content), engine=excel_engine())
+        return {
+            name: list(xl.parse(name, nrows=0).columns)
+            for name in select_sheets(xl.sheet_names, sheet)
+        }
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        return {name: _first_row(wb[name]) for name in select_sheets(wb.sheetnames, sheet)}
+    finally:
+        wb.close()
+
+
+@register_reader("parquet")
+def read_parquet(content: bytes, columns=None, max_rows=None, dtypes=None):
+    _require("pyarrow", "Parquet")
+    import pyarrow.parquet as pq
+
+    # 列數記在 footer，不用讀資料就能先擋下
+    _check_rows(pq.ParquetFile(io.BytesIO(content)).metadata.num_rows, max_rows)
+    return pd.read_parquet(io.BytesIO(content), columns=None if columns is None else list(columns))
+
+
+def _schema_names(schema):
+    return [n for n in schema.names if not n.startswith("__index_level_")]
+
+
+@register_header("parquet")
+def parquet_header(content: bytes):
+    _require("pyarrow", "Parquet")
+    import pyarrow.parquet as pq
+
+    return _schema_names(pq.read_schema(io.BytesIO(content)))
+
+
+def _arrow_to_pandas(table, columns, max_rows):
+    _check_rows(table.num_rows, max_rows)
+    if columns is not None:
+        table = table.select(list(columns))
+    return table.to_pandas()
+
+
+@register_reader("arrow")
+def read_arrow(content: bytes, columns=None, max_rows=None, dtypes=None):
+    _require("pyarrow", "Arrow")
+    import pyarrow as pa
+
+    # IPC 檔直接對應到上傳內容的記憶體（zero-copy），read_all 不會複製資料
+    table = pa.ipc.open_file(pa.py_buffer(content)).read_all()
+    return _arrow_to_pandas(table, columns, max_rows)
+
+
+@register_header("arrow")
+def arrow_header(content: bytes):
+    _require("pyarrow", "Arrow")
+    import pyarrow as pa
+
+    return _schema_names(pa.ipc.open_file(pa.py_buffer(content)).schema)
+
+
+@register_reader("arrow_stream")
+def read_arrow_stream(content: bytes, columns=None, max_rows=None, dtypes=None):
+    _require("pyarrow", "Arrow")
+    import pyarrow as pa
+
+    table = pa.ipc.open_stream(pa.py_buffer(content)).read_all()
+    return _arrow_to_pandas(table, columns, max_rows)
+
+
+@register_header("arrow_stream")
+def arrow_stream_header(content: bytes):
+    _require("pyarrow", "Arrow")
+    import pyarrow as pa
+
+    return _schema_names(pa.ipc.open_stream(pa.py_buffer(content)).schema)
+
+
+def _decode_sample(content: bytes):
+    # Excel 另存的 CSV 常帶 BOM，台灣的 Windows 也常見 cp950（Big5）
+    for encoding in ("utf-8-sig", "cp950"):
+        try:
+            return encoding, content[:8192].decode(encoding)
+        except UnicodeDecodeError as e:
+            # 只在取樣的最後一個字被切斷時才放行
+            if e.start >= min(len(content), 8192) - 3:
+                return encoding, content[:e.start].decode(encoding)
+    raise ValueError("無法辨識 CSV 檔案的文字編碼")
+
+
+def _csv_dialect(content: bytes):
+    encoding, sample = _decode_sample(content)
+    try:
+        sep = csv.Sniffer().sniff(sample, delimiters=",\t;").delimiter
+    except csv.Error:
+        sep = ","
+    return sep, encoding
+
+
+@register_reader("csv")
+def read_csv(content: bytes, columns=None, max_rows=None, dtypes=None):
+    sep, encoding = _csv_dialect(content)
+    return pd.read_csv(
+        io.BytesIO(content),
+        sep=sep,
+        encoding=encoding,
+        usecols=_usecols(columns),
+        nrows=_nrows(max_rows),
+        dtype=dtypes,
+    )
+
+
+@register_header("csv")
+def csv_header(content: bytes):
+    sep, encoding = _csv_dialect(content)
+    return list(pd.read_csv(io.BytesIO(content), sep=sep, encoding=encoding, nrows=0).columns)
+
+
+def read_header(content: bytes, filename: str = None):
+    """只讀表頭（欄位名稱），用來在解析整份資料前先檢查欄位"""
+    return HEADERS[sniff_format(content, filename)](content)
+
+
+def read_upload(content: bytes, filename: str = None, columns=None, group_columns=(), max_rows=MAX_ROWS,
+                skip_text=False):
+    """
+    依檔頭 / 副檔名自動選擇讀取方式，直接從記憶體中的上傳內容解析。
+
+    columns 指定時只讀這些欄位；group_columns 讀成 category，其餘欄位轉成 SCORE_DTYPE
+    （空白為 NaN，無法轉成數字的值丟出 ValueError）。skip_text=True 時整欄都是文字的欄位
+    （如 ID、標籤）直接略過，用於沒有指定欄位的批次模式。超過 max_rows 列時丟出 UploadTooLarge。
+    """
+    dtypes = {c: "category" for c in group_columns} or None
+    df = READERS[sniff_format(content, filename)](
+        content, columns=columns, max_rows=max_rows, dtypes=dtypes
+    )
+    _check_rows(len(df), max_rows)
+    return _compact(df, columns, group_columns, skip_text)
+
+
+def _compact(df, columns, group_columns, skip_text=False):
+    if columns is None:
+        return df
+
+    text_columns = []
+    for col in df.columns:
+        if col in group_columns:
+            if df[col].dtype != "category":
+                df[col] = df[col].astype("category")
+            continue
+        scores = _to_scores(df[col], col, skip_text)
+        if scores is None:
+            text_columns.append(col)
+        else:
+            df[col] = scores.astype(SCORE_DTYPE, copy=False)
+    return df.drop(columns=text_columns) if text_columns else df
+
+
+def _to_scores(values, col, skip_text=False):
+    """
+    分數欄位轉成數字；空白儲存格為缺值，其他無法轉換的值（如 "12,5"）丟出 ValueError，不默默丟掉。
+    skip_text=True 且整欄有值的儲存格都不是數字時回傳 None（文字欄位）
+    """
+    scores = pd.to_numeric(values, errors="coerce")
+    # object 與 string（含 pyarrow reader 的 string[pyarrow]）欄位才可能有無法轉換的值
+    if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+        return scores
+    text = values.astype("string").str.strip()
+    filled = text.notna() & (text != "")
+    bad = scores.isna() & filled
+    if bad.any():
+        if skip_text and bad.sum() == filled.sum():
+            return None
+        examples = "、".join(f"「{v}」" for v in text[bad].unique()[:3])
+        raise ValueError(f"欄位「{col}」有 {int(bad.sum())} 個無法轉成數字的值，例如 {examples}")
+    return scores
+
+
+def read_sheets(content: bytes, filename: str = None, columns=None, group_columns=(), max_rows=MAX_ROWS,
+                skip_text=False):
+    """
+    讀取多個工作表，回傳 {工作表名稱: DataFrame}。
+
+    columns 為 {工作表名稱: 欄位}（見 sheet_headers / check_upload）；
+    活頁簿只開啟、解析一次，max_rows 為所有工作表合計的列數上限。
+    非 Excel 檔回傳 {None: DataFrame}。
+    """
+    if sniff_format(content, filename) != "xlsx":
+        return {None: read_upload(content, filename, columns[None], group_columns, max_rows, skip_text)}
+
+    dtypes = {c: "category" for c in group_columns} or None
+    frames, total = {}, 0
+    with pd.ExcelFile(io.BytesIO(content), engine=excel_engine()) as xl:
+        for name, cols in columns.items():
+            df = xl.parse(
+                name,
+                usecols=_usecols(cols),
+                nrows=max_rows - total + 1 if max_rows else None,
+                dtype=dtypes,
+            )
+            total += len(df)
+            _check_rows(total, max_rows)
+            frames[name] = _compact(df, cols, group_columns, skip_text)
+    return frames
+
+
+# ---- 分塊模式：上傳檔先存到磁碟，逐塊讀取，記憶體只與 chunk_rows 有關 ----
+
+def _path_head(path, size=8192):
+    with open(path, "rb") as f:
+        return f.read(size)
+
+
+def sniff_path_format(path, filename: str = None):
+    fmt = sniff_format(_path_head(path, 8), filename)
+    if fmt not in CHUNK_READERS:
+        raise ValueError("分塊模式只支援 CSV 與 Parquet 檔案")
+    return fmt
+
+
+def path_header(path, filename: str = None):
+    """磁碟上的檔案只讀表頭；CSV 只讀開頭，Parquet 只讀 footer 的 schema"""
+    fmt = sniff_path_format(path, filename)
+    if fmt == "parquet":
+        _require("pyarrow", "Parquet")
+        import pyarrow.parquet as pq
+
+        return _schema_names(pq.read_schema(path))
+
+    sep, encoding = _csv_dialect(_path_head(path))
+    return list(pd.read_csv(path, sep=sep, encoding=encoding, nrows=0).columns)
+
+
+@register_chunk_reader("csv")
+def csv_chunks(path, columns=None, chunk_rows=CHUNK_ROWS):
+    sep, encoding = _csv_dialect(_path_head(path))
+    with pd.read_csv(
+        path, sep=sep, encoding=encoding, usecols=_usecols(columns), chunksize=chunk_rows,
+    ) as reader:
+        yield from reader
+
+
+@register_chunk_reader("parquet")
+def parquet_chunks(path, columns=None, chunk_rows=CHUNK_ROWS):
+    _require("pyarrow", "Parquet")
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    columns = None if columns is None else list(columns)
+    for batch in pf.iter_batches(batch_size=chunk_rows, columns=columns):
+        yield batch.to_pandas()
+
+
+def iter_chunks(path, filename: str = None, columns=None, group_columns=(), chunk_rows=CHUNK_ROWS):
+    """
+    逐塊讀取 CSV / Parquet，每塊最多 chunk_rows 列，欄位處理與 read_upload 相同
+    （分組欄為 category，其餘轉成 SCORE_DTYPE）
+    """
+    reader = CHUNK_READERS[sniff_path_format(path, filename)]
+    for df in reader(path, columns, chunk_rows):
+        yield _compact(df, columns, group_columns)
@@ -0,0 +1,111 @@
+import math
+import os
+import shutil
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, Side
+from openpyxl.utils import get_column_letter
+
+# 設定 STAT_DEBUG_DIR 時，才會把每次寫出的結果另存一份到該目錄（除錯用）
+DEBUG_DIR = os.environ.get("STAT_DEBUG_DIR")
+
+TITLE_STYLE = "section_title"
+HEADER_STYLE = "section_header"
+BODY_STYLE = "section_body"
+
+
+def _named_styles():
+    thin = Side(style="thin")
+    center = Alignment(horizontal="center")
+    return [
+        NamedStyle(name=TITLE_STYLE, font=Font(bold=True), alignment=center),
+        NamedStyle(
+            name=HEADER_STYLE,
+            font=Font(bold=True),
+            alignment=center,
+            border=Border(left=thin, right=thin, top=thin, bottom=thin),
+        ),
+        NamedStyle(name=BODY_STYLE, alignment=center),
+    ]
+
+
+def section(title, table):
+    """把檢定結果（ResultTable 或 dict-of-lists）包成報表的一個段落，逐列讀取、不複製"""
+    rows = table.rows() if hasattr(table, "rows") else zip(*table.values())
+    return {"title": title, "columns": list(table.keys()), "rows": rows}
+
+
+def _clean(value):
+    # 與舊流程的 DataFrame.fillna("") 相同：None / NaN 寫成空白
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+class ReportWriter:
+    """
+    以 openpyxl write-only 模式一次寫完整份報表，不重讀、不重存。
+
+    每個工作表由多個段落組成：第一段從第 1 列開始、不加標題（與舊版相容），
+    之後每段空一列，再寫一列合併儲存格的標題、表頭與資料。
+    樣式物件只在建立 workbook 時註冊一次。
+    """
+
+    def __init__(self):
+        self.wb = Workbook(write_only=True)
+        for style in _named_styles():
+            self.wb.add_named_style(style)
+
+    def _cell(self, ws, value, style):
+        cell = WriteOnlyCell(ws, value=_clean(value))
+        cell.style = style
+        return cell
+
+    def add_sheet(self, name, sections):
+        ws = self.wb.create_sheet(title=name[:31])
+        row_no = 0
+        for i, sec in enumerate(sections):
+            columns = sec["columns"]
+            if i > 0:
+                ws.append([])
+                ws.append([self._cell(ws, sec["title"], TITLE_STYLE)])
+                row_no += 2
+                ws.merged_cells.add(f"A{row_no}:{get_column_letter(max(len(columns), 5))}{row_no}")
+
+            ws.append([self._cell(ws, c, HEADER_STYLE) for c in columns])
+            row_no += 1
+            for row in sec["rows"]:
+                ws.append([self._cell(ws, v, BODY_STYLE) for v in row])
+                row_no += 1
+        return ws
+
+    def add_metadata(self, metadata: dict):
+        ws = self.wb.create_sheet(title="metadata")
+        ws.append([self._cell(ws, "key", HEADER_STYLE), self._cell(ws, "value", HEADER_STYLE)])
+        for key, value in metadata.items():
+            ws.append([key, _clean(value) if not isinstance(value, (dict, list)) else str(value)])
+
+    def save(self, path):
+        self.wb.save(path)
+        if DEBUG_DIR:
+            os.makedirs(DEBUG_DIR, exist_ok=True)
+            shutil.copyfile(path, os.path.join(DEBUG_DIR, "full.xlsx"))
+
+
+def write_report(path, sections, metadata=None, sheet_name="Sheet1"):
+    write_workbook(path, {sheet_name: sections}, metadata)
+
+
+def write_workbook(path, sheets: dict, metadata=None):
+    """sheets 為 {工作表名稱: 段落 list}，依序各寫成一個工作表"""
+    writer = ReportWriter()
+    for name, sections in sheets.items():
+        writer.add_sheet(name, sections)
+    if metadata:
+        writer.add_metadata(metadata)
+    writer.save(path)
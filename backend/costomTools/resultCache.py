@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from .resultStore import atomic_path
+
+
+def code_version():
+    """以 stat_code / costomTools 原始碼計算版本，改程式後舊快取自動失效"""
+    version = os.environ.get("STAT_CODE_VERSION")
+    if version:
+        return version
+
+    root = Path(__file__).resolve().parent.parent
+    digest = hashlib.sha1()
+    for folder in ("stat_code", "costomTools"):
+        for file in sorted((root / folder).glob("*.py")):
+            digest.update(file.name.encode())
+            digest.update(file.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+class CacheEntry:
+    __slots__ = ("task_id", "payload", "size", "expires_at")
+
+    def __init__(self, task_id, payload, size, expires_at):
+        self.task_id = task_id
+        self.payload = payload
+        self.size = size
+        self.expires_at = expires_at
+
+
+class ResultCache:
+    """
+    以「上傳檔 hash + test_name + 檢定選項 + 程式版本」為 key 的結果快取（LRU）。
+
+    命中時回傳已存的 JSON，並把既有的結果檔 hard link 到新的 task_id，
+    不重新計算。結果檔本身由 ExpiryScheduler 依索引的到期時間清除，
+    過期或檔案已不存在的項目會一併從快取移除。
+    """
+
+    def __init__(self, result_dir, expire_seconds, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.result_dir = result_dir
+        self.expire_seconds = expire_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = code_version()
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, content: bytes, test_name: str, options: dict = None):
+        opts = json.dumps(options or {}, sort_keys=True, ensure_ascii=False)
+        return f"{hashlib.sha256(content).hexdigest()}:{test_name}:{opts}:{self.version}"
+
+    def _paths(self, task_id):
+        base = os.path.join(self.result_dir, task_id)
+        return f"{base}.xlsx", f"{base}.json"
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                entry.expires_at <= time.time()
+                or not os.path.exists(self._paths(entry.task_id)[0])
+            ):
+                self._drop(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, task_id, payload, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = CacheEntry(
+                task_id, payload, size, time.time() + self.expire_seconds
+            )
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def reuse(self, key, entry, task_id):
+        """
+        把快取項目的結果檔連結到新的 task_id，並讓快取指向最新的一份。
+        結果檔已被（其他 worker 的）過期清除刪掉時移除該項目並回傳 False，呼叫端當作未命中
+        """
+        linked = []
+        try:
+            for src, dst in zip(self._paths(entry.task_id), self._paths(task_id)):
+                try:
+                    os.link(src, dst)
+                except FileNotFoundError:
+                    raise
+                except OSError:
+                    with atomic_path(dst) as tmp:
+                        shutil.copyfile(src, tmp)
+                linked.append(dst)
+                # hard link 共用 mtime，更新後兩個 task 都重新計算過期時間
+                os.utime(dst)
+        except FileNotFoundError:
+            for dst in linked:
+                os.remove(dst)
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._drop(key)
+            return False
+
+        with self._lock:
+            entry.task_id = task_id
+            entry.expires_at = time.time() + self.expire_seconds
+        return True
+
+    def discard(self, task_id):
+        """結果檔被刪除時，移除指向它的快取項目"""
+        with self._lock:
+            for key in [k for k, v in self._entries.items() if v.task_id == task_id]:
+                self._drop(key)
+                self.evictions += 1
+
+    def expire(self):
+        """給 cleanup_worker 呼叫，移除已過期或結果檔已被刪除的項目"""
+        now = time.time()
+        with self._lock:
+            for key in [
+                k for k, v in self._entries.items()
+                if v.expires_at <= now or not os.path.exists(self._paths(v.task_id)[0])
+            ]:
+                self._drop(key)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,261 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# 每個 task 在結果目錄下可能產生的檔案
+RESULT_EXTENSIONS = (".xlsx", ".json")
+
+# scheme -> ResultStore 子類別
+STORES = {}
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    產生同目錄下的暫存檔路徑，區塊正常結束時以 os.replace 換成 path（同一檔案系統上為原子操作）。
+    其他 worker / replica 不會讀到寫到一半的結果；失敗時刪除暫存檔。
+    """
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.{os.getpid()}.{threading.get_ident()}.tmp{ext}"
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def register_store(scheme):
+    def decorator(cls):
+        STORES[scheme] = cls
+        return cls
+    return decorator
+
+
+class ResultStore(ABC):
+    """
+    結果檔（{task_id}.xlsx / .json）與其索引資料的存取介面。
+
+    索引記錄 task_id、原始檔名、檢定、大小、狀態、建立與到期時間，
+    下載、批次下載與過期清理都只查索引，不再逐一讀 .meta 或掃描整個目錄。
+    多個 worker / replica 共用同一個索引時，任何一個都能回報工作狀態與提供下載。
+    """
+
+    def __init__(self, result_dir):
+        self.result_dir = result_dir
+        os.makedirs(result_dir, exist_ok=True)
+
+    def path(self, task_id, ext=".xlsx"):
+        return os.path.join(self.result_dir, f"{task_id}{ext}")
+
+    @abstractmethod
+    def put(self, task_id, original_name, test_name, test_display, expires, size=0, status="done",
+            batch_id=None):
+        pass
+
+    @abstractmethod
+    def finish(self, task_id, size, expires):
+        """結果檔寫完：記錄大小、把狀態設為 done，到期時間由完成時起算"""
+        pass
+
+    @abstractmethod
+    def fail(self, task_id, error, expires):
+        """工作失敗：刪除結果檔但保留索引（狀態 failed 與錯誤訊息），到 expires 時再移除"""
+        pass
+
+    @abstractmethod
+    def get(self, task_id):
+        pass
+
+    @abstractmethod
+    def get_many(self, task_ids):
+        """一次查詢多筆，回傳 {task_id: row}"""
+        pass
+
+    @abstractmethod
+    def batch(self, batch_id):
+        """批次上傳中的所有結果，依建立時間排序"""
+        pass
+
+    @abstractmethod
+    def expired(self, now=None, limit=1000):
+        pass
+
+    @abstractmethod
+    def deadlines(self):
+        """所有結果的 (task_id, expires)，啟動時重建過期排程用"""
+        pass
+
+    @abstractmethod
+    def remove_index(self, task_id):
+        pass
+
+    def delete(self, task_id):
+        """刪除結果檔與索引，回傳釋放的位元組數"""
+        freed = 0
+        for ext in RESULT_EXTENSIONS:
+            path = self.path(task_id, ext)
+            try:
+                freed += os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.remove_index(task_id)
+        return freed
+
+
+@register_store("sqlite")
+class SQLiteResultStore(ResultStore):
+    """
+    預設的索引後端。資料庫放在結果目錄（可掛載共用 volume），
+    多個 backend replica 透過同一個檔案共用索引。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS results (
+        task_id       TEXT PRIMARY KEY,
+        original_name TEXT NOT NULL,
+        test_name     TEXT NOT NULL,
+        test_display  TEXT NOT NULL,
+        size          INTEGER NOT NULL DEFAULT 0,
+        created       REAL NOT NULL,
+        expires       REAL NOT NULL,
+        status        TEXT NOT NULL DEFAULT 'done',
+        error         TEXT,
+        batch_id      TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_results_expires ON results(expires);
+    """
+
+    # 舊版索引沒有的欄位，啟動時補上
+    MIGRATIONS = {
+        "status": "ALTER TABLE results ADD COLUMN status TEXT NOT NULL DEFAULT 'done'",
+        "error": "ALTER TABLE results ADD COLUMN error TEXT",
+        "batch_id": "ALTER TABLE results ADD COLUMN batch_id TEXT",
+    }
+    # 用到新欄位的索引，要在補完欄位後才建立
+    INDEXES = (
+        "CREATE INDEX IF NOT EXISTS idx_results_batch ON results(batch_id)",
+    )
+
+    # SQLite 舊版本一個查詢最多 999 個參數
+    BATCH_SIZE = 500
+
+    def __init__(self, result_dir, db_path=None, journal_mode=None):
+        super().__init__(result_dir)
+        self.db_path = db_path or os.path.join(result_dir, "index.sqlite3")
+        # NFS 之類的網路檔案系統不支援 WAL，可用 RESULT_STORE_JOURNAL=DELETE 關閉
+        self.journal_mode = journal_mode or os.environ.get("RESULT_STORE_JOURNAL", "WAL")
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(self.SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(results)")}
+            for column, sql in self.MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(sql)
+            for sql in self.INDEXES:
+                conn.execute(sql)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, task_id, original_name, test_name, test_display, expires, size=0, status="done",
+            batch_id=None):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(task_id, original_name, test_name, test_display, size, created, expires, status, batch_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (task_id, original_name, test_name, test_display, size, time.time(), expires, status,
+                 batch_id),
+            )
+
+    def finish(self, task_id, size, expires):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE results SET size = ?, status = 'done', expires = ? WHERE task_id = ?",
+                (size, expires, task_id),
+            )
+
+    def fail(self, task_id, error, expires):
+        for ext in RESULT_EXTENSIONS:
+            try:
+                os.remove(self.path(task_id, ext))
+            except FileNotFoundError:
+                pass
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE results SET size = 0, status = 'failed', error = ?, expires = ? WHERE task_id = ?",
+                (error, expires, task_id),
+            )
+
+    def get(self, task_id):
+        row = self._conn().execute(
+            "SELECT * FROM results WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get_many(self, task_ids):
+        task_ids = list(dict.fromkeys(task_ids))
+        rows = {}
+        for i in range(0, len(task_ids), self.BATCH_SIZE):
+            chunk = task_ids[i:i + self.BATCH_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self._conn().execute(
+                f"SELECT * FROM results WHERE task_id IN ({placeholders})", chunk
+            ):
+                rows[row["task_id"]] = dict(row)
+        return rows
+
+    def batch(self, batch_id):
+        return [
+            dict(row) for row in self._conn().execute(
+                "SELECT * FROM results WHERE batch_id = ? ORDER BY created", (batch_id,)
+            )
+        ]
+
+    def expired(self, now=None, limit=1000):
+        now = time.time() if now is None else now
+        return [
+            dict(row) for row in self._conn().execute(
+                "SELECT * FROM results WHERE expires <= ? ORDER BY expires LIMIT ?",
+                (now, limit),
+            )
+        ]
+
+    def deadlines(self):
+        return [
+            dict(row) for row in self._conn().execute(
+                "SELECT task_id, expires FROM results ORDER BY expires"
+            )
+        ]
+
+    def remove_index(self, task_id):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM results WHERE task_id = ?", (task_id,))
+
+
+def open_store(url, result_dir):
+    """
+    依 RESULT_STORE_URL 建立 ResultStore，路徑寫法同 SQLAlchemy：
+    sqlite:///results/index.sqlite3 為相對路徑、sqlite:////data/index.sqlite3 為絕對路徑，
+    只寫 sqlite:// 時放在 result_dir 底下
+    """
+    parsed = urlparse(url or "sqlite://")
+    if parsed.scheme not in STORES:
+        raise ValueError(f"不支援的 result store：{parsed.scheme}")
+    return STORES[parsed.scheme](result_dir, parsed.path[1:] or None)
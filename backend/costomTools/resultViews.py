@@ -0,0 +1,209 @@
+import gzip
+import importlib.util
+import io
+import json
+import re
+
+# 回應小於這個大小就不壓縮（壓縮反而較慢、省不了多少）
+GZIP_MIN_BYTES = 1024
+# 每頁最多幾列
+MAX_PAGE_SIZE = 10000
+
+FORMATS = ("records", "columns", "arrow")
+
+# filter 參數：「欄位:值」相等、「欄位<值」「欄位>值」數值比較
+FILTER_PATTERN = re.compile(r"^(.+?)([:<>])(.*)$")
+
+
+def parse_filters(filters):
+    """["is_diff:true", "p-value<0.05"] -> [(欄位, 運算子, 值)]；格式錯誤丟出 ValueError"""
+    parsed = []
+    for text in filters or ():
+        match = FILTER_PATTERN.match(text)
+        if match is None:
+            raise ValueError(f"無法解析的 filter：{text}（格式為 欄位:值、欄位<值 或 欄位>值）")
+        column, op, value = match.groups()
+        if op != ":" and _number(value) is None:
+            raise ValueError(f"filter {text} 的比較值必須是數字")
+        parsed.append((column, op, value))
+    return parsed
+
+
+def is_default(view):
+    """沒有任何分頁 / 排序 / 篩選 / 格式選項時，直接回傳原本的結果（與舊版相同）"""
+    return (
+        view["format"] == "records"
+        and view["table"] is None
+        and view["limit"] is None
+        and not view["offset"]
+        and view["sort"] is None
+        and not view["filters"]
+    )
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _matches(value, op, text):
+    if op == ":":
+        if isinstance(value, bool):
+            return text.lower() in ("true", "1") if value else text.lower() in ("false", "0")
+        number, target = _number(value), _number(text)
+        if number is not None and target is not None:
+            return number == target
+        return str(value) == text
+
+    number = _number(value)
+    if number is None:
+        return False
+    return number < float(text) if op == "<" else number > float(text)
+
+
+def _sort_key(value):
+    # 數字在前、文字（如 "< 0.05"）在後；空白另外放在最後
+    number = _number(value)
+    if number is not None:
+        return (0, number, "")
+    return (1, 0, str(value))
+
+
+def _blank(value):
+    return value is None or value == ""
+
+
+def select_rows(table, view):
+    """依 view 篩選、排序、分頁；回傳 (該頁的列, 篩選後總列數)"""
+    rows = table["data"]
+    for column, op, text in view["filters"]:
+        if column not in table["columns"]:
+            raise ValueError(f"找不到欄位：{column}")
+        rows = [r for r in rows if _matches(r.get(column), op, text)]
+
+    sort = view["sort"]
+    if sort is not None:
+        if sort not in table["columns"]:
+            raise ValueError(f"找不到欄位：{sort}")
+        blanks = [r for r in rows if _blank(r.get(sort))]
+        rows = sorted(
+            (r for r in rows if not _blank(r.get(sort))),
+            key=lambda r: _sort_key(r[sort]),
+            reverse=view["desc"],
+        ) + blanks
+
+    offset, limit = view["offset"], view["limit"]
+    end = None if limit is None else offset + limit
+    return rows[offset:end], len(rows)
+
+
+def shape_table(table, view):
+    """把一個 {"columns", "data"} 表格換成 view 指定的頁面與格式，其他欄位（title、sheet）保留"""
+    rows, total = select_rows(table, view)
+    columns = table["columns"]
+    shaped = {k: v for k, v in table.items() if k != "data"}
+    if view["format"] == "columns":
+        shaped["values"] = [[r.get(c, "") for r in rows] for c in columns]
+    else:
+        shaped["data"] = rows
+    shaped.update({"total": total, "offset": view["offset"], "limit": view["limit"]})
+    return shaped
+
+
+def map_tables(payload, fn):
+    """對結果中的每個表格套用 fn，結構（單一表格 / sections / sheets）不變"""
+    if "sheets" in payload:
+        return {**payload, "sheets": [map_tables(s, fn) for s in payload["sheets"]]}
+    if "sections" in payload:
+        return {**payload, "sections": [fn(s) for s in payload["sections"]]}
+    return fn(payload)
+
+
+def list_tables(payload):
+    """依序列出結果中的所有表格；多工作表時標題前加上工作表名稱"""
+    if "sheets" in payload:
+        tables = []
+        for sheet in payload["sheets"]:
+            for table in list_tables(sheet):
+                tables.append({**table, "title": f"{sheet['sheet']} / {table['title']}"})
+        return tables
+    if "sections" in payload:
+        return list(payload["sections"])
+    return [{"title": payload.get("test"), "columns": payload["columns"], "data": payload["data"]}]
+
+
+def shape_payload(payload, view):
+    """
+    依 view 回傳結果：table 未指定時每個表格各自分頁；
+    指定 table（list_tables 的索引）時只回傳該表格，另附 tables 標題清單。
+    """
+    if is_default(view):
+        return payload
+
+    if view["table"] is None and view["format"] != "arrow":
+        return map_tables(payload, lambda t: shape_table(t, view))
+
+    tables = list_tables(payload)
+    index = view["table"] or 0
+    if not 0 <= index < len(tables):
+        raise ValueError(f"table 必須介於 0 到 {len(tables) - 1}")
+    return {
+        "test": payload.get("test"),
+        "tables": [t["title"] for t in tables],
+        "table": index,
+        **shape_table(tables[index], view),
+    }
+
+
+def arrow_available():
+    # 只檢查是否有安裝，不 import pyarrow
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def to_arrow(shaped):
+    """把單一表格轉成 Arrow IPC stream；型別混雜的欄位（如 "< 0.05" 與數字）轉成字串"""
+    import pyarrow as pa
+
+    rows = shaped["data"]
+    arrays = []
+    for column in shaped["columns"]:
+        values = [None if _blank(r.get(column)) else r.get(column) for r in rows]
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(pa.array([None if v is None else str(v) for v in values], pa.string()))
+    table = pa.Table.from_arrays(arrays, names=[str(c) for c in shaped["columns"]])
+    metadata = {
+        "title": str(shaped.get("title") or ""),
+        "total": str(shaped["total"]),
+        "offset": str(shaped["offset"]),
+    }
+    table = table.replace_schema_metadata(metadata)
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _json_default(value):
+    if hasattr(value, "item"):  # numpy 純量
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def to_json(payload):
+    return json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+
+
+def maybe_gzip(body: bytes, accept_encoding: str):
+    """用戶端接受 gzip 且內容夠大時壓縮；回傳 (內容, 額外的 headers)"""
+    if len(body) < GZIP_MIN_BYTES or "gzip" not in (accept_encoding or ""):
+        return body, {}
+    return gzip.compress(body, compresslevel=5), {"Content-Encoding": "gzip"}
@@ -0,0 +1,78 @@
+import os
+from multiprocessing import shared_memory
+
+# StatExecutor 送工作時，大於此位元組數的 bytes 參數（上傳內容）改以 shared memory 交給子行程（0 為停用）
+SHARED_MIN_BYTES = int(os.environ.get("STAT_SHARED_MIN_BYTES", 1024 * 1024))
+
+
+class SharedBytes:
+    """shared memory 區塊的參照，只有名稱與長度；pickle 後只有幾十個位元組"""
+
+    __slots__ = ("name", "size")
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+
+def _create(size):
+    try:
+        shm = shared_memory.SharedMemory(create=True, size=size)
+    except OSError:
+        return None
+    # tmpfs 的空間是寫入時才配置，/dev/shm 不夠時寫入會觸發 SIGBUS 讓主行程當掉；先配置好，失敗就改用 pickle
+    if hasattr(os, "posix_fallocate") and hasattr(shm, "_fd"):
+        try:
+            os.posix_fallocate(shm._fd, 0, size)
+        except OSError:
+            release([shm])
+            return None
+    return shm
+
+
+def share_args(args, min_bytes=SHARED_MIN_BYTES):
+    """
+    主行程：args 中夠大的 bytes 複製到新建的 shared memory（只複製一次），換成 SharedBytes。
+    回傳 (新的 args, 建立的 SharedMemory list)；建立失敗時（例如 /dev/shm 空間不足）維持原本的 bytes。
+
+    區塊由主行程在工作結束後 release；主行程異常結束時由 multiprocessing 的 resource tracker 刪除
+    """
+    shared, blocks = [], []
+    for arg in args:
+        if min_bytes and isinstance(arg, bytes) and len(arg) >= min_bytes:
+            shm = _create(len(arg))
+            if shm is None:
+                shared.append(arg)
+                continue
+            shm.buf[:len(arg)] = arg
+            blocks.append(shm)
+            arg = SharedBytes(shm.name, len(arg))
+        shared.append(arg)
+    return tuple(shared), blocks
+
+
+def release(blocks):
+    for shm in blocks:
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def load(ref: SharedBytes):
+    """
+    子行程：把 shared memory 的內容讀成 bytes（一次 memcpy）。
+    比 pickle 少了序列化、經過 pipe 傳送與反序列化；讀取函式（pandas / openpyxl）本來就需要 bytes
+    """
+    shm = shared_memory.SharedMemory(name=ref.name)
+    try:
+        with shm.buf[:ref.size] as view:
+            return bytes(view)
+    finally:
+        shm.close()
+
+
+def run_shared(fn, *args):
+    """在子行程執行 fn，SharedBytes 參數先換回 bytes"""
+    return fn(*[load(a) if isinstance(a, SharedBytes) else a for a in args])
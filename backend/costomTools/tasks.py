@@ -0,0 +1,86 @@
+import threading
+import time
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class TaskInfo:
+    def __init__(self, task_id, test_name, future=None):
+        self.task_id = task_id
+        self.test_name = test_name
+        self.future = future
+        self.status = QUEUED
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def refresh(self):
+        # process pool 把工作交給子行程時 future 會變成 running
+        if self.status == QUEUED and self.future is not None and self.future.running():
+            self.status = RUNNING
+            self.started_at = time.time()
+
+    def to_dict(self):
+        self.refresh()
+        end = self.finished_at or time.time()
+        return {
+            "task_id": self.task_id,
+            "test": self.test_name,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_seconds": (self.started_at or end) - self.submitted_at,
+            "run_seconds": end - self.started_at if self.started_at else None,
+            "error": self.error,
+        }
+
+
+class TaskTracker:
+    """
+    記錄非同步工作的狀態（queued / running / done / failed）。
+    事件迴圈新增 / 更新，清理執行緒 prune，兩邊都經過 _lock
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def add(self, task_id, test_name, future):
+        info = TaskInfo(task_id, test_name, future)
+        with self._lock:
+            self._tasks[task_id] = info
+        return info
+
+    def get(self, task_id):
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def finish(self, task_id, started_at, finished_at):
+        with self._lock:
+            info = self._tasks[task_id]
+        info.status = DONE
+        info.started_at = started_at
+        info.finished_at = finished_at
+        info.future = None
+
+    def fail(self, task_id, error):
+        with self._lock:
+            info = self._tasks[task_id]
+        info.status = FAILED
+        info.error = error
+        info.finished_at = time.time()
+        info.future = None
+
+    def prune(self, max_age):
+        now = time.time()
+        with self._lock:
+            for task_id in [
+                k for k, v in self._tasks.items()
+                if v.finished_at and now - v.finished_at > max_age
+            ]:
+                del self._tasks[task_id]
@@ -0,0 +1,157 @@
+import os
+import time
+
+from stat_code.options import parse_columns, parse_pairs
+
+# 讀表頭要用到 pandas，readers 在 check_upload / check_chunked_upload 中才 import，web 行程啟動時不載入
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """上傳檔超過位元組或列數上限，對應 HTTP 413"""
+
+
+def too_large_message(max_bytes: int):
+    return f"檔案超過 {max_bytes / (1024 * 1024):.3g} MB 的上限"
+
+
+async def read_limited(file, max_bytes: int):
+    """分段讀取 UploadFile，超過 max_bytes 立刻停止並丟出 UploadTooLarge"""
+    if max_bytes and file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(too_large_message(max_bytes))
+
+    chunks, total = [], 0
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            return b"".join(chunks)
+        total += len(chunk)
+        if max_bytes and total > max_bytes:
+            raise UploadTooLarge(too_large_message(max_bytes))
+        chunks.append(chunk)
+
+
+async def spool_upload(file, path, max_bytes: int):
+    """
+    分塊模式：把 UploadFile 分段寫到磁碟上的 path，不整個讀進記憶體；
+    超過 max_bytes 時刪除已寫入的部分並丟出 UploadTooLarge
+    """
+    if max_bytes and file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(too_large_message(max_bytes))
+
+    total = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    return total
+                total += len(chunk)
+                if max_bytes and total > max_bytes:
+                    raise UploadTooLarge(too_large_message(max_bytes))
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+
+def sweep_spool(spool_dir, max_age):
+    """
+    刪除 spool_dir 中超過 max_age 秒沒有修改的暫存上傳檔（行程在工作途中被終止時留下的）；
+    max_age 需大於分塊工作的排隊 + 執行時間，以免刪到其他 worker 還在讀的檔案。回傳刪除的檔案數
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    with os.scandir(spool_dir) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                # 工作剛好結束、已被刪除
+                pass
+    return removed
+
+
+def select_columns(spec, header, options=None):
+    """
+    依檢定的 required_columns / min_columns / group_columns 與批次選項，
+    從表頭決定要讀哪些欄位；欄位不足時丟出 ValueError（對應 422）。
+    """
+    options = options or {}
+    names = {str(c): c for c in header}
+
+    if options.get("batch"):
+        pairs = parse_pairs(options.get("pairs"))
+        columns = parse_columns(options.get("columns"))
+        if pairs is not None:
+            wanted = list(spec.group_columns) + [c for pair in pairs for c in pair]
+        elif columns is not None:
+            wanted = list(spec.group_columns) + columns
+        else:
+            # 讀進全部欄位；ID、標籤之類整欄是文字的欄位在讀取時略過（見 readers._to_scores）
+            wanted = list(header)
+        required = list(spec.group_columns) + (wanted if pairs or columns else [])
+    elif spec.required_columns:
+        wanted = required = list(spec.required_columns)
+    else:
+        wanted, required = list(header[:spec.min_columns or None]), []
+
+    missing = [c for c in dict.fromkeys(required) if str(c) not in names]
+    if missing:
+        raise ValueError(f"找不到欄位：{', '.join(map(str, missing))}")
+    if len(header) < spec.min_columns:
+        raise ValueError(f"資料需要至少 {spec.min_columns} 個欄位才能進行{spec.display_name}")
+
+    return [names[str(c)] for c in dict.fromkeys(wanted)]
+
+
+def check_upload(spec, content: bytes, filename: str = None, options=None):
+    """
+    只讀表頭檢查欄位，回傳 {工作表名稱: 要讀的欄位}（非 Excel 檔的 key 為 None）；
+    檔案無法解析時一律轉成 ValueError。options["sheet"] 為 "all" 時略過空白工作表。
+    """
+    from .readers import sheet_headers
+
+    options = options or {}
+    if options.get("batch") and not spec.batch:
+        raise ValueError(f"{spec.display_name}不支援批次模式")
+    sheet = options.get("sheet")
+    try:
+        headers = sheet_headers(content, filename, sheet)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"無法讀取上傳檔案：{e}") from e
+
+    if sheet == "all":
+        headers = {name: header for name, header in headers.items() if header}
+        if not headers:
+            raise ValueError("檔案中沒有任何有資料的工作表")
+
+    columns = {}
+    for name, header in headers.items():
+        try:
+            columns[name] = select_columns(spec, header, options)
+        except ValueError as e:
+            if sheet is None:
+                raise
+            raise ValueError(f"工作表「{name}」{e}") from e
+    return columns
+
+
+def check_chunked_upload(spec, path, filename: str = None, options=None):
+    """分塊模式的 check_upload：只讀磁碟上檔案的表頭，回傳要讀的欄位"""
+    from .readers import path_header
+
+    if not spec.chunked:
+        raise ValueError(f"{spec.display_name}不支援分塊模式")
+    try:
+        header = path_header(path, filename)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"無法讀取上傳檔案：{e}") from e
+    return select_columns(spec, header, options)
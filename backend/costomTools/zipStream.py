@@ -0,0 +1,95 @@
+import os
+import struct
+import time
+import zlib
+
+CHUNK_SIZE = 64 * 1024
+
+# xlsx 本身就是壓縮過的 zip，再壓一次只會浪費 CPU，因此一律以 STORED 放入
+_STORED = 0
+_UTF8_FLAG = 0x0800
+_VERSION = 20
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(timestamp)
+    year = max(t.tm_year, 1980)
+    dos_date = (year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+    dos_time = t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+    return dos_time, dos_date
+
+
+def _crc32(f):
+    crc = 0
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            return crc
+        crc = zlib.crc32(chunk, crc)
+
+
+def unique_arcname(name, used: set):
+    """同名檔案加上 _2、_3… 避免 zip 內檔名重複"""
+    base, ext = os.path.splitext(name)
+    candidate, i = name, 2
+    while candidate in used:
+        candidate = f"{base}_{i}{ext}"
+        i += 1
+    used.add(candidate)
+    return candidate
+
+
+def iter_zip(entries):
+    """
+    邊讀邊產生 zip 內容（generator），不寫暫存檔，記憶體用量固定。
+
+    entries 為 (檔案路徑, zip 內檔名) 的 iterable；不存在的檔案會略過。
+    每個檔案先讀一次算 CRC，再從同一個 file handle 串流輸出，
+    因此 local header 已帶正確大小，不需要 data descriptor。
+    """
+    central = []
+    offset = 0
+
+    for path, arcname in entries:
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            continue  # 已過期或不存在
+
+        with f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            crc = _crc32(f)
+            f.seek(0)
+
+            name = arcname.encode("utf-8")
+            dos_time, dos_date = _dos_datetime(stat.st_mtime)
+            if offset + size > 0xFFFFFFFF:
+                raise ValueError("zip 超過 4GB，請分批下載")
+
+            header = struct.pack(
+                "<IHHHHHIIIHH",
+                0x04034B50, _VERSION, _UTF8_FLAG, _STORED, dos_time, dos_date,
+                crc, size, size, len(name), 0,
+            )
+            yield header + name
+
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+        central.append(struct.pack(
+            "<IHHHHHHIIIHHHHHII",
+            0x02014B50, _VERSION, _VERSION, _UTF8_FLAG, _STORED, dos_time, dos_date,
+            crc, size, size, len(name), 0, 0, 0, 0, 0o644 << 16, offset,
+        ) + name)
+        offset += len(header) + len(name) + size
+
+    directory = b"".join(central)
+    yield directory
+    yield struct.pack(
+        "<IHHHHIIH",
+        0x06054B50, 0, 0, len(central), len(central), len(directory), offset, 0,
+    )
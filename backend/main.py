@@ -1,31 +1,130 @@
 # main.py
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import Body
+from fastapi import Body, Query, Request
+from fastapi.concurrency import run_in_threadpool
 
 import json
 import uuid
 import os
 import time
 import threading
-import pandas as pd
-import shutil
-from zipfile import ZipFile
-from tempfile import NamedTemporaryFile
+import asyncio
+from typing import Optional
 
 from stat_code import REGISTRY
-from costomTools import sanitize_filename, write_anova_postTest
+from stat_code.options import CORRECTIONS, DEFAULT_RESAMPLES, MAX_RESAMPLES
+from costomTools import sanitize_filename, StatExecutor, ExecutorBusy, JobTimeout, WorkerCrashed
+from costomTools.resultCache import ResultCache
+from costomTools.downloads import DownloadCache, XLSX_MEDIA_TYPE, content_disposition, not_modified
+from costomTools.resultStore import open_store
+from costomTools.expiry import ExpiryScheduler
+from costomTools.leader import LeaderLock
+from costomTools.metrics import JobMetrics, gauge
+from costomTools.resultViews import (
+    FORMATS, MAX_PAGE_SIZE, arrow_available, maybe_gzip, parse_filters, shape_payload, to_arrow, to_json,
+)
+from costomTools.uploads import (
+    UploadTooLarge, read_limited, check_upload, check_chunked_upload, spool_upload, sweep_spool, too_large_message,
+)
+from costomTools.zipStream import iter_zip, unique_arcname
+from costomTools.tasks import TaskTracker, QUEUED, RUNNING, DONE, FAILED
 
-from stat_code.independentTtest import t_test
-RESULT_DIR = "results"
+RESULT_DIR = os.environ.get("RESULT_DIR", "results")
+# 結果索引，預設為 RESULT_DIR 底下的 SQLite；多個 replica 可掛同一個 volume 共用
+RESULT_STORE_URL = os.environ.get("RESULT_STORE_URL", "sqlite://")
 # EXPIRE_SECONDS = 60 * 60  
 EXPIRE_SECONDS = 600
 
+# uvicorn --workers 的數量（uvicorn 也讀同一個環境變數）；多個 worker 時 CPU 平均分給各自的 process pool
+WEB_WORKERS = int(os.environ.get("WEB_CONCURRENCY", 1))
+
+# 統計檢定的 process pool 設定
+STAT_WORKERS = int(os.environ.get("STAT_WORKERS", max(1, (os.cpu_count() or 1) // WEB_WORKERS)))
+STAT_QUEUE_SIZE = int(os.environ.get("STAT_QUEUE_SIZE", STAT_WORKERS * 4))
+STAT_JOB_TIMEOUT = float(os.environ.get("STAT_JOB_TIMEOUT", 120))
+# 子行程啟動時預先 import 的檢定："all" 或以逗號分隔的 test_name，空白則第一次使用時才載入
+STAT_WARMUP = os.environ.get("STAT_WARMUP", "")
+
+# 相同上傳檔 + 檢定的結果快取
+RESULT_CACHE_ENTRIES = int(os.environ.get("RESULT_CACHE_ENTRIES", 256))
+RESULT_CACHE_BYTES = int(os.environ.get("RESULT_CACHE_BYTES", 64 * 1024 * 1024))
+# 下載用的結果檔資訊（檔名、ETag…）快取幾筆
+DOWNLOAD_CACHE_ENTRIES = int(os.environ.get("DOWNLOAD_CACHE_ENTRIES", 1024))
+
+# 單一上傳檔的位元組上限（列數上限見 STAT_MAX_ROWS）
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 100 * 1024 * 1024))
+# multipart 表頭、欄位名稱等額外的位元組
+MULTIPART_OVERHEAD = 64 * 1024
+
+# 批次上傳（/stat/{test_name}/batch）一次最多幾個檔案、整個請求的位元組上限
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", 100))
+BATCH_MAX_BYTES = int(os.environ.get("BATCH_MAX_BYTES", 500 * 1024 * 1024))
+# 批次串流的格式：ndjson 每行一個 JSON，sse 為 text/event-stream
+BATCH_STREAMS = ("ndjson", "sse")
+
+# 分塊模式（chunked=true）的上傳檔先存到 SPOOL_DIR 再逐塊讀取，不受 MAX_UPLOAD_BYTES 限制
+CHUNKED_MAX_BYTES = int(os.environ.get("CHUNKED_MAX_BYTES", 20 * 1024 * 1024 * 1024))
+CHUNKED_JOB_TIMEOUT = float(os.environ.get("CHUNKED_JOB_TIMEOUT", 1800))
+SPOOL_DIR = os.path.join(RESULT_DIR, ".spool")
+
+# 超過此秒數仍是 queued / running 的索引、以及 SPOOL_DIR 中的暫存上傳檔，
+# 視為行程異常結束留下的並清除（需大於任何工作的排隊 + 執行時間）
+STALE_JOB_SECONDS = float(os.environ.get("STALE_JOB_SECONDS", max(4 * 60 * 60, 2 * CHUNKED_JOB_TIMEOUT)))
+
+# 過期清除每次醒來最多刪幾筆
+EXPIRY_BATCH = int(os.environ.get("EXPIRY_BATCH", 200))
+# 過期清除每隔幾秒向索引查一次其他 worker / replica 寫入的已到期結果
+EXPIRY_POLL_SECONDS = float(os.environ.get("EXPIRY_POLL_SECONDS", 30))
+
+# 送進 process pool 的工作以 "模組:函式" 指定，由子行程 import；web 行程不載入 pandas / scipy / openpyxl
+RUN_STAT_JOB = "costomTools.jobs:run_stat_job"
+RUN_CHUNKED_JOB = "costomTools.jobs:run_chunked_job"
+
 os.makedirs(RESULT_DIR, exist_ok=True)
+os.makedirs(SPOOL_DIR, exist_ok=True)
 
 app = FastAPI()
 
+store = open_store(RESULT_STORE_URL, RESULT_DIR)
+
+executor = StatExecutor(
+    max_workers=STAT_WORKERS,
+    max_queue=STAT_QUEUE_SIZE,
+    timeout=STAT_JOB_TIMEOUT,
+    initializer="costomTools.jobs:warmup" if STAT_WARMUP else None,
+    initargs=(STAT_WARMUP,),
+)
+tasks = TaskTracker()
+result_cache = ResultCache(
+    RESULT_DIR,
+    EXPIRE_SECONDS,
+    max_entries=RESULT_CACHE_ENTRIES,
+    max_bytes=RESULT_CACHE_BYTES,
+)
+downloads = DownloadCache(store, max_entries=DOWNLOAD_CACHE_ENTRIES)
+
+
+def forget_result(task_id):
+    # 過期清除刪掉結果檔時，移除指向它的快取項目
+    result_cache.discard(task_id)
+    downloads.discard(task_id)
+
+
+expiry = ExpiryScheduler(
+    store,
+    max_per_tick=EXPIRY_BATCH,
+    on_delete=forget_result,
+    poll_interval=EXPIRY_POLL_SECONDS,
+    stale_after=STALE_JOB_SECONDS,
+)
+# 共用 RESULT_DIR 的所有 worker / replica 中，只有取得 lock 的那一個執行過期清除
+leader = LeaderLock(os.path.join(RESULT_DIR, ".cleanup.lock"), retry_interval=EXPIRY_POLL_SECONDS)
+metrics = JobMetrics()
+# 保留背景 asyncio task 的參照，避免被 GC
+background_jobs = set()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -39,20 +138,41 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+@app.middleware("http")
+async def reject_large_uploads(request: Request, call_next):
+    # Content-Length 已超過上限時，不等 multipart 解析完就直接拒絕
+    # 批次上傳的上限是整個請求的總和，單一檔案的上限在讀取時另外檢查
+    if request.url.path.endswith("/batch"):
+        limit = BATCH_MAX_BYTES
+    elif request.query_params.get("chunked", "").lower() in ("1", "true", "yes", "on"):
+        limit = CHUNKED_MAX_BYTES
+    else:
+        limit = MAX_UPLOAD_BYTES
+    length = request.headers.get("content-length")
+    if limit and length and length.isdigit() and int(length) > limit + MULTIPART_OVERHEAD:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": too_large_message(limit)},
+        )
+    return await call_next(request)
+
 def cleanup_worker():
+    # 結果檔由 leader 的 ExpiryScheduler 到期即刪，這裡只清本行程記憶體中的工作狀態與快取，
+    # 以及行程異常結束留下的分塊暫存上傳檔（啟動時先清一次）
     while True:
-        now = time.time()
-        for fname in os.listdir(RESULT_DIR):
-            path = os.path.join(RESULT_DIR, fname)
-            if not os.path.isfile(path):
-                continue
-
-            if now - os.path.getmtime(path) > EXPIRE_SECONDS:
-                try:
-                    os.remove(path)
-                    print(f"[CLEANUP] removed {fname}")
-                except Exception as e:
-                    print("[CLEANUP ERROR]", e)
+        try:
+            tasks.prune(EXPIRE_SECONDS)
+            result_cache.expire()
+        except Exception as e:
+            # 例外不可讓清理執行緒結束，否則之後都不會再清理
+            print("[CLEANUP ERROR] prune", e)
+        try:
+            removed = sweep_spool(SPOOL_DIR, STALE_JOB_SECONDS)
+            if removed:
+                print(f"[CLEANUP] removed {removed} stale spool files")
+        except Exception as e:
+            print("[CLEANUP ERROR] spool", e)
         # time.sleep(10)
         time.sleep(300)  
 
@@ -62,177 +182,733 @@ def start_cleanup():
     t.start()
     print('REGISTRY:', REGISTRY.keys())
 
+def run_expiry():
+    loaded = expiry.load()
+    expiry.start()
+    print(f"[EXPIRY] pid={os.getpid()} elected leader, {loaded} results scheduled")
 
-@app.post("/ttest/{test_name}/upload")
-async def upload_tTest(test_name: str, file:UploadFile = File(...)):
+@app.on_event("startup")
+def start_expiry():
+    leader.start(run_expiry)
+
+@app.on_event("startup")
+def start_executor():
+    executor.start()
+    print(f"[EXECUTOR] workers={executor.max_workers} queue={executor.max_queue}")
+
+@app.on_event("shutdown")
+def stop_executor():
+    executor.shutdown()
+    expiry.stop()
+    leader.stop()
+
+
+async def register_result(task_id, original_name, test, size=0, status=DONE, batch_id=None):
+    """
+    結果寫入索引；先登記再執行，完成時 finish_result，失敗時由呼叫端刪除或 fail_result。
+    到期時間由完成時起算：queued / running 時先以 STALE_JOB_SECONDS 為期限（行程異常結束時由過期清除移除）。
+
+    索引寫入在 threadpool 中執行：共用索引時可能要等其他 worker / replica 的寫入鎖，不能卡住 event loop
+    """
+    expires = time.time() + (EXPIRE_SECONDS if status == DONE else STALE_JOB_SECONDS)
+    await run_in_threadpool(
+        store.put, task_id, original_name, test.name, test.display_name, expires, size, status, batch_id
+    )
+    expiry.schedule(task_id, expires)
+
+
+async def finish_result(task_id, size):
+    expires = time.time() + EXPIRE_SECONDS
+    await run_in_threadpool(store.finish, task_id, size, expires)
+    expiry.schedule(task_id, expires)
+
+
+async def fail_result(task_id, error):
+    expires = time.time() + EXPIRE_SECONDS
+    await run_in_threadpool(store.fail, task_id, error, expires)
+    expiry.schedule(task_id, expires)
+
+
+async def abandon_result(task_id, e):
+    """
+    工作沒有正常完成（錯誤、逾時、用戶端斷線）：索引標記為失敗而不刪除。
+    逾時 / 斷線時子行程可能仍在執行，之後才寫出的結果檔到期時隨索引一起清除
+    """
+    await fail_result(task_id, e.detail if isinstance(e, HTTPException) else "工作已中斷")
+
+
+def busy_error(e: ExecutorBusy):
+    return HTTPException(
+        status_code=503,
+        detail="伺服器忙碌中，請稍後再試",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def crashed_error(e: WorkerCrashed):
+    # pool 已重建，稍後重送即可
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+def upload_error(e: ValueError):
+    # 超過大小 / 列數上限回 413，其餘資料格式問題回 422
+    status_code = 413 if isinstance(e, UploadTooLarge) else 422
+    return HTTPException(status_code=status_code, detail=str(e))
+
+
+async def read_upload_file(file: UploadFile):
+    try:
+        return await read_limited(file, MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise upload_error(e)
+
+
+async def validate_upload(test, content, filename, options):
+    """在送進 process pool 前先以表頭檢查欄位，不符合就直接回 422"""
+    try:
+        await run_in_threadpool(check_upload, test, content, filename, options)
+    except ValueError as e:
+        raise upload_error(e)
+
+
+async def spool_chunked_upload(test, file: UploadFile, options):
+    """分塊模式：上傳檔寫到 SPOOL_DIR 並以表頭檢查欄位，回傳檔案路徑（由呼叫端在工作結束後刪除）"""
+    path = os.path.join(SPOOL_DIR, uuid.uuid4().hex)
+    try:
+        await spool_upload(file, path, CHUNKED_MAX_BYTES)
+    except UploadTooLarge as e:
+        raise upload_error(e)
+    try:
+        await run_in_threadpool(check_chunked_upload, test, path, file.filename, options)
+    except ValueError as e:
+        os.remove(path)
+        raise upload_error(e)
+    return path
+
+
+async def run_on_executor(job, *args, wait_if_busy=False, timeout=None):
+    """wait_if_busy=True 時佇列滿了就等 Retry-After 秒再送（批次上傳用），否則直接回 503"""
+    while True:
+        try:
+            return await executor.submit(job, *args, timeout=timeout)
+        except ExecutorBusy as e:
+            if not wait_if_busy:
+                raise busy_error(e)
+            await asyncio.sleep(e.retry_after)
+        except JobTimeout:
+            raise HTTPException(status_code=504, detail="統計檢定執行逾時")
+        except WorkerCrashed as e:
+            raise crashed_error(e)
+        except ValueError as e:
+            raise upload_error(e)
+
+
+def stat_options(
+    test_name: str,
+    batch: bool = False,
+    pairs: Optional[str] = None,
+    columns: Optional[str] = None,
+    correction: str = "holm",
+    permutation: bool = False,
+    bootstrap: bool = False,
+    resamples: int = DEFAULT_RESAMPLES,
+    seed: int = 0,
+    confidence: float = 0.95,
+    sheet: Optional[str] = None,
+    chunked: bool = False,
+):
+    """
+    上傳端點共用的 query 參數（FastAPI dependency）：
+
+    - 批次模式：batch=true 時對 pairs（A:B,C:D）中的每組欄位（t 檢定）、
+      或 columns（A,B,C）中的每個分數欄位（ANOVA）做檢定，未指定時用全部欄位，並以 correction 做多重比較校正
+    - 重抽樣：permutation=true 加上 permutation p 值，bootstrap=true 加上信賴區間，
+      resamples 為抽樣次數、seed 固定亂數
+    - 工作表：sheet 為 Excel 的工作表名稱或索引（從 0 開始），sheet=all 時對每個工作表各做一次檢定，
+      結果合併成一個 task_id、一份報表；未指定時只讀第一個工作表
+    - 分塊模式：chunked=true 時上傳檔（CSV / Parquet）先存到磁碟再逐塊讀取，只累加可合併的統計量，
+      適合比記憶體還大的檔案；常態 / 變異數同質檢定用 seed 決定的子樣本，無母數檢定為近似值，結果不快取
+
+    檢定不支援的模式（spec.batch / spec.chunked 為 False）直接回 422；未知的 test_name 交給端點回 404
+    """
+    spec = REGISTRY.spec(test_name) if test_name in REGISTRY else None
+    if spec is not None and batch and not spec.batch:
+        raise HTTPException(status_code=422, detail=f"{spec.display_name}不支援批次模式")
+    if spec is not None and chunked and not spec.chunked:
+        raise HTTPException(status_code=422, detail=f"{spec.display_name}不支援分塊模式")
+    if spec is not None and batch and spec.batch:
+        # 批次模式只接受檢定對應的欄位參數（t 檢定 pairs、ANOVA columns）
+        other = "pairs" if spec.batch == "columns" else "columns"
+        if {"pairs": pairs, "columns": columns}[other]:
+            raise HTTPException(
+                status_code=422, detail=f"{spec.display_name}的批次模式以 {spec.batch} 指定欄位，不使用 {other}"
+            )
+    if correction not in CORRECTIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"correction 必須是 {', '.join(CORRECTIONS)} 其中之一",
+        )
+    options = {}
+    if batch:
+        options.update({"batch": True, "pairs": pairs, "columns": columns, "correction": correction})
+    if sheet is not None:
+        options["sheet"] = sheet
+    if chunked:
+        if batch or sheet is not None or permutation or bootstrap:
+            raise HTTPException(status_code=422, detail="分塊模式不支援批次、工作表與重抽樣選項")
+        options.update({"chunked": True, "seed": seed})
+
+    if permutation or bootstrap:
+        if batch:
+            raise HTTPException(status_code=422, detail="批次模式不支援重抽樣")
+        if not 1 <= resamples <= MAX_RESAMPLES:
+            raise HTTPException(status_code=422, detail=f"resamples 必須介於 1 到 {MAX_RESAMPLES}")
+        if not 0 < confidence < 1:
+            raise HTTPException(status_code=422, detail="confidence 必須介於 0 與 1 之間")
+        options["resampling"] = {
+            "permutation": permutation,
+            "bootstrap": bootstrap,
+            "resamples": resamples,
+            "seed": seed,
+            "confidence": confidence,
+        }
+    return options
+
+
+def result_view(
+    format: str = "records",
+    table: Optional[int] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    sort: Optional[str] = None,
+    desc: bool = False,
+    filter: list[str] = Query([]),
+):
+    """
+    結果回應的 query 參數（FastAPI dependency），不影響計算與快取：
+
+    - format：records（預設，每列一個 dict）、columns（每欄一個 array）、arrow（Arrow IPC stream）
+    - table：只回傳第幾個表格（如 ANOVA 的事後比較為 1）；未指定時每個表格各自分頁
+    - offset / limit 分頁，sort / desc 排序，filter 篩選（可重複，如 filter=is_diff:true、filter=p-value<0.05）
+
+    全部不指定時回傳完整結果，與舊版相同。
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=422, detail=f"format 必須是 {', '.join(FORMATS)} 其中之一")
+    if format == "arrow" and not arrow_available():
+        raise HTTPException(status_code=422, detail="伺服器未安裝 pyarrow，無法輸出 Arrow 格式")
+    if offset < 0 or (limit is not None and not 1 <= limit <= MAX_PAGE_SIZE):
+        raise HTTPException(status_code=422, detail=f"offset 不可為負，limit 必須介於 1 到 {MAX_PAGE_SIZE}")
+    try:
+        filters = parse_filters(filter)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {
+        "format": format, "table": table, "offset": offset, "limit": limit,
+        "sort": sort, "desc": desc, "filters": filters,
+    }
+
+
+def result_response(task_id, payload, view, request: Request):
+    """依 view 分頁 / 篩選並轉成指定格式；JSON 在用戶端接受時以 gzip 壓縮"""
+    try:
+        shaped = shape_payload(payload, view)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if view["format"] == "arrow":
+        return Response(
+            to_arrow(shaped),
+            media_type="application/vnd.apache.arrow.stream",
+            headers={"X-Task-Id": task_id},
+        )
+
+    body, headers = maybe_gzip(
+        to_json({"task_id": task_id, **shaped}), request.headers.get("accept-encoding")
+    )
+    return Response(
+        body,
+        media_type="application/json",
+        headers={**headers, "Vary": "Accept-Encoding"},
+    )
+
+
+def record_job(test_name, endpoint, result, started):
+    metrics.observe_job(test_name, result["timings"])
+    metrics.observe_request(test_name, endpoint, time.perf_counter() - started)
+    if result["profile"]:
+        print(f"[PROFILE] {test_name} {result['finished_at'] - result['started_at']:.2f}s -> {result['profile']}")
+
+
+def _lookup_cache(test_name, content, options):
+    key = result_cache.key(content, test_name, options)
+    return key, result_cache.get(key)
+
+
+async def lookup_cache(test_name, content, options):
+    # hash 上傳內容、檢查結果檔是否存在都在 threadpool 中執行；命中後的 reuse（hard link / 複製）也是
+    return await run_in_threadpool(_lookup_cache, test_name, content, options)
+
+
+async def run_upload(test_name: str, file: UploadFile, options: dict, view: dict, request: Request):
+    """上傳端點共用流程：查快取 → 送進 process pool → 寫索引 / 快取"""
     if test_name not in REGISTRY:
         raise HTTPException(status_code=404, detail="未知的統計檢定")
-    test = REGISTRY[test_name]
+    test = REGISTRY.spec(test_name)
+    started = time.perf_counter()
 
     task_id = str(uuid.uuid4())
-    result_path = os.path.join(RESULT_DIR, f"{task_id}.xlsx")
-    meta_path = os.path.join(RESULT_DIR, f"{task_id}.meta")
+    result_path = store.path(task_id)
 
     original_name = sanitize_filename(
         os.path.splitext(file.filename)[0], max_length=30
     )
 
-    with NamedTemporaryFile(delete=False, suffix='xlsx') as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = tmp.name
-
+    if options.get("chunked"):
+        path = await spool_chunked_upload(test, file, options)
+        await register_result(task_id, original_name, test, status=RUNNING)
+        try:
+            result = await run_on_executor(
+                RUN_CHUNKED_JOB, test_name, path, result_path, file.filename, options,
+                timeout=CHUNKED_JOB_TIMEOUT,
+            )
+        except BaseException as e:
+            await abandon_result(task_id, e)
+            raise
+        finally:
+            os.remove(path)
+        await finish_result(task_id, result["size"])
+        record_job(test_name, "upload", result, started)
+        return result_response(task_id, result["payload"], view, request)
+
+    content = await read_upload_file(file)
+    key, cached = await lookup_cache(test_name, content, options)
+    if cached is not None and await run_in_threadpool(result_cache.reuse, key, cached, task_id):
+        await register_result(task_id, original_name, test, cached.size)
+        metrics.observe_request(test_name, "upload", time.perf_counter() - started, cache="hit")
+        return result_response(task_id, cached.payload, view, request)
+
+    await validate_upload(test, content, file.filename, options)
+    await register_result(task_id, original_name, test, status=RUNNING)
     try:
-        df = pd.read_excel(tmp_path)
-
-        result = test.run(df)
+        result = await run_on_executor(
+            RUN_STAT_JOB, test_name, content, result_path, file.filename, options
+        )
+    except BaseException as e:
+        await abandon_result(task_id, e)
+        raise
+    await finish_result(task_id, result["size"])
+    result_cache.put(key, task_id, result["payload"], result["size"])
+    record_job(test_name, "upload", result, started)
 
-        result_df = pd.DataFrame(result).fillna("")
-        result_df.to_excel(result_path, index=False)
+    return result_response(task_id, result["payload"], view, request)
 
-        with open(meta_path, "w", encoding='utf-8') as f:
-            json.dump(
-                {
-                    "original_name":original_name,
-                    "test_name":test.display_name
-                },
-                f,
-                ensure_ascii=False
-            )
 
+# 兩個路徑保留給既有前端，流程完全相同，檢定由 REGISTRY 的 test_name 決定
+@app.post("/ttest/{test_name}/upload")
+@app.post("/anova/{test_name}/upload")
+async def upload_stat(
+    test_name: str,
+    request: Request,
+    file:UploadFile = File(...),
+    options: dict = Depends(stat_options),
+    view: dict = Depends(result_view),
+):
+    return await run_upload(test_name, file, options, view, request)
+
+async def complete_task(task_id, test_name, cf_future, key, started, spool=None):
+    """key 為 None 時不寫入快取（分塊模式）；spool 為分塊模式的暫存上傳檔，結束後刪除"""
+    try:
+        result = await executor.wait(cf_future, CHUNKED_JOB_TIMEOUT if spool else None)
+        await finish_result(task_id, result["size"])
+        if key is not None:
+            result_cache.put(key, task_id, result["payload"], result["size"])
+        tasks.finish(task_id, result["started_at"], result["finished_at"])
+        record_job(test_name, "submit", result, started)
+    except JobTimeout:
+        # 失敗也記在索引，讓其他 worker / replica 查得到錯誤訊息
+        await fail_result(task_id, "統計檢定執行逾時")
+        tasks.fail(task_id, "統計檢定執行逾時")
+    except Exception as e:
+        await fail_result(task_id, str(e))
+        tasks.fail(task_id, str(e))
     finally:
-        os.remove(tmp_path)
+        if spool:
+            os.remove(spool)
 
-    return {
-        "task_id":task_id,
-        "test": test.display_name,
-        "columns": list(result_df.columns),
-        "data": result_df.to_dict(orient="records")
-    }
 
-@app.post("/anova/{test_name}/upload")
-async def upload_anova(test_name: str, file:UploadFile = File(...)):
+@app.post("/stat/{test_name}/submit")
+async def submit_stat(
+    test_name: str,
+    file:UploadFile = File(...),
+    options: dict = Depends(stat_options),
+):
+    """送出後立即回傳 task_id，之後以 /stat/status 與 /stat/result 查詢"""
     if test_name not in REGISTRY:
-        raise HTTPException(status_code=404, detail ='未知的統計檢定')
-    
-    test = REGISTRY[test_name]
-    task_id = str(uuid.uuid4())
+        raise HTTPException(status_code=404, detail="未知的統計檢定")
+    test = REGISTRY.spec(test_name)
+    started = time.perf_counter()
 
-    result_path = os.path.join(RESULT_DIR,f'{task_id}.xlsx')
-    meta_path = os.path.join(RESULT_DIR, f'{task_id}.meta')
+    task_id = str(uuid.uuid4())
+    result_path = store.path(task_id)
 
     original_name = sanitize_filename(
         os.path.splitext(file.filename)[0], max_length=30
     )
 
-    with NamedTemporaryFile(delete=False, suffix='xlsx') as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = tmp.name
+    if options.get("chunked"):
+        path = await spool_chunked_upload(test, file, options)
+        key, cached = None, None
+        stat_job, args = RUN_CHUNKED_JOB, (test_name, path, result_path, file.filename, options)
+    else:
+        path = None
+        content = await read_upload_file(file)
+        key, cached = await lookup_cache(test_name, content, options)
+        stat_job, args = RUN_STAT_JOB, (test_name, content, result_path, file.filename, options)
+
+    if cached is not None and await run_in_threadpool(result_cache.reuse, key, cached, task_id):
+        await register_result(task_id, original_name, test, cached.size)
+        info = tasks.add(task_id, test.display_name, None)
+        now = time.time()
+        tasks.finish(task_id, now, now)
+        metrics.observe_request(test_name, "submit", time.perf_counter() - started, cache="hit")
+    else:
+        if path is None:
+            await validate_upload(test, content, file.filename, options)
+        try:
+            cf_future = executor.dispatch(stat_job, *args)
+        except (ExecutorBusy, WorkerCrashed) as e:
+            if path is not None:
+                os.remove(path)
+            raise busy_error(e) if isinstance(e, ExecutorBusy) else crashed_error(e)
+
+        await register_result(task_id, original_name, test, status=QUEUED)
+        info = tasks.add(task_id, test.display_name, cf_future)
+        job = asyncio.create_task(complete_task(task_id, test_name, cf_future, key, started, path))
+        background_jobs.add(job)
+        job.add_done_callback(background_jobs.discard)
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            **info.to_dict(),
+            "status_url": f"/stat/status/{task_id}",
+            "result_url": f"/stat/result/{task_id}",
+            "download_url": f"/stat/download/{task_id}",
+        },
+    )
+
+
+async def analyze_batch_file(batch_id, index, test, filename, content, options, slots):
+    """
+    批次中的單一檔案：與 run_upload 相同的查快取 → 驗證 → process pool 流程。
+    錯誤不中斷整個批次，而是回傳該檔案 status=failed 的結果
+    """
+    started = time.perf_counter()
+    task_id = str(uuid.uuid4())
+    line = {"event": "result", "index": index, "filename": filename, "task_id": task_id}
+    original_name = sanitize_filename(os.path.splitext(filename)[0], max_length=30)
 
     try:
-        df = pd.read_excel(tmp_path)
-        result = test.run(df)
-
-        sections = []
-
-        pre_df = pd.DataFrame(result['pretest']).fillna("")
-        pre_df.to_excel(result_path, index=False)
-        
-        pre_df.to_excel('./check/pretest.xlsx', index=False) #debug
-
-        sections.append({
-            "title": f"{test.display_name}前測結果",
-            'columns': list(pre_df.columns),
-            'data': list(pre_df.to_dict(orient='records'))
-        })
-
-        if result['post']:
-            post_df = pd.DataFrame(result['posttest']).fillna("")
-            sections.append({
-                "title": f"事後比較",
-                "columns": list(post_df.columns),
-                "data": list(post_df.to_dict(orient='records'))
-            })
-            post_df.to_excel('./check/posttest.xlsx', index=False) #debug
-            write_anova_postTest(post_df, result_path)
-        
-        
-        with open(meta_path, 'w', encoding='utf-8') as f:
-            json.dump(
-                {
-                    "original_name":original_name,
-                    "test_name":test.display_name
-                },
-                f,
-                ensure_ascii=False
-            )
+        key, cached = await lookup_cache(test.name, content, options)
+        if cached is not None and await run_in_threadpool(result_cache.reuse, key, cached, task_id):
+            await register_result(task_id, original_name, test, cached.size, batch_id=batch_id)
+            metrics.observe_request(test.name, "batch", time.perf_counter() - started, cache="hit")
+            payload = cached.payload
+        else:
+            await validate_upload(test, content, filename, options)
+            await register_result(task_id, original_name, test, status=RUNNING, batch_id=batch_id)
+            try:
+                # 每個批次最多同時佔用 max_workers 個名額，不把其他使用者擠出佇列
+                async with slots:
+                    result = await run_on_executor(
+                        RUN_STAT_JOB, test.name, content, store.path(task_id), filename, options,
+                        wait_if_busy=True,
+                    )
+            except BaseException as e:
+                await abandon_result(task_id, e)
+                raise
+            await finish_result(task_id, result["size"])
+            result_cache.put(key, task_id, result["payload"], result["size"])
+            record_job(test.name, "batch", result, started)
+            payload = result["payload"]
+    except HTTPException as e:
+        return {**line, "status": FAILED, "error": e.detail}
+
+    return {
+        **line,
+        "status": DONE,
+        "result": payload,
+        "result_url": f"/stat/result/{task_id}",
+        "download_url": f"/stat/download/{task_id}",
+    }
+
+
+def batch_event(data: dict, stream: str):
+    body = json.dumps(data, ensure_ascii=False, default=str)
+    if stream == "sse":
+        return f"event: {data['event']}\ndata: {body}\n\n".encode("utf-8")
+    return (body + "\n").encode("utf-8")
+
+
+async def stream_batch(batch_id, test, uploads, options, stream):
+    """
+    所有檔案同時送進 process pool，依完成順序逐一輸出結果；
+    最後一行附上整批結果的 zip 下載網址。用戶端中途斷線時取消尚未完成的檔案
+    """
+    slots = asyncio.Semaphore(executor.max_workers)
+    jobs = []
+    for index, (filename, content, error) in enumerate(uploads):
+        if error is not None:
+            continue
+        jobs.append(asyncio.create_task(
+            analyze_batch_file(batch_id, index, test, filename, content, options, slots)
+        ))
+
+    yield batch_event({"event": "start", "batch_id": batch_id, "test": test.display_name,
+                       "files": len(uploads)}, stream)
+    # 讀檔時就超過大小上限的檔案
+    failed = 0
+    for index, (filename, _, error) in enumerate(uploads):
+        if error is not None:
+            failed += 1
+            yield batch_event({"event": "result", "index": index, "filename": filename,
+                               "task_id": None, "status": FAILED, "error": error}, stream)
 
-        
+    try:
+        for next_done in asyncio.as_completed(jobs):
+            line = await next_done
+            failed += line["status"] == FAILED
+            yield batch_event(line, stream)
     finally:
-        os.remove(tmp_path)
+        for job in jobs:
+            job.cancel()
+
+    yield batch_event({
+        "event": "end",
+        "batch_id": batch_id,
+        "done": len(uploads) - failed,
+        "failed": failed,
+        "status_url": f"/stat/batch/{batch_id}",
+        "download_url": f"/stat/batch/{batch_id}/download",
+    }, stream)
+
+
+@app.post("/stat/{test_name}/batch")
+async def batch_stat(
+    test_name: str,
+    files: list[UploadFile] = File(...),
+    options: dict = Depends(stat_options),
+    stream: str = "ndjson",
+):
+    """
+    一次上傳多個檔案做同一個檢定（例如批改整班的作業），在 process pool 上平行分析，
+    以 NDJSON（預設）或 SSE（stream=sse）依完成順序串流每個檔案的結果：
+
+    - {"event": "start", "batch_id", "files"}
+    - {"event": "result", "index", "filename", "task_id", "status", "result" 或 "error"}，每個檔案一行
+    - {"event": "end", "done", "failed", "download_url"}，download_url 為整批結果的 zip
+    """
+    if test_name not in REGISTRY:
+        raise HTTPException(status_code=404, detail="未知的統計檢定")
+    if stream not in BATCH_STREAMS:
+        raise HTTPException(status_code=422, detail=f"stream 必須是 {', '.join(BATCH_STREAMS)} 其中之一")
+    if options.get("chunked"):
+        raise HTTPException(status_code=422, detail="批次上傳不支援分塊模式")
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"一次最多上傳 {BATCH_MAX_FILES} 個檔案")
+    test = REGISTRY.spec(test_name)
+
+    # 回應開始串流前先讀完所有檔案（UploadFile 在端點回傳後就可能被關閉）
+    uploads = []
+    for file in files:
+        try:
+            uploads.append((file.filename, await read_limited(file, MAX_UPLOAD_BYTES), None))
+        except UploadTooLarge as e:
+            uploads.append((file.filename, None, str(e)))
+
+    batch_id = str(uuid.uuid4())
+    return StreamingResponse(
+        stream_batch(batch_id, test, uploads, options, stream),
+        media_type="text/event-stream" if stream == "sse" else "application/x-ndjson",
+        # X-Accel-Buffering 讓 nginx 不要緩衝，每個結果完成就送到前端
+        headers={"X-Batch-Id": batch_id, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    return{
-        "task_id":task_id,
-        "test": test.display_name,
-        "sections": sections
+
+@app.get("/stat/batch/{batch_id}")
+def batch_status(batch_id: str):
+    """批次中每個檔案的狀態（串流中斷後可由此查詢，任一 worker / replica 皆可）"""
+    rows = store.batch(batch_id)
+    if not rows:
+        raise HTTPException(status_code=404, detail="找不到此批次或已過期")
+    return {
+        "batch_id": batch_id,
+        "tasks": [
+            {
+                "task_id": row["task_id"],
+                "filename": row["original_name"],
+                "test": row["test_display"],
+                "status": row["status"],
+                "error": row["error"],
+            }
+            for row in rows
+        ],
     }
 
-@app.get("/stat/download/{task_id}")
-def download_stat(task_id: str):
-    path = os.path.join(RESULT_DIR, f"{task_id}.xlsx")
-    meta_path = os.path.join(RESULT_DIR, f"{task_id}.meta")
 
-    if not os.path.exists(path):
+@app.get("/stat/batch/{batch_id}/download")
+def download_batch(batch_id: str):
+    """整批已完成的結果打包成一個 zip"""
+    done = sorted((row for row in store.batch(batch_id) if row["status"] == DONE),
+                  key=lambda row: row["original_name"])
+    rows = {row["task_id"]: row for row in done}
+    if not rows:
+        raise HTTPException(status_code=404, detail="找不到此批次的結果或已過期")
+
+    return StreamingResponse(
+        iter_zip(zip_entries(list(rows), rows)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="batch_{batch_id[:8]}.zip"'},
+    )
+
+
+@app.get("/stat/cache")
+def cache_stats():
+    return {**result_cache.stats(), "downloads": downloads.stats()}
+
+
+@app.get("/stat/expiry")
+def expiry_stats():
+    # 只有 leader 的 pending / deleted 有數字；pid 用來分辨回應的是哪個 worker
+    return {**expiry.stats(), "leader": leader.is_leader, "pid": os.getpid()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    cache = result_cache.stats()
+    pending = expiry.stats()
+    return "\n".join([
+        metrics.render(),
+        gauge("stat_executor_inflight", "Jobs running or queued in the process pool", executor.inflight),
+        gauge("stat_executor_capacity", "Maximum running + queued jobs", executor.capacity),
+        gauge("stat_cache_hits", "Result cache hits since start", cache["hits"]),
+        gauge("stat_cache_misses", "Result cache misses since start", cache["misses"]),
+        gauge("stat_cache_bytes", "Bytes held by result cache entries", cache["bytes"]),
+        gauge("stat_expiry_pending", "Results waiting for scheduled deletion", pending["pending"]),
+        gauge("stat_expiry_bytes_reclaimed", "Bytes freed by expired results", pending["bytes_reclaimed"]),
+    ]) + "\n"
+
+
+def stored_status(task_id):
+    row = store.get(task_id)
+    if row is None:
+        return None
+    status = row["status"]
+    # 舊索引（或重啟前寫入）的 done 以結果檔是否存在為準
+    if status == DONE and not os.path.exists(store.path(task_id, ".json")):
+        return None
+    return {
+        "task_id": task_id,
+        "test": row["test_display"],
+        "status": status,
+        "submitted_at": row["created"],
+        "error": row["error"],
+    }
+
+
+@app.get("/stat/status/{task_id}")
+def task_status(task_id: str):
+    info = tasks.get(task_id)
+    if info is not None:
+        return info.to_dict()
+
+    # 由其他 worker / replica 送出，或重啟後記憶體中的狀態已消失：改查共用的索引
+    status = stored_status(task_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="找不到此工作或已過期")
+    return status
+
+
+@app.get("/stat/result/{task_id}")
+def task_result(task_id: str, request: Request, view: dict = Depends(result_view)):
+    """已完成工作的結果；可用 result_view 的參數分頁、排序、篩選，或改用欄式 / Arrow 格式"""
+    json_path = store.path(task_id, ".json")
+    info = tasks.get(task_id)
+
+    if info is not None and info.status == FAILED:
+        raise HTTPException(status_code=422, detail=info.error)
+
+    if info is not None and info.status != DONE:
+        return JSONResponse(status_code=202, content=info.to_dict())
+
+    if info is None:
+        status = stored_status(task_id)
+        if status is not None and status["status"] == FAILED:
+            raise HTTPException(status_code=422, detail=status["error"])
+        if status is not None and status["status"] != DONE:
+            return JSONResponse(status_code=202, content=status)
+
+    if not os.path.exists(json_path):
+        raise HTTPException(status_code=404, detail="檔案不存在或已過期")
+
+    with open(json_path, encoding="utf-8") as f:
+        payload = json.load(f)
+    return result_response(task_id, payload, view, request)
+
+
+@app.get("/stat/download/{task_id}")
+def download_stat(task_id: str, request: Request):
+    """
+    結果檔下載。帶有以內容 hash 計算的 strong ETag，If-None-Match 符合時回 304；
+    經過 nginx 時（請求帶有 X-Accel-Prefix）以 X-Accel-Redirect 交給 nginx 直接送檔，
+    否則由 FileResponse 送出（支援 Range / If-Range）
+    """
+    info = downloads.get(task_id)
+    if info is None:
         raise HTTPException(status_code=404, detail="檔案不存在或已過期")
-    
-    original_name = "uploaded_file"
-    if os.path.exists(meta_path):
-        with open(meta_path, encoding="utf-8") as f:
-            meta = json.load(f)
-            original_name = meta['original_name']
-            test_name = meta['test_name']
 
-    download_name = f"{original_name}_{test_name}.xlsx"
+    headers = info.headers()
+    if not_modified(request.headers.get("if-none-match"), info.etag):
+        return Response(status_code=304, headers=headers)
+
+    prefix = request.headers.get("x-accel-prefix")
+    if prefix:
+        return Response(
+            media_type=XLSX_MEDIA_TYPE,
+            headers={
+                **headers,
+                "Content-Disposition": content_disposition(info.filename),
+                "X-Accel-Redirect": prefix + os.path.basename(info.path),
+            },
+        )
 
     return FileResponse(
-        path,
-        filename=download_name,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        info.path,
+        filename=info.filename,
+        media_type=XLSX_MEDIA_TYPE,
+        headers=headers,
     )
 
+def zip_entries(task_ids, rows):
+    """依序產生 (結果檔路徑, zip 內檔名)；rows 為一次查好的索引資料"""
+    used = set()
+    for task_id in task_ids:
+        row = rows.get(task_id)
+        if row is None:
+            continue  # 已過期或不存在
+        arcname = f"{row['original_name']}_{row['test_display']}.xlsx"
+        yield store.path(task_id), unique_arcname(arcname, used)
+
+
 @app.post("/stat/download_zip")
 def download_zip_stat(task_ids: list[str] = Body(...)):
     if not task_ids:
         raise HTTPException(status_code=400, detail="沒有選擇任何結果")
 
-    with NamedTemporaryFile(delete=False, suffix=".zip") as tmp_zip:
-        zip_path = tmp_zip.name
-
-    try:
-        with ZipFile(zip_path, "w") as zipf:
-            for task_id in task_ids:
-                result_path = os.path.join(RESULT_DIR, f"{task_id}.xlsx")
-                meta_path = os.path.join(RESULT_DIR, f"{task_id}.meta")
-
-                if not os.path.exists(result_path):
-                    continue  # 已過期或不存在
-
-                # 讀原始檔名
-                original_name = "uploaded_file"
-                if os.path.exists(meta_path):
-                    with open(meta_path, encoding="utf-8") as f:
-                        meta = json.load(f)
-                        original_name = meta['original_name']
-                        test_name = meta['test_name']
-
-                filename_in_zip = f"{original_name}_{test_name}.xlsx"
-                zipf.write(result_path, arcname=filename_in_zip)
-
-        return FileResponse(
-            zip_path,
-            filename=f"a.zip",
-            media_type="application/zip"
-        )
-
-    finally:
-        # ⚠️ FileResponse 傳完後再刪（保險起見可延後）
-        pass
+    rows = store.get_many(task_ids)
+    return StreamingResponse(
+        iter_zip(zip_entries(task_ids, rows)),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="a.zip"'},
+    )
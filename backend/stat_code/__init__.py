@@ -1,16 +1,143 @@
 # stat_code/__init__.py
 
+import ast
 from importlib import import_module
 from pathlib import Path
 
-REGISTRY = {}
+# 不是檢定的輔助模組
+HELPER_MODULES = ("__init__", "assumptions", "base", "batch", "groupStats", "options", "resampling", "resultTable", "summaries")
+
+# 啟動時只從原始碼讀出這些類別屬性，不 import 模組
+SPEC_FIELDS = (
+    "name", "display_name", "result_prefix", "result_layout",
+    "required_columns", "min_columns", "group_columns", "batch", "chunked",
+)
+
+
+class TestSpec:
+    """檢定的輕量資訊，web 行程只需要這些，不必載入 pandas / scipy"""
+
+    __slots__ = ("module",) + SPEC_FIELDS
+
+    def __init__(self, module, name, display_name, result_prefix, result_layout="table",
+                 required_columns=(), min_columns=0, group_columns=(), batch=None, chunked=False):
+        self.module = module
+        self.name = name
+        self.display_name = display_name
+        self.result_prefix = result_prefix
+        self.result_layout = result_layout
+        self.required_columns = tuple(required_columns)
+        self.min_columns = min_columns
+        self.group_columns = tuple(group_columns)
+        self.batch = batch
+        self.chunked = chunked
+
+
+def read_specs(path: Path):
+    """用 ast 找出模組中被 @register 裝飾的類別與其常數屬性；讀不到 name 時回傳 None"""
+    tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+    specs = []
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        if not any(isinstance(d, ast.Name) and d.id == "register" for d in node.decorator_list):
+            continue
+
+        attrs = {}
+        for stmt in node.body:
+            if (
+                isinstance(stmt, ast.Assign)
+                and len(stmt.targets) == 1
+                and isinstance(stmt.targets[0], ast.Name)
+                and stmt.targets[0].id in SPEC_FIELDS
+            ):
+                try:
+                    attrs[stmt.targets[0].id] = ast.literal_eval(stmt.value)
+                except ValueError:
+                    return None
+        if "name" not in attrs:
+            return None
+        attrs.setdefault("display_name", attrs["name"])
+        attrs.setdefault("result_prefix", attrs["name"])
+        specs.append(TestSpec(f"stat_code.{path.stem}", **attrs))
+    return specs
+
+
+class Registry:
+    """
+    name -> 檢定實例。啟動時只記錄 TestSpec，
+    第一次 REGISTRY[name] 時才 import 對應模組（連同 pandas / scipy 等依賴）。
+    `name in REGISTRY`、keys()、spec() 都不會觸發 import。
+    """
+
+    def __init__(self):
+        self._specs = {}
+        self._tests = {}
+
+    def add_spec(self, spec: TestSpec):
+        self._specs[spec.name] = spec
+
+    def add(self, test_cls):
+        test = test_cls()
+        self._tests[test.name] = test
+        self._specs.setdefault(
+            test.name,
+            TestSpec(
+                test_cls.__module__,
+                **{field: getattr(test, field) for field in SPEC_FIELDS},
+            ),
+        )
+
+    def spec(self, name):
+        return self._specs[name]
+
+    def load(self, names=None):
+        """import 指定（預設全部）檢定，回傳實例 list；warm-up 用"""
+        return [self[name] for name in (self.keys() if names is None else names)]
+
+    def loaded(self):
+        return list(self._tests)
+
+    def __getitem__(self, name):
+        test = self._tests.get(name)
+        if test is None:
+            import_module(self._specs[name].module)
+            test = self._tests[name]
+        return test
+
+    def __contains__(self, name):
+        return name in self._specs
+
+    def __iter__(self):
+        return iter(self._specs)
+
+    def __len__(self):
+        return len(self._specs)
+
+    def keys(self):
+        return self._specs.keys()
+
+    def items(self):
+        return [(name, self[name]) for name in self._specs]
+
+    def values(self):
+        return [self[name] for name in self._specs]
+
+
+REGISTRY = Registry()
 
 def register(test_cls):
-    REGISTRY[test_cls.name] = test_cls()
+    REGISTRY.add(test_cls)
 
     return test_cls
 
-# 自動載入 stat_code 底下所有檔案
+# 掃描 stat_code 底下所有檔案；讀不出資訊的模組才在這裡直接 import
 for file in Path(__file__).parent.glob('*.py'):
-    if file.stem not in ("__init__", "base"):
-        import_module(f"stat_code.{file.stem}")
\ No newline at end of file
+    if file.stem in HELPER_MODULES:
+        continue
+    specs = read_specs(file)
+    if specs is None:
+        import_module(f"stat_code.{file.stem}")
+        continue
+    for spec in specs:
+        REGISTRY.add_spec(spec)
@@ -1,9 +1,12 @@
 import numpy as np
 import pandas as pd
-import scipy.stats as st
-import pingouin as pg
 from .base import statTest
 from . import register
+from .batch import as_matrix, adjust_pvalues, round_or_none
+from .groupStats import GroupStats
+from .resampling import posthoc_columns
+from .resultTable import ResultTable, SectionResult
+from .summaries import GroupSummary
 
 class Pretest():
     def __init__(self):
@@ -22,81 +25,70 @@ class Posttest():
         self.is_diffList = []
         self.postHocList = []
 
-def anova(data: pd.DataFrame):
+def format_p(p):
+    return round(p, 2) if p >= 0.05 else "< 0.05"
+
+
+def fill_posttest(res, method):
+    post = Posttest()
+    high_is_a = res["mean_A"] >= res["mean_B"]
+    post.groupHighList = np.where(high_is_a, res["A"], res["B"]).tolist()
+    post.groupLowList = np.where(high_is_a, res["B"], res["A"]).tolist()
+    post.mean_diffList = np.round(np.abs(res["diff"]), 2).tolist()
+    post.p_valueList = [format_p(p) for p in res["p"].tolist()]
+    post.is_diffList = (res["p"] < 0.05).tolist()
+    post.postHocList = [method] * len(res["p"])
+    return post
+
+
+def anova(data: pd.DataFrame, resampling=None):
     if "group" not in data.columns or "score" not in data.columns:
         raise ValueError("DataFrame 必須包含 'group' 與 'score' 欄位")
+
+    # group 只分組一次，之後的檢定都由各組的 n / 平均 / 變異數計算
+    gs = GroupStats(data["group"], pd.to_numeric(data["score"], errors="coerce"))
+    return anova_from_stats(gs, resampling)
+
+
+def anova_from_stats(gs: GroupStats, resampling=None):
+    """
+    由 GroupStats 做單因子變異數分析與事後比較；分塊模式的 GroupStats.from_summary
+    只保留各組子樣本，常態檢定因此以子樣本計算，其餘都是全部資料的充分統計量
+    """
     pre = Pretest()
-    
-    name_list, Group1_list, Group2_list = [], [], []
-    Group1_num, Group2_num, M1_list, M2_list = [], [], [], []
-    pval_list, is_diff_list, method_list = [], [], []
-
-    groups = data["group"].unique()
-    for g in groups:
-        group_data = data.loc[data["group"] == g, "score"].dropna()
-        pre.groupList.append(g)
-        pre.sampleSizeList.append(len(group_data))
-        pre.meanList.append(np.round(np.mean(group_data), 2))
-        pre.p_value.append(None)
-        pre.is_diff.append(None)
-        pre.Method.append(None)
-    
-    dataList = [data.loc[data["group"] == g, "score"].dropna().values for g in groups]
-    use_welch = any(st.shapiro(c).pvalue < 0.05 for c in dataList)
-    
+
+    pre.groupList = gs.labels.tolist()
+    pre.sampleSizeList = gs.n[:, 0].tolist()
+    pre.meanList = np.round(gs.mean[:, 0], 2).tolist()
+    pre.p_value = [None] * len(pre.groupList)
+    pre.is_diff = [None] * len(pre.groupList)
+    pre.Method = [None] * len(pre.groupList)
+
+    use_welch = bool(np.any(gs.shapiro()[:, 0] < 0.05))
 
     if use_welch:
-        welch_res = pg.welch_anova(data=data, dv='score', between='group')
-        welch_p = welch_res['p-unc'][0]
+        _, welch_p = gs.welch()
+        welch_p = float(welch_p[0])
 
-        pre.p_value[0] =round(welch_p, 2) if welch_p >=0.05 else "< 0.05"
+        pre.p_value[0] = format_p(welch_p)
         pre.is_diff[0] = welch_p < 0.05
         pre.Method[0] = 'Welch ANOVA'
 
         if welch_p < 0.05:
-            post = Posttest()
-
-            gh = pg.pairwise_gameshowell(data=data, dv='score', between='group')
-            for _, row in gh.iterrows():
-                name_list.append(f"{row['A']}_vs_{row['B']}")
-                if row['mean(A)'] >= row['mean(B)']:
-                    post.groupHighList.append(row['A'])
-                    post.groupLowList.append(row['B'])
-                    post.mean_diffList.append(round(row['mean(A)'] - row['mean(B)'], 2))
-                else:
-                    post.groupHighList.append(row['B'])
-                    post.groupLowList.append(row['A'])
-                    post.mean_diffList.append(round(row['mean(B)'] - row['mean(A)'], 2))
-                post.p_valueList.append(round(row['pval'], 2) if row['pval'] >=0.05 else "< 0.05")
-                post.is_diffList.append(row['pval'] < 0.05)
-                post.postHocList.append('Welch_GamesHowell')
-                
+            res = gs.games_howell()
+            post = fill_posttest(res, 'Welch_GamesHowell')
 
     else:
-        anova_res = pg.anova(data=data, dv='score', between='group')
-        anova_p = anova_res['p-unc'][0]
+        _, anova_p = gs.oneway()
+        anova_p = float(anova_p[0])
 
-        pre.p_value[0] = round(anova_p, 2) if anova_p >=0.05 else "< 0.05"
+        pre.p_value[0] = format_p(anova_p)
         pre.is_diff[0] = anova_p < 0.05
         pre.Method[0] = 'One-way ANOVA'
-        if anova_p < 0.05:
 
-            post = Posttest()
-
-            hsd = pg.pairwise_tukey(data=data, dv='score', between='group')
-            for _, row in hsd.iterrows():
-                name_list.append(f"{row['A']}_vs_{row['B']}")
-                if row['mean(A)'] >= row['mean(B)']:
-                    post.groupHighList.append(row['A'])
-                    post.groupLowList.append(row['B'])
-                    post.mean_diffList.append(round(row['mean(A)'] - row['mean(B)'], 2))
-                else:
-                    post.groupHighList.append(row['B'])
-                    post.groupLowList.append(row['A'])
-                    post.mean_diffList.append(round(row['mean(B)'] - row['mean(A)'], 2))
-                post.p_valueList.append(round(row['p-tukey'], 2) if row['p-tukey'] >=0.05 else "< 0.05")
-                post.is_diffList.append(row['p-tukey'] < 0.05)
-                post.postHocList.append('Tukey_HSD')
+        if anova_p < 0.05:
+            res = gs.tukey_hsd()
+            post = fill_posttest(res, 'Tukey_HSD')
 
     if pre.is_diff[0] == False:
         result = {
@@ -129,12 +121,45 @@ def anova(data: pd.DataFrame):
                 'Mean_Difference': post.mean_diffList,
                 'p-value': post.p_valueList,
                 'is_diff': post.is_diffList,
-                'Method': post.postHocList
+                'Method': post.postHocList,
+                **posthoc_columns(gs, res, resampling),
             }
         }
     return result
 
 
+def anova_batch(data: pd.DataFrame, columns=None, correction="holm"):
+    """每個分數欄位都對 group 做單因子變異數分析（不做事後比較）"""
+    if "group" not in data.columns:
+        raise ValueError("DataFrame 必須包含 'group' 欄位")
+    if columns is None:
+        columns = [c for c in data.columns if c != "group"]
+    if not columns:
+        raise ValueError("批次模式至少需要一個分數欄位")
+
+    gs = GroupStats(data["group"], as_matrix(data, columns))
+
+    # --- 常態檢定：每一組對所有欄位做一次 ---
+    use_welch = np.any(gs.shapiro() < 0.05, axis=0)
+    f_oneway, p_oneway = gs.oneway()
+    f_welch, p_welch = gs.welch()
+
+    p_value = np.where(use_welch, p_welch, p_oneway)
+    p_adj = adjust_pvalues(p_value, correction)
+
+    return {
+        "Measure": list(columns),
+        "Groups": gs.k.tolist(),
+        "Sample Size": gs.total.tolist(),
+        "Method": np.where(use_welch, "Welch ANOVA", "One-way ANOVA").tolist(),
+        "F": round_or_none(np.where(use_welch, f_welch, f_oneway), 2),
+        "p-value": round_or_none(p_value),
+        "p-adj": round_or_none(p_adj),
+        "Correction": [correction] * len(columns),
+        "is_diff": (p_adj < 0.05).tolist(),
+    }
+
+
 # 測試用資料
 def generate_anova_test_data(seed=42, use_welch=False, is_significant=True):
     np.random.seed(seed)
@@ -157,9 +182,27 @@ class ANOVA(statTest):
     name = "anova"
     display_name = "單因子變異數分析"
     result_prefix = "anova"
-
-    def run(self, df: pd.DataFrame):
-        return anova(df)
+    result_layout = "sections"
+    required_columns = ("group", "score")
+    group_columns = ("group",)
+    batch = "columns"
+    chunked = True
+
+    def run(self, df: pd.DataFrame, resampling=None):
+        return SectionResult.of(anova(df, resampling))
+
+    def new_summary(self, columns, seed=0):
+        return GroupSummary("group", "score", seed)
+
+    def run_summary(self, summary):
+        if len(summary.index) < 2:
+            raise ValueError("至少需要兩個組別才能進行變異數分析")
+        return SectionResult.of(anova_from_stats(GroupStats.from_summary(summary)))
+
+    def run_batch(self, df: pd.DataFrame, pairs=None, correction="holm", columns=None):
+        if pairs is not None:
+            raise ValueError(f"{self.display_name}的批次模式以 columns 指定分數欄位，不使用欄位配對")
+        return ResultTable(anova_batch(df, columns, correction))
     
 
 if __name__ == "__main__":
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import scipy.stats as st
+
+# 前提檢定（常態、變異數同質）與敘述統計的快取，所有檢定共用。
+# key 為欄位內容的指紋，同一份資料換檢定（獨立 / 成對 t 檢定）或換選項重跑時不必重新掃描。
+# 每個子行程各有一份記憶體中的 LRU；use_store() 後另外存在結果目錄的 SQLite，子行程 / replica 之間共用
+
+CACHE_ENTRIES = int(os.environ.get("STAT_ASSUMPTION_CACHE_ENTRIES", 4096))
+# 持久化快取最多保留幾筆，超過時刪掉最舊的
+STORE_ENTRIES = int(os.environ.get("STAT_ASSUMPTION_STORE_ENTRIES", 200_000))
+# 檢定的計算方式改變時遞增，舊的快取就不會再被使用
+CACHE_VERSION = 1
+
+
+def fingerprint(values):
+    """欄位內容（float64、含 NaN 的位置）的 128-bit 指紋"""
+    values = np.ascontiguousarray(values, dtype=float)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(values.shape).encode())
+    h.update(values)
+    return h.hexdigest()
+
+
+class AssumptionStore:
+    """持久化的快取（SQLite），與結果索引放在同一個目錄"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS checks (
+        key     TEXT PRIMARY KEY,
+        value   TEXT NOT NULL,
+        created REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_checks_created ON checks(created);
+    """
+
+    # SQLite 舊版本一個查詢最多 999 個參數
+    BATCH_SIZE = 500
+    # 每寫入幾筆檢查一次是否超過 max_entries
+    PRUNE_EVERY = 1000
+
+    def __init__(self, db_path, max_entries=STORE_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.journal_mode = os.environ.get("RESULT_STORE_JOURNAL", "WAL")
+        self._local = threading.local()
+        self._writes = 0
+        with self._conn() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        found = {}
+        for i in range(0, len(keys), self.BATCH_SIZE):
+            chunk = keys[i:i + self.BATCH_SIZE]
+            rows = self._conn().execute(
+                f"SELECT key, value FROM checks WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            found.update((key, json.loads(value)) for key, value in rows)
+        return found
+
+    def put_many(self, items):
+        now = time.time()
+        rows = [(key, json.dumps(value), now) for key, value in items]
+        with self._conn() as conn:
+            conn.executemany("INSERT OR REPLACE INTO checks (key, value, created) VALUES (?, ?, ?)", rows)
+            self._writes += len(rows)
+            if self._writes >= self.PRUNE_EVERY:
+                self._writes = 0
+                conn.execute(
+                    "DELETE FROM checks WHERE key IN "
+                    "(SELECT key FROM checks ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+
+class AssumptionCache:
+    """記憶體中的 LRU（最多 max_entries 筆），沒有命中時再查持久化快取"""
+
+    def __init__(self, max_entries=CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.store = None
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, items):
+        with self._lock:
+            for key, value in items:
+                self._items[key] = value
+                self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def get_many(self, keys):
+        """{key: value}，只包含有快取的 key"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._items:
+                    self._items.move_to_end(key)
+                    found[key] = self._items[key]
+
+        rest = [key for key in keys if key not in found]
+        if rest and self.store is not None:
+            try:
+                stored = self.store.get_many(rest)
+            except sqlite3.Error:
+                stored = {}
+            self._remember(stored.items())
+            found.update(stored)
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        items = list(items)
+        self._remember(items)
+        if items and self.store is not None:
+            try:
+                self.store.put_many(items)
+            except sqlite3.Error:
+                pass  # 快取寫不進去不影響檢定結果
+
+    def cached(self, key, compute):
+        found = self.get_many([key])
+        if key in found:
+            return found[key]
+        value = compute()
+        self.put_many([(key, value)])
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+        self.hits = self.misses = 0
+
+
+CACHE = AssumptionCache()
+
+
+def use_store(db_path):
+    """開啟持久化快取（同一路徑只開一次）；db_path 為 None 時只用記憶體中的 LRU"""
+    if db_path is None:
+        CACHE.store = None
+    elif CACHE.store is None or CACHE.store.db_path != db_path:
+        try:
+            CACHE.store = AssumptionStore(db_path)
+        except sqlite3.Error:
+            CACHE.store = None  # 例如目錄唯讀：退回只用記憶體
+
+
+def _key(kind, *fingerprints):
+    return f"{kind}:v{CACHE_VERSION}:" + ":".join(fingerprints)
+
+
+def _describe(values):
+    return {
+        "n": int(len(values)),
+        "mean": float(np.mean(values)),
+        "median": float(np.median(values)),
+        "normality_p": float(st.shapiro(values).pvalue),
+    }
+
+
+def two_sample_checks(a, b):
+    """
+    兩個（已去除缺值的）欄位的敘述統計與前提檢定，回傳 (a 的摘要, b 的摘要, Levene p)。
+    摘要為 {"n", "mean", "median", "normality_p"}，數值與 st.shapiro / st.levene(center='mean') 相同
+    """
+    fa, fb = fingerprint(a), fingerprint(b)
+    desc_a = CACHE.cached(_key("describe", fa), lambda: _describe(a))
+    desc_b = CACHE.cached(_key("describe", fb), lambda: _describe(b))
+    levene_p = CACHE.cached(
+        _key("levene", fa, fb), lambda: float(st.levene(a, b, center="mean").pvalue)
+    )
+    return desc_a, desc_b, levene_p
+
+
+def cached_columns(kind, compute, *arrays):
+    """
+    逐欄計算的檢定（shapiro_columns、levene_columns）依欄位指紋快取。
+    arrays 為欄數相同的矩陣，第 j 欄的 key 由每個矩陣第 j 欄的指紋組成；
+    只對沒有快取的欄位呼叫 compute，回傳每欄的值
+    """
+    arrays = [np.asarray(a, dtype=float) for a in arrays]
+    arrays = [a[:, None] if a.ndim == 1 else a for a in arrays]
+    ncol = arrays[0].shape[1]
+    # 轉置後每欄是連續記憶體，指紋不必逐欄複製
+    transposed = [np.ascontiguousarray(a.T) for a in arrays]
+    keys = [_key(kind, *(fingerprint(t[j]) for t in transposed)) for j in range(ncol)]
+
+    found = CACHE.get_many(keys)
+    out = np.array([found.get(key, np.nan) for key in keys], dtype=float)
+    missing = [j for j, key in enumerate(keys) if key not in found]
+    if missing:
+        values = np.atleast_1d(compute(*(a[:, missing] for a in arrays))).astype(float)
+        out[missing] = values
+        CACHE.put_many((keys[j], float(v)) for j, v in zip(missing, values))
+    return out
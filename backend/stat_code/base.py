@@ -4,7 +4,42 @@ class statTest(ABC):
     name:str
     display_name:str
     result_prefix:str
+    # "table": run 回傳 ResultTable；"sections": 回傳 SectionResult（pretest / tables / posttest）
+    result_layout:str = "table"
+    # 上傳檔必須有的欄位、最少欄位數；在解析資料前就先以表頭檢查
+    required_columns:tuple = ()
+    min_columns:int = 0
+    # 分組欄位，讀取時轉成 category 以節省記憶體
+    group_columns:tuple = ()
+    # 批次模式（run_batch）指定欄位的方式："pairs" 為欄位配對（A:B），"columns" 為欄位清單；None 為不支援
+    batch:str = None
+    # 是否支援分塊（out-of-core）模式：逐塊累加 summary，不把整份資料讀進記憶體
+    chunked:bool = False
 
     @abstractmethod
-    def run(self,df):
-        pass
\ No newline at end of file
+    def run(self, df, resampling=None):
+        """
+        resampling 為選用的重抽樣設定：
+        {"permutation": bool, "bootstrap": bool, "resamples": int, "seed": int, "confidence": float}
+        """
+        pass
+
+    def run_batch(self, df, pairs=None, correction="holm", columns=None):
+        """
+        批次模式：一次對多組欄位做檢定，回傳單一表格（ResultTable），
+        p 值以 correction 做多重比較校正。
+        batch="pairs" 的檢定以 pairs（[(A, B), ...]）指定欄位配對，batch="columns" 的檢定以 columns 指定欄位；
+        未指定時使用全部欄位，給了另一種參數時丟出 ValueError
+        """
+        raise ValueError(f"{self.display_name}不支援批次模式")
+
+    def new_summary(self, columns, seed=0):
+        """
+        分塊模式：回傳可逐塊呼叫 update(df) 的累加器（見 summaries.py），
+        columns 為依表頭選出的欄位，seed 決定常態檢定用的子樣本
+        """
+        raise ValueError(f"{self.display_name}不支援分塊模式")
+
+    def run_summary(self, summary):
+        """分塊模式：由累加完成的 summary 計算結果，格式與 run 相同"""
+        raise ValueError(f"{self.display_name}不支援分塊模式")
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import scipy.stats as st
+
+from .assumptions import cached_columns
+from .options import CORRECTIONS, parse_pairs
+
+# 批次模式共用的向量化工具：每個欄位視為一個獨立的檢定，一次對整個矩陣計算
+
+
+def resolve_pairs(data: pd.DataFrame, pairs=None):
+    """沒有指定配對時，依欄位順序兩兩一組：(第1, 第2)、(第3, 第4)…"""
+    col = list(data.columns)
+    if pairs is None:
+        if len(col) < 2 or len(col) % 2:
+            raise ValueError("批次模式需要偶數個欄位，或以 pairs 指定欄位配對")
+        pairs = list(zip(col[0::2], col[1::2]))
+
+    missing = {c for pair in pairs for c in pair if c not in data.columns}
+    if missing:
+        raise ValueError(f"找不到欄位：{', '.join(map(str, sorted(missing, key=str)))}")
+    return pairs
+
+
+def as_matrix(data: pd.DataFrame, columns):
+    return data[list(columns)].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+
+def nan_moments(x):
+    """每個欄位的 (n, mean, var)，忽略 NaN"""
+    n = np.sum(~np.isnan(x), axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nansum(x, axis=0) / n
+        var = np.nansum((x - mean) ** 2, axis=0) / (n - 1)
+    return n, mean, var
+
+
+def shapiro_columns(x):
+    """逐欄 Shapiro-Wilk，依欄位內容快取（見 assumptions.py）"""
+    return cached_columns("shapiro", _shapiro_columns, x)
+
+
+def _shapiro_columns(x):
+    # 完全沒有 NaN 時 scipy 會一次處理整個矩陣
+    nan_policy = "omit" if np.isnan(x).any() else "propagate"
+    with np.errstate(invalid="ignore"):
+        return np.atleast_1d(st.shapiro(x, axis=0, nan_policy=nan_policy).pvalue)
+
+
+def levene_columns(x, y):
+    """兩組、以平均數為中心的 Levene 檢定（與 st.levene(center='mean') 相同），逐欄向量化並依欄位內容快取"""
+    return cached_columns("levene", _levene_columns, x, y)
+
+
+def _levene_columns(x, y):
+    nx, mx, _ = nan_moments(x)
+    ny, my, _ = nan_moments(y)
+    zx = np.abs(x - mx)
+    zy = np.abs(y - my)
+
+    _, zx_mean, zx_var = nan_moments(zx)
+    _, zy_mean, zy_var = nan_moments(zy)
+    n = nx + ny
+    z_mean = (nx * zx_mean + ny * zy_mean) / n
+
+    between = nx * (zx_mean - z_mean) ** 2 + ny * (zy_mean - z_mean) ** 2
+    within = (nx - 1) * zx_var + (ny - 1) * zy_var
+    with np.errstate(invalid="ignore", divide="ignore"):
+        w = (n - 2) * between / within
+    return st.f.sf(w, 1, n - 2)
+
+
+def adjust_pvalues(p, method="holm"):
+    """多重比較校正，NaN 不列入檢定數"""
+    if method not in CORRECTIONS:
+        raise ValueError(f"不支援的多重比較校正：{method}")
+
+    p = np.asarray(p, dtype=float)
+    adjusted = np.full_like(p, np.nan)
+    valid = ~np.isnan(p)
+    pv = p[valid]
+    m = len(pv)
+    if m == 0 or method == "none":
+        adjusted[valid] = pv
+        return adjusted
+
+    if method == "bonferroni":
+        adj = pv * m
+    elif method == "holm":
+        order = np.argsort(pv)
+        stepped = np.maximum.accumulate(pv[order] * (m - np.arange(m)))
+        adj = np.empty(m)
+        adj[order] = stepped
+    else:
+        adj = st.false_discovery_control(pv, method="bh")
+
+    adjusted[valid] = np.minimum(adj, 1)
+    return adjusted
+
+
+def round_or_none(values, digits=4):
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
@@ -4,8 +4,16 @@ import scipy.stats as st
 from scipy import stats
 from .base import statTest
 from . import register
+from .resampling import ttest_columns
+from .assumptions import two_sample_checks
+from .resultTable import ResultTable
+from .summaries import TwoColumnSummary, mann_whitney_p
+from .batch import (
+    resolve_pairs, as_matrix, nan_moments, shapiro_columns,
+    levene_columns, adjust_pvalues, round_or_none,
+)
 
-def t_test(data: pd.DataFrame):
+def t_test(data: pd.DataFrame, resampling=None):
     col = data.columns
     if len(col) < 2:
         raise ValueError("資料需要至少兩個欄位才能進行 t-test")
@@ -13,10 +21,9 @@ def t_test(data: pd.DataFrame):
     group1 = data[col[0]].dropna()
     group2 = data[col[1]].dropna()
 
-    # --- 檢定 ---
-    p1 = st.shapiro(group1).pvalue
-    p2 = st.shapiro(group2).pvalue
-    levene_p = st.levene(group1, group2, center='mean').pvalue
+    # --- 檢定（同一欄位的結果在各檢定間共用，見 assumptions.py）---
+    desc1, desc2, levene_p = two_sample_checks(group1, group2)
+    p1, p2 = desc1["normality_p"], desc2["normality_p"]
 
     # --- 選擇方法 ---
     if p1 < 0.05 or p2 < 0.05 or levene_p < 0.05:
@@ -31,8 +38,8 @@ def t_test(data: pd.DataFrame):
     results = [
         {
             "Group": col[0],
-            "Mean": np.mean(group1),
-            "Median": np.median(group1),
+            "Mean": desc1["mean"],
+            "Median": desc1["median"],
             "Normality p": p1,
             "Levene p": levene_p,
             "Method": method,
@@ -41,8 +48,8 @@ def t_test(data: pd.DataFrame):
         },
         {
             "Group": col[1],
-            "Mean": np.mean(group2),
-            "Median": np.median(group2),
+            "Mean": desc2["mean"],
+            "Median": desc2["median"],
             "Normality p": p2,
             # 只在第一列顯示 Levene / method / p-value
             "Levene p": None,
@@ -54,8 +61,8 @@ def t_test(data: pd.DataFrame):
 
     results = {
         "Group": [col[0], col[1]],
-        "Sample Size": [len(group1), len(group2)],
-        "Mean": [np.round(np.mean(group1),2), np.round(np.mean(group2),2)],
+        "Sample Size": [desc1["n"], desc2["n"]],
+        "Mean": [np.round(desc1["mean"],2), np.round(desc2["mean"],2)],
         # "Median": [np.round(np.median(group1),2), np.round(np.median(group2),2)],
         
         "Normality p": [np.round(p1,2), np.round(p2,2)],
@@ -64,15 +71,113 @@ def t_test(data: pd.DataFrame):
         # "p-value": [p_value<np.round(p_value,2), None],
         "p-value": ["p<0.05" if p_value < 0.05 else np.round(p_value, 2), None],
         "is_diff": [p_value < 0.05, None],
+        **ttest_columns(group1, group2, resampling),
     }
 
     return results
 
+def t_test_summary(summary: TwoColumnSummary):
+    """
+    分塊模式的 t_test，判斷規則相同：平均 / 變異數 / 樣本數為全部資料的值，
+    常態與 Levene 檢定用可重現的子樣本，Mann-Whitney U 由兩欄的 t-digest 近似
+    """
+    col = summary.columns
+    x, y = summary.x, summary.y
+    if x.n < 3 or y.n < 3:
+        raise ValueError("每個欄位至少需要三筆資料才能進行 t-test")
+
+    # --- 檢定 ---
+    p1 = st.shapiro(x.values).pvalue
+    p2 = st.shapiro(y.values).pvalue
+    levene_p = st.levene(x.values, y.values, center='mean').pvalue
+
+    # --- 選擇方法 ---
+    if p1 < 0.05 or p2 < 0.05 or levene_p < 0.05:
+        method = "Mann_Whitney U (approx.)"
+        p_value = mann_whitney_p(x.digest, y.digest)
+    else:
+        method = "t-test (Equal Var)"
+        p_value = stats.ttest_ind_from_stats(
+            x.mean, np.sqrt(x.var), x.n, y.mean, np.sqrt(y.var), y.n, equal_var=True
+        ).pvalue
+
+    return {
+        "Group": [col[0], col[1]],
+        "Sample Size": [x.n, y.n],
+        "Mean": [np.round(x.mean, 2), np.round(y.mean, 2)],
+        "Normality p": [np.round(p1, 2), np.round(p2, 2)],
+        "Levene p": [np.round(levene_p, 2), None],
+        "Method": [method, None],
+        "p-value": ["p<0.05" if p_value < 0.05 else np.round(p_value, 2), None],
+        "is_diff": [p_value < 0.05, None],
+    }
+
+def t_test_batch(data: pd.DataFrame, pairs=None, correction="holm"):
+    """對多組欄位配對一次做獨立樣本 t 檢定，判斷規則與 t_test 相同"""
+    pairs = resolve_pairs(data, pairs)
+    x = as_matrix(data, [a for a, _ in pairs])
+    y = as_matrix(data, [b for _, b in pairs])
+
+    # --- 檢定 ---
+    p1 = shapiro_columns(x)
+    p2 = shapiro_columns(y)
+    levene_p = levene_columns(x, y)
+    nonparametric = (p1 < 0.05) | (p2 < 0.05) | (levene_p < 0.05)
+
+    # --- Student t（Levene 不顯著才會走到 t-test，因此一律 equal var）---
+    n1, m1, v1 = nan_moments(x)
+    n2, m2, v2 = nan_moments(y)
+    dof = n1 + n2 - 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pooled = ((n1 - 1) * v1 + (n2 - 1) * v2) / dof
+        t = (m1 - m2) / np.sqrt(pooled * (1 / n1 + 1 / n2))
+    p_value = 2 * st.t.sf(np.abs(t), dof)
+
+    idx = np.flatnonzero(nonparametric)
+    if len(idx):
+        p_value[idx] = stats.mannwhitneyu(
+            x[:, idx], y[:, idx], alternative='two-sided', axis=0, nan_policy='omit'
+        ).pvalue
+
+    p_adj = adjust_pvalues(p_value, correction)
+    method = np.where(nonparametric, "Mann_Whitney U", "t-test (Equal Var)")
+
+    return {
+        "Group 1": [a for a, _ in pairs],
+        "Group 2": [b for _, b in pairs],
+        "Sample Size 1": n1.tolist(),
+        "Sample Size 2": n2.tolist(),
+        "Mean 1": round_or_none(m1, 2),
+        "Mean 2": round_or_none(m2, 2),
+        "Normality p 1": round_or_none(p1),
+        "Normality p 2": round_or_none(p2),
+        "Levene p": round_or_none(levene_p),
+        "Method": method.tolist(),
+        "p-value": round_or_none(p_value),
+        "p-adj": round_or_none(p_adj),
+        "Correction": [correction] * len(pairs),
+        "is_diff": (p_adj < 0.05).tolist(),
+    }
+
 @register
 class IndependentTTest(statTest):
     name = "independentTtest"
     display_name = "獨立樣本 t 檢定"
     result_prefix = "independent_t_test"
+    min_columns = 2
+    batch = "pairs"
+    chunked = True
+
+    def run(self, df: pd.DataFrame, resampling=None):
+        return ResultTable(t_test(df, resampling))
+
+    def new_summary(self, columns, seed=0):
+        return TwoColumnSummary(columns[:2], seed)
+
+    def run_summary(self, summary):
+        return ResultTable(t_test_summary(summary))
 
-    def run(self, df: pd.DataFrame):
-        return t_test(df)
\ No newline at end of file
+    def run_batch(self, df: pd.DataFrame, pairs=None, correction="holm", columns=None):
+        if columns is not None:
+            raise ValueError(f"{self.display_name}的批次模式以 pairs 指定欄位配對")
+        return ResultTable(t_test_batch(df, pairs, correction))
\ No newline at end of file
@@ -0,0 +1,30 @@
+# 請求選項（批次 / 重抽樣）的常數與解析。不依賴 numpy / pandas，web 行程 import 這裡不會載入計算相關套件
+
+# 批次模式的多重比較校正方法
+CORRECTIONS = ("holm", "bonferroni", "fdr_bh", "none")
+
+DEFAULT_RESAMPLES = 9999
+MAX_RESAMPLES = 100_000
+
+
+def parse_pairs(spec):
+    """'A:B,C:D' -> [('A', 'B'), ('C', 'D')]"""
+    if not spec:
+        return None
+    pairs = []
+    for item in spec.split(","):
+        left, sep, right = item.partition(":")
+        if not sep or not left.strip() or not right.strip():
+            raise ValueError(f"欄位配對格式錯誤：{item}（應為 A:B）")
+        pairs.append((left.strip(), right.strip()))
+    return pairs
+
+
+def parse_columns(spec):
+    """'A,B,C' -> ['A', 'B', 'C']"""
+    if not spec:
+        return None
+    columns = [c.strip() for c in spec.split(",")]
+    if not all(columns):
+        raise ValueError(f"欄位清單格式錯誤：{spec}（應為 A,B,C）")
+    return columns
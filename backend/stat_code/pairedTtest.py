@@ -4,8 +4,16 @@ import scipy.stats as st
 from scipy import stats
 from .base import statTest
 from . import register
+from .resampling import ttest_columns
+from .assumptions import two_sample_checks
+from .resultTable import ResultTable
+from .summaries import TwoColumnSummary, wilcoxon_p
+from .batch import (
+    resolve_pairs, as_matrix, nan_moments, shapiro_columns,
+    levene_columns, adjust_pvalues, round_or_none,
+)
 
-def paired_t_test(data: pd.DataFrame):
+def paired_t_test(data: pd.DataFrame, resampling=None):
     col = data.columns
     if len(col) < 2:
         raise ValueError("資料需要至少兩個欄位才能進行 t-test")
@@ -13,10 +21,9 @@ def paired_t_test(data: pd.DataFrame):
     group1 = data[col[0]].dropna()
     group2 = data[col[1]].dropna()
 
-    # --- 檢定 ---
-    p1 = st.shapiro(group1).pvalue
-    p2 = st.shapiro(group2).pvalue
-    levene_p = st.levene(group1, group2, center='mean').pvalue
+    # --- 檢定（同一欄位的結果在各檢定間共用，見 assumptions.py）---
+    desc1, desc2, levene_p = two_sample_checks(group1, group2)
+    p1, p2 = desc1["normality_p"], desc2["normality_p"]
 
     # --- 選擇方法 ---
     if p1 < 0.05 or p2 < 0.05 or levene_p < 0.05:
@@ -32,8 +39,8 @@ def paired_t_test(data: pd.DataFrame):
     results = [
         {
             "Group": col[0],
-            "Mean": np.mean(group1),
-            "Median": np.median(group1),
+            "Mean": desc1["mean"],
+            "Median": desc1["median"],
             "Normality p": p1,
             "Levene p": levene_p,
             "Method": method,
@@ -42,8 +49,8 @@ def paired_t_test(data: pd.DataFrame):
         },
         {
             "Group": col[1],
-            "Mean": np.mean(group2),
-            "Median": np.median(group2),
+            "Mean": desc2["mean"],
+            "Median": desc2["median"],
             "Normality p": p2,
             # 只在第一列顯示 Levene / method / p-value
             "Levene p": None,
@@ -55,8 +62,8 @@ def paired_t_test(data: pd.DataFrame):
 
     results = {
         "Group": [col[0], col[1]],
-        "Sample Size": [len(group1), len(group2)],
-        "Mean": [np.round(np.mean(group1),2), np.round(np.mean(group2),2)],
+        "Sample Size": [desc1["n"], desc2["n"]],
+        "Mean": [np.round(desc1["mean"],2), np.round(desc2["mean"],2)],
         # "Median": [np.round(np.median(group1),2), np.round(np.median(group2),2)],
         
         "Normality p": [np.round(p1,2), np.round(p2,2)],
@@ -64,18 +71,121 @@ def paired_t_test(data: pd.DataFrame):
         "Method": [method, None],
         "p-value": [np.round(p_value,2), None],
         "is_diff": [p_value < 0.05, None],
+        # 重抽樣以兩欄都有值的「對」為單位
+        **ttest_columns(data[col[0]], data[col[1]], resampling, paired=True),
     }
 
     return results
 
+def paired_t_test_summary(summary: TwoColumnSummary):
+    """
+    分塊模式的 paired_t_test，判斷規則相同：t 檢定由兩欄都有值的列的差值 Moments 計算，
+    常態與 Levene 檢定用成對的子樣本，Wilcoxon 由正負 |差值| 的 t-digest 近似
+    """
+    col = summary.columns
+    x, y = summary.x, summary.y
+    n = int(summary.diff.n[0])
+    if n < 3:
+        raise ValueError("至少需要三列兩個欄位都有值的資料才能進行 t-test")
+
+    # --- 檢定 ---
+    pairs = summary.pairs.values
+    p1 = st.shapiro(pairs[:, 0]).pvalue
+    p2 = st.shapiro(pairs[:, 1]).pvalue
+    levene_p = st.levene(pairs[:, 0], pairs[:, 1], center='mean').pvalue
+
+    # --- 選擇方法 ---
+    if p1 < 0.05 or p2 < 0.05 or levene_p < 0.05:
+        method = "Wilcoxon Signed-Rank (approx.)"
+        p_value = wilcoxon_p(summary.positive, summary.negative)
+    else:
+        method = "Paired t-test"
+        d_mean, d_var = float(summary.diff.mean[0]), float(summary.diff.var[0])
+        t = d_mean / np.sqrt(d_var / n)
+        p_value = 2 * st.t.sf(abs(t), n - 1)
+
+    return {
+        "Group": [col[0], col[1]],
+        "Sample Size": [x.n, y.n],
+        "Mean": [np.round(x.mean, 2), np.round(y.mean, 2)],
+        "Normality p": [np.round(p1, 2), np.round(p2, 2)],
+        "Levene p": [np.round(levene_p, 2), None],
+        "Method": [method, None],
+        "p-value": [np.round(p_value, 2), None],
+        "is_diff": [p_value < 0.05, None],
+    }
+
+def paired_t_test_batch(data: pd.DataFrame, pairs=None, correction="holm"):
+    """對多組欄位配對一次做成對樣本 t 檢定，判斷規則與 paired_t_test 相同"""
+    pairs = resolve_pairs(data, pairs)
+    x = as_matrix(data, [a for a, _ in pairs])
+    y = as_matrix(data, [b for _, b in pairs])
+
+    # 成對資料只保留兩欄都有值的列
+    missing = np.isnan(x) | np.isnan(y)
+    x[missing] = np.nan
+    y[missing] = np.nan
+    diff = x - y
+
+    # --- 檢定 ---
+    p1 = shapiro_columns(x)
+    p2 = shapiro_columns(y)
+    levene_p = levene_columns(x, y)
+    nonparametric = (p1 < 0.05) | (p2 < 0.05) | (levene_p < 0.05)
+
+    # --- Paired t：差值的單樣本 t 檢定 ---
+    n, d_mean, d_var = nan_moments(diff)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = d_mean / np.sqrt(d_var / n)
+    p_value = 2 * st.t.sf(np.abs(t), n - 1)
+
+    idx = np.flatnonzero(nonparametric)
+    if len(idx):
+        p_value[idx] = stats.wilcoxon(diff[:, idx], axis=0, nan_policy='omit').pvalue
+
+    p_adj = adjust_pvalues(p_value, correction)
+    method = np.where(nonparametric, "Wilcoxon Signed-Rank", "Paired t-test")
+    _, m1, _ = nan_moments(x)
+    _, m2, _ = nan_moments(y)
+
+    return {
+        "Group 1": [a for a, _ in pairs],
+        "Group 2": [b for _, b in pairs],
+        "Sample Size": n.tolist(),
+        "Mean 1": round_or_none(m1, 2),
+        "Mean 2": round_or_none(m2, 2),
+        "Normality p 1": round_or_none(p1),
+        "Normality p 2": round_or_none(p2),
+        "Levene p": round_or_none(levene_p),
+        "Method": method.tolist(),
+        "p-value": round_or_none(p_value),
+        "p-adj": round_or_none(p_adj),
+        "Correction": [correction] * len(pairs),
+        "is_diff": (p_adj < 0.05).tolist(),
+    }
+
 @register
 class pairedTTest(statTest):
     name = "pairedTtest"
     display_name = "成對樣本 t 檢定"
     result_prefix = "paired_t_test"
+    min_columns = 2
+    batch = "pairs"
+    chunked = True
+
+    def run(self, df: pd.DataFrame, resampling=None):
+        return ResultTable(paired_t_test(df, resampling))
+
+    def new_summary(self, columns, seed=0):
+        return TwoColumnSummary(columns[:2], seed, paired=True)
+
+    def run_summary(self, summary):
+        return ResultTable(paired_t_test_summary(summary))
 
-    def run(self, df: pd.DataFrame):
-        return paired_t_test(df)
+    def run_batch(self, df: pd.DataFrame, pairs=None, correction="holm", columns=None):
+        if columns is not None:
+            raise ValueError(f"{self.display_name}的批次模式以 pairs 指定欄位配對")
+        return ResultTable(paired_t_test_batch(df, pairs, correction))
     
 if __name__ == "__main__":
     # 測試用
@@ -1 +1,194 @@
-# 球形檢定
\ No newline at end of file
+import numpy as np
+import pandas as pd
+import scipy.stats as st
+
+from .base import statTest
+from . import register
+from .anova import format_p
+from .batch import adjust_pvalues, round_or_none
+from .groupStats import cell_stats, factor_codes
+from .resultTable import SectionResult
+
+
+# 球形檢定
+def sphericity(y):
+    """
+    Mauchly 球形檢定與 Greenhouse-Geisser / Huynh-Feldt 的 ε。
+
+    y 為受試者 × 條件的矩陣；以 Helmert 正交對比把 k 個條件轉成 k - 1 個差異分數，
+    再由其共變異數矩陣計算。回傳 dict：W、chi2、df、p、gg、hf、lower。
+    """
+    n, k = y.shape
+    p = k - 1
+    j = np.arange(1, k)[:, None]
+    i = np.arange(k)[None, :]
+    helmert = np.where(i < j, 1.0, np.where(i == j, -j, 0.0)) / np.sqrt(j * (j + 1))
+    cov = helmert @ np.cov(y, rowvar=False) @ helmert.T
+
+    trace = np.trace(cov)
+    gg = trace ** 2 / (p * np.trace(cov @ cov))
+    hf = min((n * p * gg - 2) / (p * (n - 1 - p * gg)), 1.0)
+    result = {"gg": gg, "hf": hf, "lower": 1 / p}
+
+    if p == 1:
+        # 只有兩個條件時球形假設必然成立
+        return {"W": 1.0, "chi2": 0.0, "df": 0, "p": 1.0, **result}
+
+    sign, logdet = np.linalg.slogdet(cov)
+    log_w = logdet - p * np.log(trace / p) if sign > 0 else -np.inf
+    chi2 = -(n - 1 - (2 * p ** 2 + p + 2) / (6 * p)) * log_w
+    df = p * (p + 1) // 2 - 1
+    return {"W": float(np.exp(log_w)), "chi2": chi2, "df": df, "p": st.chi2.sf(chi2, df), **result}
+
+
+def subject_matrix(data: pd.DataFrame):
+    """
+    長格式（subject / condition / score）轉成受試者 × 條件的平均分數矩陣。
+    同一受試者同一條件有多筆時取平均；缺少任一條件的受試者整列排除。
+    回傳 (矩陣, 條件水準, 排除的受試者數)
+    """
+    subjects, _ = factor_codes(data["subject"])
+    conditions, labels = factor_codes(data["condition"])
+    shape = (subjects.max(initial=-1) + 1, len(labels))
+    n, mean, _ = cell_stats((subjects, conditions), shape, data["score"])
+
+    complete = np.all(n > 0, axis=1)
+    return mean[complete], labels, int((~complete & (n.sum(axis=1) > 0)).sum())
+
+
+def pairwise_paired(y, labels, correction="holm"):
+    """條件兩兩做成對 t 檢定（一次對所有配對向量化計算），p 值以 correction 校正"""
+    n = len(y)
+    a, b = np.triu_indices(y.shape[1], k=1)
+    diff = y[:, a] - y[:, b]
+    mean = diff.mean(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = mean / (diff.std(axis=0, ddof=1) / np.sqrt(n))
+    p = 2 * st.t.sf(np.abs(t), n - 1)
+    p_adj = adjust_pvalues(p, correction)
+
+    high_is_a = mean >= 0
+    return {
+        'Group_High': np.where(high_is_a, labels[a], labels[b]).tolist(),
+        'Group_Low': np.where(high_is_a, labels[b], labels[a]).tolist(),
+        'Mean_Difference': np.round(np.abs(mean), 2).tolist(),
+        'p-value': [format_p(v) for v in p_adj.tolist()],
+        'is_diff': (p_adj < 0.05).tolist(),
+        'Method': [f"Paired t ({correction})"] * len(p),
+    }
+
+
+def repeated_anova(data: pd.DataFrame, resampling=None):
+    for col in ("subject", "condition", "score"):
+        if col not in data.columns:
+            raise ValueError("DataFrame 必須包含 'subject'、'condition' 與 'score' 欄位")
+    if resampling:
+        raise ValueError("重複量數變異數分析不支援重抽樣")
+
+    y, labels, excluded = subject_matrix(data)
+    n, k = y.shape
+    if k < 2:
+        raise ValueError("重複量數變異數分析至少需要兩個條件")
+    if n < 3:
+        raise ValueError("至少需要三位在每個條件都有資料的受試者")
+
+    # --- 平方和：條件、受試者、殘差（受試者 × 條件） ---
+    grand = y.mean()
+    cond_mean = y.mean(axis=0)
+    subj_mean = y.mean(axis=1)
+    ss_cond = n * np.sum((cond_mean - grand) ** 2)
+    ss_subj = k * np.sum((subj_mean - grand) ** 2)
+    ss_error = np.sum((y - subj_mean[:, None] - cond_mean[None, :] + grand) ** 2)
+    df_cond, df_subj, df_error = k - 1, n - 1, (k - 1) * (n - 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        f = (ss_cond / df_cond) / (ss_error / df_error)
+
+    sph = sphericity(y)
+    p_unc = st.f.sf(f, df_cond, df_error)
+    p_gg = st.f.sf(f, df_cond * sph["gg"], df_error * sph["gg"])
+    p_hf = st.f.sf(f, df_cond * sph["hf"], df_error * sph["hf"])
+
+    # 違反球形假設時，ε < 0.75 用 Greenhouse-Geisser，否則用 Huynh-Feldt
+    if sph["p"] >= 0.05:
+        p_value, method = p_unc, "Repeated-measures ANOVA"
+    elif sph["gg"] < 0.75:
+        p_value, method = p_gg, "Repeated-measures ANOVA (Greenhouse-Geisser)"
+    else:
+        p_value, method = p_hf, "Repeated-measures ANOVA (Huynh-Feldt)"
+    p_value = float(p_value)
+
+    pretest = {
+        'Condition': labels.tolist(),
+        'Sample Size': [n] * k,
+        'Mean': np.round(cond_mean, 2).tolist(),
+        'p-value': [format_p(p_value)] + [None] * (k - 1),
+        'is_diff': [p_value < 0.05] + [None] * (k - 1),
+        'Method': [method] + [None] * (k - 1),
+    }
+    anova_table = {
+        'Source': ["Condition", "Subject", "Error"],
+        'SS': round_or_none([ss_cond, ss_subj, ss_error], 2),
+        'df': [df_cond, df_subj, df_error],
+        'MS': round_or_none([ss_cond / df_cond, ss_subj / df_subj, ss_error / df_error], 2),
+        'F': [round(float(f), 2), None, None],
+        'p-value': [round(float(p_unc), 4), None, None],
+        'p-GG': [round(float(p_gg), 4), None, None],
+        'p-HF': [round(float(p_hf), 4), None, None],
+        'Excluded Subjects': [excluded, None, None],
+    }
+    sphericity_table = {
+        "Mauchly's W": [round(sph["W"], 4)],
+        'Chi-square': [round(float(sph["chi2"]), 2)],
+        'df': [sph["df"]],
+        'p-value': [round(float(sph["p"]), 4)],
+        'GG epsilon': [round(float(sph["gg"]), 4)],
+        'HF epsilon': [round(float(sph["hf"]), 4)],
+        'Lower-bound epsilon': [round(sph["lower"], 4)],
+    }
+
+    result = {
+        "post": p_value < 0.05,
+        "pretest": pretest,
+        "tables": [("變異數分析表", anova_table), ("球形檢定", sphericity_table)],
+    }
+    if result["post"]:
+        result["posttest"] = pairwise_paired(y, labels)
+    return result
+
+
+# 測試用資料：每位受試者在每個條件各測一次
+def generate_repeated_test_data(subjects=30, conditions=4, seed=42):
+    rng = np.random.default_rng(seed)
+    subject_effect = rng.normal(0, 5, size=subjects)
+    means = np.linspace(50, 55, conditions)
+    scores = subject_effect[:, None] + means[None, :] + rng.normal(0, 3, size=(subjects, conditions))
+    return pd.DataFrame({
+        "subject": np.repeat(np.arange(subjects), conditions),
+        "condition": np.tile([f"T{i}" for i in range(conditions)], subjects),
+        "score": scores.ravel(),
+    })
+
+
+@register
+class RepeatedANOVA(statTest):
+    name = "repeatedAnova"
+    display_name = "重複量數變異數分析"
+    result_prefix = "repeated_anova"
+    result_layout = "sections"
+    required_columns = ("subject", "condition", "score")
+    group_columns = ("subject", "condition")
+
+    def run(self, df: pd.DataFrame, resampling=None):
+        return SectionResult.of(repeated_anova(df, resampling))
+
+
+if __name__ == "__main__":
+    df = generate_repeated_test_data()
+    result = repeated_anova(df)
+
+    print(pd.DataFrame(result['pretest']))
+    for title, table in result['tables']:
+        print(title)
+        print(pd.DataFrame(table))
+    if result['post']:
+        print(pd.DataFrame(result['posttest']))
@@ -0,0 +1,305 @@
+import itertools
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .options import DEFAULT_RESAMPLES, MAX_RESAMPLES
+
+# 每個 chunk 最多產生多少個抽樣值（float64 約 64 MB），記憶體用量與總抽樣次數無關
+CHUNK_ELEMENTS = int(os.environ.get("RESAMPLE_CHUNK_ELEMENTS", 8_000_000))
+# 事後比較的 bootstrap 信賴區間要保留每次抽樣的各組平均（抽樣次數 × 組數），超過此數量時回 422
+MAX_BOOTSTRAP_MEANS = int(os.environ.get("RESAMPLE_MAX_BOOTSTRAP_MEANS", CHUNK_ELEMENTS))
+# 同時計算的 thread 數；numpy 的排序 / 加總會釋放 GIL
+RESAMPLE_THREADS = int(os.environ.get("RESAMPLE_THREADS", 1))
+
+
+def _chunk_sizes(total, width):
+    per_chunk = max(1, CHUNK_ELEMENTS // max(width, 1))
+    sizes = [per_chunk] * (total // per_chunk)
+    if total % per_chunk:
+        sizes.append(total % per_chunk)
+    return sizes
+
+
+def _map_chunks(fn, total, width, seed, threads=None):
+    """
+    把 total 次抽樣切成數個 chunk 分別計算，回傳各 chunk 的結果（依序）。
+    每個 chunk 的亂數種子由 SeedSequence(seed) 衍生，結果與 thread 數無關。
+    """
+    sizes = _chunk_sizes(total, width)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(np.random.default_rng(s), size) for s, size in zip(seeds, sizes)]
+    threads = threads or RESAMPLE_THREADS
+    if threads <= 1 or len(jobs) == 1:
+        return [fn(rng, size) for rng, size in jobs]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(lambda job: fn(*job), jobs))
+
+
+def _at_least(stat, observed):
+    # 浮點誤差內視為相等（排列後與觀察值相同的情況）
+    return stat >= observed - 1e-12 * np.maximum(1.0, np.abs(observed))
+
+
+def _clean(x):
+    x = np.asarray(x, dtype=float)
+    return x[~np.isnan(x)]
+
+
+def permutation_ind(x, y, resamples=DEFAULT_RESAMPLES, seed=0, threads=None):
+    """
+    兩獨立樣本平均數差的雙尾 permutation test。
+    所有排列數不超過 resamples 時做精確列舉，否則隨機抽 resamples 次。
+    回傳 (p 值, 是否為精確檢定)
+    """
+    x, y = _clean(x), _clean(y)
+    pooled = np.concatenate([x, y])
+    n, nx = len(pooled), len(x)
+    total_sum = pooled.sum()
+    observed = abs(x.mean() - y.mean())
+
+    def diffs(first_sums):
+        return np.abs(first_sums / nx - (total_sum - first_sums) / (n - nx))
+
+    combos = math.comb(n, nx)
+    if combos <= resamples:
+        it = itertools.combinations(range(n), nx)
+        count = 0
+        for size in _chunk_sizes(combos, nx):
+            idx = np.fromiter(itertools.chain.from_iterable(itertools.islice(it, size)),
+                              dtype=np.intp, count=size * nx).reshape(size, nx)
+            count += int(_at_least(diffs(pooled[idx].sum(axis=1)), observed).sum())
+        return count / combos, True
+
+    def chunk(rng, size):
+        perm = rng.permuted(np.tile(pooled, (size, 1)), axis=1)
+        return int(_at_least(diffs(perm[:, :nx].sum(axis=1)), observed).sum())
+
+    count = sum(_map_chunks(chunk, resamples, n, seed, threads))
+    return (count + 1) / (resamples + 1), False
+
+
+def permutation_paired(x, y, resamples=DEFAULT_RESAMPLES, seed=0, threads=None):
+    """
+    成對樣本的 sign-flip permutation test（差值平均數，雙尾）。
+    2^n 不超過 resamples 時列舉所有正負號組合。回傳 (p 值, 是否為精確檢定)
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    d = x - y
+    d = d[~np.isnan(d)]
+    n = len(d)
+    observed = abs(d.mean())
+
+    if n < 63 and 2 ** n <= resamples:
+        total = 2 ** n
+        bits = np.arange(n, dtype=np.int64)
+        count, start = 0, 0
+        for size in _chunk_sizes(total, n):
+            codes = np.arange(start, start + size, dtype=np.int64)
+            signs = 1 - 2 * ((codes[:, None] >> bits) & 1)
+            count += int(_at_least(np.abs(signs @ d) / n, observed).sum())
+            start += size
+        return count / total, True
+
+    def chunk(rng, size):
+        signs = rng.choice(np.array([-1.0, 1.0]), size=(size, n))
+        return int(_at_least(np.abs(signs @ d) / n, observed).sum())
+
+    count = sum(_map_chunks(chunk, resamples, n, seed, threads))
+    return (count + 1) / (resamples + 1), False
+
+
+def _percentile_ci(samples, confidence):
+    alpha = (1 - confidence) / 2 * 100
+    lo, hi = np.nanpercentile(samples, [alpha, 100 - alpha], axis=0)
+    return lo, hi
+
+
+def bootstrap_ind(x, y, resamples=DEFAULT_RESAMPLES, seed=0, confidence=0.95, threads=None):
+    """
+    兩獨立樣本平均數差（x - y）與 Cohen's d 的 percentile bootstrap 信賴區間，
+    兩組各自重抽。回傳 {"diff", "diff_ci", "d", "d_ci"}
+    """
+    x, y = _clean(x), _clean(y)
+    nx, ny = len(x), len(y)
+
+    def cohen_d(mx, my, vx, vy):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pooled = np.sqrt(((nx - 1) * vx + (ny - 1) * vy) / (nx + ny - 2))
+            return (mx - my) / pooled
+
+    def chunk(rng, size):
+        bx = x[rng.integers(0, nx, size=(size, nx))]
+        by = y[rng.integers(0, ny, size=(size, ny))]
+        mx, my = bx.mean(axis=1), by.mean(axis=1)
+        return np.column_stack([mx - my, cohen_d(mx, my, bx.var(axis=1, ddof=1), by.var(axis=1, ddof=1))])
+
+    samples = np.concatenate(_map_chunks(chunk, resamples, nx + ny, seed, threads))
+    lo, hi = _percentile_ci(samples, confidence)
+    return {
+        "diff": x.mean() - y.mean(),
+        "diff_ci": (lo[0], hi[0]),
+        "d": cohen_d(x.mean(), y.mean(), x.var(ddof=1), y.var(ddof=1)),
+        "d_ci": (lo[1], hi[1]),
+    }
+
+
+def bootstrap_paired(x, y, resamples=DEFAULT_RESAMPLES, seed=0, confidence=0.95, threads=None):
+    """成對差值平均數與 Cohen's dz 的 percentile bootstrap 信賴區間，以「對」為單位重抽"""
+    d = np.asarray(x, dtype=float) - np.asarray(y, dtype=float)
+    d = d[~np.isnan(d)]
+    n = len(d)
+
+    def chunk(rng, size):
+        b = d[rng.integers(0, n, size=(size, n))]
+        m = b.mean(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.column_stack([m, m / b.std(axis=1, ddof=1)])
+
+    samples = np.concatenate(_map_chunks(chunk, resamples, n, seed, threads))
+    lo, hi = _percentile_ci(samples, confidence)
+    return {
+        "diff": d.mean(),
+        "diff_ci": (lo[0], hi[0]),
+        "d": d.mean() / d.std(ddof=1),
+        "d_ci": (lo[1], hi[1]),
+    }
+
+
+def _group_layout(gs, col):
+    present = np.flatnonzero(gs.present[:, col])
+    values = [gs.group_values(g, col) for g in present]
+    sizes = np.array([len(v) for v in values])
+    position = np.full(len(gs.labels), -1)
+    position[present] = np.arange(len(present))
+    return np.concatenate(values), sizes, np.concatenate([[0], np.cumsum(sizes)[:-1]]), position
+
+
+def _pair_chunks(n_pairs, replicates):
+    # 依配對數切塊，避免 (抽樣次數 × 配對數) 的矩陣太大
+    step = max(1, CHUNK_ELEMENTS // max(replicates, 1))
+    return [slice(i, min(i + step, n_pairs)) for i in range(0, n_pairs, step)]
+
+
+def posthoc_permutation(gs, a, b, resamples=DEFAULT_RESAMPLES, seed=0, col=0, threads=None):
+    """
+    事後比較的 permutation p 值（single-step max-T，已控制 family-wise error）：
+    每次打亂全部資料的組別後，取所有配對 |平均差| / sqrt(1/na + 1/nb) 的最大值，
+    與各配對的觀察值比較。
+    """
+    values, sizes, starts, position = _group_layout(gs, col)
+    pa, pb = position[a], position[b]
+    scale = np.sqrt(1 / sizes[pa] + 1 / sizes[pb])
+    means = np.add.reduceat(values, starts) / sizes
+    observed = np.abs(means[pa] - means[pb]) / scale
+    n = len(values)
+
+    def chunk(rng, size):
+        perm = rng.permuted(np.tile(values, (size, 1)), axis=1)
+        m = np.add.reduceat(perm, starts, axis=1) / sizes
+        max_stat = np.zeros(size)
+        for s in _pair_chunks(len(pa), size):
+            stat = np.abs(m[:, pa[s]] - m[:, pb[s]]) / scale[s]
+            max_stat = np.maximum(max_stat, stat.max(axis=1))
+
+        counts = np.empty(len(pa), dtype=np.int64)
+        for s in _pair_chunks(len(pa), size):
+            counts[s] = _at_least(max_stat[:, None], observed[None, s]).sum(axis=0)
+        return counts
+
+    counts = sum(_map_chunks(chunk, resamples, max(n, len(pa)), seed, threads))
+    return (counts + 1) / (resamples + 1)
+
+
+def posthoc_bootstrap(gs, a, b, resamples=DEFAULT_RESAMPLES, seed=0, confidence=0.95, col=0, threads=None):
+    """
+    事後比較各配對平均差（A - B）的 percentile bootstrap 信賴區間，每組各自重抽。
+    percentile 需要每個配對完整的抽樣分佈，因此保留 resamples × 組數 的平均，上限為 MAX_BOOTSTRAP_MEANS
+    """
+    values, sizes, starts, position = _group_layout(gs, col)
+    if resamples * len(sizes) > MAX_BOOTSTRAP_MEANS:
+        raise ValueError(
+            f"組數過多：{len(sizes)} 組的 bootstrap 信賴區間最多只能抽樣 "
+            f"{max(1, MAX_BOOTSTRAP_MEANS // len(sizes))} 次，請減少 resamples"
+        )
+    pa, pb = position[a], position[b]
+    group_of = np.repeat(np.arange(len(sizes)), sizes)
+
+    def chunk(rng, size):
+        offset = np.floor(rng.random((size, len(values))) * sizes[group_of]).astype(np.intp)
+        sample = values[starts[group_of] + offset]
+        return np.add.reduceat(sample, starts, axis=1) / sizes
+
+    means = np.concatenate(_map_chunks(chunk, resamples, len(values), seed, threads))
+    lo = np.empty(len(pa))
+    hi = np.empty(len(pa))
+    for s in _pair_chunks(len(pa), resamples):
+        lo[s], hi[s] = _percentile_ci(means[:, pa[s]] - means[:, pb[s]], confidence)
+    return lo, hi
+
+
+def _ci_text(lo, hi, digits=2):
+    return f"[{round(float(lo), digits)}, {round(float(hi), digits)}]"
+
+
+def _options(resampling):
+    return (
+        resampling.get("resamples", DEFAULT_RESAMPLES),
+        resampling.get("seed", 0),
+        resampling.get("confidence", 0.95),
+    )
+
+
+def ttest_columns(x, y, resampling, paired=False):
+    """
+    t 檢定結果表要加上的欄位（兩列，只有第一列有值）：
+    permutation=True 加上 permutation p，bootstrap=True 加上平均差與效果量的信賴區間
+    """
+    if not resampling:
+        return {}
+    resamples, seed, confidence = _options(resampling)
+    columns = {}
+
+    if resampling.get("permutation"):
+        test = permutation_paired if paired else permutation_ind
+        p, exact = test(x, y, resamples, seed)
+        columns["Permutation p"] = [round(p, 4), None]
+        columns["Permutation"] = ["exact" if exact else f"{resamples} resamples", None]
+
+    if resampling.get("bootstrap"):
+        boot = (bootstrap_paired if paired else bootstrap_ind)(x, y, resamples, seed, confidence)
+        level = f"{confidence * 100:g}%"
+        effect = "Cohen's dz" if paired else "Cohen's d"
+        columns["Mean Diff"] = [round(float(boot["diff"]), 2), None]
+        columns[f"Mean Diff {level} CI"] = [_ci_text(*boot["diff_ci"]), None]
+        columns[effect] = [round(float(boot["d"]), 2), None]
+        columns[f"{effect} {level} CI"] = [_ci_text(*boot["d_ci"]), None]
+
+    return columns
+
+
+def posthoc_columns(gs, res, resampling, col=0):
+    """
+    ANOVA 事後比較表要加上的欄位；res 為 GroupStats.tukey_hsd / games_howell 的結果。
+    信賴區間為 Group_High - Group_Low 的平均差。
+    """
+    if not resampling:
+        return {}
+    resamples, seed, confidence = _options(resampling)
+    a, b = gs.pairs(col)
+    columns = {}
+
+    if resampling.get("permutation"):
+        p = posthoc_permutation(gs, a, b, resamples, seed, col)
+        columns["Permutation p"] = np.round(p, 4).tolist()
+
+    if resampling.get("bootstrap"):
+        lo, hi = posthoc_bootstrap(gs, a, b, resamples, seed, confidence, col)
+        high_is_a = res["mean_A"] >= res["mean_B"]
+        lo, hi = np.where(high_is_a, lo, -hi), np.where(high_is_a, hi, -lo)
+        columns[f"Mean Diff {confidence * 100:g}% CI"] = [_ci_text(l, h) for l, h in zip(lo, hi)]
+
+    return columns
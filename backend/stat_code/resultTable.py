@@ -0,0 +1,108 @@
+import math
+from collections.abc import Mapping
+
+# 檢定結果的欄式表示：每個欄位一個 list，直接輸出成 JSON 與報表，不經過 DataFrame
+
+
+def _value(v):
+    # numpy 純量轉成 Python 型別，NaN 與 None 一律為 None（輸出時才決定寫成 "" 或空白儲存格）
+    if hasattr(v, "item"):
+        v = v.item()
+    if isinstance(v, float) and math.isnan(v):
+        return None
+    return v
+
+
+def _column(values):
+    if hasattr(values, "tolist"):  # numpy array：一次轉成 Python list
+        values = values.tolist()
+    return [_value(v) for v in values]
+
+
+class ResultTable(Mapping):
+    """
+    一個結果表格：欄名 columns 與每欄的值 arrays（長度相同）。
+
+    也是唯讀的 Mapping（欄名 -> list），table["p-value"] 等舊的 dict-of-lists 用法照常可用；
+    需要 DataFrame 時用 pd.DataFrame(dict(table))。
+    """
+
+    __slots__ = ("columns", "arrays")
+
+    def __init__(self, table):
+        if isinstance(table, ResultTable):
+            self.columns, self.arrays = table.columns, table.arrays
+            return
+        self.columns = list(table.keys())
+        self.arrays = [_column(v) for v in table.values()]
+        lengths = {len(v) for v in self.arrays}
+        if len(lengths) > 1:
+            raise ValueError("結果表格的每個欄位長度必須相同")
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __getitem__(self, column):
+        try:
+            return self.arrays[self.columns.index(column)]
+        except ValueError:
+            raise KeyError(column) from None
+
+    @property
+    def n_rows(self):
+        return len(self.arrays[0]) if self.arrays else 0
+
+    def rows(self):
+        """逐列產生 tuple（報表用），None 寫成空白儲存格"""
+        return zip(*self.arrays)
+
+    def records(self):
+        """每列一個 dict，None 轉成 ""（與舊流程的 DataFrame.fillna("").to_dict("records") 相同）"""
+        columns = self.columns
+        return [
+            {c: "" if v is None else v for c, v in zip(columns, row)}
+            for row in zip(*self.arrays)
+        ]
+
+    def to_json(self):
+        return {"columns": list(self.columns), "data": self.records()}
+
+
+class SectionResult:
+    """
+    前測 + 其他表格 + 事後比較（result_layout = "sections" 的檢定）。
+
+    tables 為 [(標題, ResultTable)]，例如重複量數 ANOVA 的變異數分析表與球形檢定；
+    支援 result["pretest"] 等舊的 dict 取值方式
+    """
+
+    __slots__ = ("post", "pretest", "tables", "posttest")
+
+    def __init__(self, pretest, post=False, posttest=None, tables=()):
+        self.pretest = ResultTable(pretest)
+        self.post = bool(post)
+        self.tables = [(title, ResultTable(t)) for title, t in tables]
+        self.posttest = ResultTable(posttest) if post else None
+
+    @classmethod
+    def of(cls, result):
+        if isinstance(result, SectionResult):
+            return result
+        return cls(
+            result["pretest"],
+            post=result["post"],
+            posttest=result.get("posttest"),
+            tables=result.get("tables", ()),
+        )
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
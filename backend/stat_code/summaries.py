@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+
+# 分塊（out-of-core）模式用的可合併統計量：逐塊 update，記憶體只與組數 / 樣本上限有關，與資料列數無關
+
+# 常態 / 變異數同質檢定用的子樣本大小（scipy 的 Shapiro-Wilk 超過 5000 筆 p 值本來就不準）
+SAMPLE_SIZE = 5000
+# t-digest 的壓縮參數，centroid 數約為 compression / 2
+COMPRESSION = 500
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def row_keys(start, count, seed=0):
+    """
+    第 start ~ start + count - 1 列的亂數鍵（SplitMix64），只由列號與 seed 決定。
+    取鍵最小的 k 列作為子樣本，結果與分塊大小無關、可重現。
+    """
+    x = np.arange(start, start + count, dtype=np.uint64) + np.uint64(seed) * _GOLDEN
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class Moments:
+    """
+    每組的 n、平均與平方離差和（M2）。每塊先以 bincount 算出該塊的值，
+    再用 Chan 的平行版 Welford 公式合併，不會有 Σx² - n·mean² 的精度問題。
+    """
+
+    def __init__(self, groups=1):
+        self.n = np.zeros(groups, dtype=np.int64)
+        self.mean = np.zeros(groups)
+        self.m2 = np.zeros(groups)
+
+    def _grow(self, groups):
+        extra = groups - len(self.n)
+        if extra > 0:
+            self.n = np.concatenate([self.n, np.zeros(extra, dtype=np.int64)])
+            self.mean = np.concatenate([self.mean, np.zeros(extra)])
+            self.m2 = np.concatenate([self.m2, np.zeros(extra)])
+
+    def update(self, values, codes=None, groups=1):
+        values = np.asarray(values, dtype=float)
+        codes = np.zeros(len(values), dtype=np.intp) if codes is None else codes
+        keep = ~np.isnan(values) & (codes >= 0)
+        values, codes = values[keep], codes[keep]
+        self._grow(groups)
+
+        n_b = np.bincount(codes, minlength=len(self.n))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.bincount(codes, weights=values, minlength=len(self.n)) / n_b
+        m2_b = np.bincount(codes, weights=(values - mean_b[codes]) ** 2, minlength=len(self.n))
+        self.merge(n_b, np.nan_to_num(mean_b), m2_b)
+
+    def merge(self, n_b, mean_b, m2_b):
+        n_a = self.n
+        n = n_a + n_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean_b - self.mean
+            self.mean = np.where(n > 0, self.mean + delta * n_b / np.maximum(n, 1), 0.0)
+            self.m2 = self.m2 + m2_b + delta ** 2 * n_a * n_b / np.maximum(n, 1)
+        self.n = n
+
+    @property
+    def var(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.n > 1, self.m2 / (self.n - 1), np.nan)
+
+
+class TDigest:
+    """
+    合併式 t-digest（Dunning & Ertl），以少量 centroid 近似整個分佈，用於中位數、
+    分位數與 CDF（Mann-Whitney / Wilcoxon 的等級和）。兩端 centroid 較小，尾端較準確。
+    """
+
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(len(values))]))
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]),
+                       np.concatenate([self.weights, other.weights]))
+
+    def _compress(self, means, weights):
+        # 依 k1 尺度函數 k(q) = δ / 2π · asin(2q - 1) 分桶：左端分位數落在同一個單位區間的點合成一個 centroid
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        cum = np.cumsum(weights)
+        q_left = (cum - weights) / cum[-1]
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q_left - 1)
+        bucket = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def _knots(self):
+        # centroid 的累積權重取中點，兩端補上最小值 / 最大值
+        mid = np.cumsum(self.weights) - self.weights / 2
+        return np.r_[self.min, self.means, self.max], np.r_[0.0, mid, self.count]
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        x, c = self._knots()
+        return np.interp(np.asarray(q) * self.count, c, x)
+
+    def cdf(self, values):
+        """P(X <= values) 的近似值（連續內插，相等值視為各半）"""
+        if self.count == 0:
+            return np.zeros_like(np.asarray(values, dtype=float))
+        x, c = self._knots()
+        return np.interp(values, x, c) / self.count
+
+
+class Sample:
+    """
+    每組最多 size 筆的可重現子樣本：保留亂數鍵（row_keys）最小的 size 列（bottom-k 抽樣），
+    等同於從全部資料中不放回隨機抽 size 筆，結果與分塊方式無關
+    """
+
+    def __init__(self, size=SAMPLE_SIZE, width=1):
+        self.size = size
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.codes = np.empty(0, dtype=np.intp)
+        self.values = np.empty((0, width))
+
+    def update(self, keys, values, codes=None):
+        values = np.asarray(values, dtype=float).reshape(len(keys), -1)
+        codes = np.zeros(len(keys), dtype=np.intp) if codes is None else codes
+        keys = np.concatenate([self.keys, keys])
+        codes = np.concatenate([self.codes, codes])
+        values = np.concatenate([self.values, values])
+
+        order = np.lexsort((keys, codes))
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        rank = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+        keep = order[rank < self.size]
+        self.keys, self.codes, self.values = keys[keep], codes[keep], values[keep]
+
+    def group(self, code=0, col=0):
+        block = self.values[self.codes == code, col]
+        return block[~np.isnan(block)]
+
+
+class ColumnSummary:
+    """單一數值欄位：Moments、TDigest 與子樣本"""
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.moments = Moments()
+        self.digest = TDigest()
+        self.sample = Sample()
+
+    def update(self, values, start):
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        self.moments.update(values)
+        self.digest.update(values)
+        self.sample.update(row_keys(start, len(values), self.seed)[valid], values[valid])
+
+    @property
+    def n(self):
+        return int(self.moments.n[0])
+
+    @property
+    def mean(self):
+        return float(self.moments.mean[0])
+
+    @property
+    def var(self):
+        return float(self.moments.var[0])
+
+    @property
+    def values(self):
+        return self.sample.group()
+
+
+class TwoColumnSummary:
+    """
+    兩個數值欄位（t 檢定）。paired=True 時另外累加兩欄都有值的列的差值 d：
+    d 的 Moments、正負 |d| 各一個 TDigest（Wilcoxon 等級和）與成對子樣本
+    """
+
+    def __init__(self, columns, seed=0, paired=False):
+        self.columns = list(columns)
+        self.seed = seed
+        self.paired = paired
+        self.rows = 0
+        self.x = ColumnSummary(seed)
+        self.y = ColumnSummary(seed)
+        if paired:
+            self.diff = Moments()
+            self.positive = TDigest()
+            self.negative = TDigest()
+            self.pairs = Sample(width=2)
+
+    def update(self, df: pd.DataFrame):
+        x = df[self.columns[0]].to_numpy(dtype=float)
+        y = df[self.columns[1]].to_numpy(dtype=float)
+        self.x.update(x, self.rows)
+        self.y.update(y, self.rows)
+        if self.paired:
+            both = ~np.isnan(x) & ~np.isnan(y)
+            d = x[both] - y[both]
+            self.diff.update(d)
+            self.positive.update(d[d > 0])
+            self.negative.update(-d[d < 0])
+            keys = row_keys(self.rows, len(x), self.seed)[both]
+            self.pairs.update(keys, np.column_stack([x[both], y[both]]))
+        self.rows += len(df)
+
+
+class GroupSummary:
+    """
+    分組欄位 + 分數欄位（ANOVA）：每組的 Moments 與子樣本。
+    組別依在檔案中第一次出現的順序編號（index 為 組名 -> 編號）
+    """
+
+    def __init__(self, group_column="group", value_column="score", seed=0):
+        self.group_column = group_column
+        self.value_column = value_column
+        self.seed = seed
+        self.rows = 0
+        self.index = {}
+        self.moments = Moments(0)
+        self.sample = Sample()
+
+    def update(self, df: pd.DataFrame):
+        codes, uniques = pd.factorize(df[self.group_column])
+        mapping = np.array([self.index.setdefault(u, len(self.index)) for u in uniques], dtype=np.intp)
+        codes = np.where(codes >= 0, mapping[codes] if len(mapping) else codes, -1)
+
+        values = pd.to_numeric(df[self.value_column], errors="coerce").to_numpy(dtype=float)
+        self.moments.update(values, codes, len(self.index))
+        valid = (codes >= 0) & ~np.isnan(values)
+        keys = row_keys(self.rows, len(values), self.seed)[valid]
+        self.sample.update(keys, values[valid], codes[valid])
+        self.rows += len(df)
+
+
+def mann_whitney_p(x: TDigest, y: TDigest):
+    """
+    由兩個 t-digest 近似雙尾 Mann-Whitney U 檢定（大樣本常態近似，不做連續性與同分校正）：
+    U = Σ_x n_y · F_y(x)，每個 x 的 centroid 以其平均代表
+    """
+    import scipy.stats as st
+
+    n1, n2 = x.count, y.count
+    u = float(np.sum(x.weights * y.cdf(x.means))) * n2
+    sd = np.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    return float(2 * st.norm.sf(abs(u - n1 * n2 / 2) / sd))
+
+
+def wilcoxon_p(positive: TDigest, negative: TDigest):
+    """
+    由正差值與負差值的 |d| 各一個 t-digest 近似雙尾 Wilcoxon signed-rank 檢定（常態近似，差值為 0 的列不列入）：
+    |d| = v 的等級約為 n₊·F₊(v) + n₋·F₋(v)，W₊ 為正差值 centroid 的等級和
+    """
+    import scipy.stats as st
+
+    n_pos, n_neg = positive.count, negative.count
+    n = n_pos + n_neg
+    if n == 0:
+        return np.nan
+    ranks = n_pos * positive.cdf(positive.means) + n_neg * negative.cdf(positive.means) + 0.5
+    w = float(np.sum(positive.weights * ranks)) if n_pos else 0.0
+    sd = np.sqrt(n * (n + 1) * (2 * n + 1) / 24)
+    return float(2 * st.norm.sf(abs(w - n * (n + 1) / 4) / sd))
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+import scipy.stats as st
+
+from .base import statTest
+from . import register
+from .anova import format_p
+from .batch import round_or_none
+from .groupStats import cell_stats, factor_codes
+from .resultTable import SectionResult
+
+
+def _additive_fit(n, sums):
+    """
+    加法模型（A + B，無交互作用）的迴歸平方和與自由度。
+
+    正規方程式 X'X、X'y 直接由每格的 n 與總和組成（大小只跟水準數有關，與資料列數無關），
+    缺格或不連通的設計以 lstsq 取得最小範數解，平方和不受影響。
+    """
+    a, b = n.shape
+    xtx = np.zeros((a + b - 1, a + b - 1))
+    xtx[:a, :a] = np.diag(n.sum(axis=1))
+    xtx[:a, a:] = n[:, 1:]
+    xtx[a:, :a] = n[:, 1:].T
+    xtx[a:, a:] = np.diag(n.sum(axis=0)[1:])
+    xty = np.concatenate([sums.sum(axis=1), sums.sum(axis=0)[1:]])
+    beta = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+    return float(beta @ xty), int(np.linalg.matrix_rank(xtx))
+
+
+def _marginal_ss(n, sums):
+    present = n > 0
+    return float(np.sum(sums[present] ** 2 / n[present]))
+
+
+def two_way_anova(data: pd.DataFrame, resampling=None):
+    """
+    二因子變異數分析（Type II 平方和，與 statsmodels anova_lm(typ=2) 相同）。
+
+    先以 cell_stats 算出每格的 n / 平均 / 平方離差和，之後的模型都只用這些充分統計量：
+    SS(A | B) = SS(A + B) - SS(B)、SS(B | A) = SS(A + B) - SS(A)、
+    SS(A × B) = SS(格平均) - SS(A + B)，殘差為格內平方離差和。
+    """
+    for col in ("factor_a", "factor_b", "score"):
+        if col not in data.columns:
+            raise ValueError("DataFrame 必須包含 'factor_a'、'factor_b' 與 'score' 欄位")
+    if resampling:
+        raise ValueError("二因子變異數分析不支援重抽樣")
+
+    a_codes, a_labels = factor_codes(data["factor_a"])
+    b_codes, b_labels = factor_codes(data["factor_b"])
+    n, mean, ss = cell_stats((a_codes, b_codes), (len(a_labels), len(b_labels)), data["score"])
+
+    # 只保留有資料的水準
+    rows, cols = n.sum(axis=1) > 0, n.sum(axis=0) > 0
+    n, mean, ss = n[rows][:, cols], mean[rows][:, cols], ss[rows][:, cols]
+    a_labels, b_labels = a_labels[rows], b_labels[cols]
+    levels_a, levels_b = n.shape
+    if levels_a < 2 or levels_b < 2:
+        raise ValueError("兩個因子都至少需要兩個水準")
+
+    present = n > 0
+    total = int(n.sum())
+    cells = int(present.sum())
+    df_resid = total - cells
+    if df_resid < 1:
+        raise ValueError("資料不足：至少需要一格有兩筆以上的資料")
+
+    # 以總平均置中，避免未置中的平方和相減時損失精度
+    grand = np.sum(np.where(present, n * mean, 0)) / total
+    sums = np.where(present, n * (mean - grand), 0)
+
+    ss_a_only = _marginal_ss(n.sum(axis=1), sums.sum(axis=1))
+    ss_b_only = _marginal_ss(n.sum(axis=0), sums.sum(axis=0))
+    ss_additive, rank_additive = _additive_fit(n, sums)
+    ss_cells = _marginal_ss(n, sums)
+
+    ss_effects = np.array([ss_additive - ss_b_only, ss_additive - ss_a_only, ss_cells - ss_additive])
+    df_effects = np.array([rank_additive - levels_b, rank_additive - levels_a, cells - rank_additive])
+    ss_resid = float(ss.sum())
+    ms_resid = ss_resid / df_resid
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ms = ss_effects / df_effects
+        f = ms / ms_resid
+        eta = ss_effects / (ss_effects + ss_resid)
+    p = st.f.sf(f, df_effects, df_resid)
+
+    anova_table = {
+        'Source': ["factor_a", "factor_b", "factor_a × factor_b", "Residual"],
+        'SS': round_or_none(np.append(ss_effects, ss_resid), 2),
+        'df': df_effects.tolist() + [df_resid],
+        'MS': round_or_none(np.append(ms, ms_resid), 2),
+        'F': round_or_none(f, 2) + [None],
+        'p-value': [None if np.isnan(v) else format_p(v) for v in p.tolist()] + [None],
+        'Partial eta sq': round_or_none(eta, 3) + [None],
+        'is_diff': (p < 0.05).tolist() + [None],
+        'Method': ["Two-way ANOVA (Type II)", None, None, None],
+    }
+
+    ai, bi = np.nonzero(present)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sd = np.sqrt(ss / (n - 1))
+    cell_table = {
+        'factor_a': a_labels[ai].tolist(),
+        'factor_b': b_labels[bi].tolist(),
+        'Sample Size': n[ai, bi].tolist(),
+        'Mean': np.round(mean[ai, bi], 2).tolist(),
+        'SD': round_or_none(sd[ai, bi], 2),
+    }
+
+    return {
+        "post": False,
+        "pretest": anova_table,
+        "tables": [("各組描述統計", cell_table)],
+    }
+
+
+# 測試用資料：2 × 3 設計，各格人數不同（不平衡）
+def generate_two_way_test_data(seed=42):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i, a in enumerate(["A1", "A2"]):
+        for j, b in enumerate(["B1", "B2", "B3"]):
+            size = 10 + 5 * i + 3 * j
+            rows.append(pd.DataFrame({
+                "factor_a": a,
+                "factor_b": b,
+                "score": rng.normal(50 + 3 * i + 2 * j + 4 * i * j, 5, size=size),
+            }))
+    return pd.concat(rows, ignore_index=True)
+
+
+@register
+class TwoWayANOVA(statTest):
+    name = "twoWayAnova"
+    display_name = "二因子變異數分析"
+    result_prefix = "two_way_anova"
+    result_layout = "sections"
+    required_columns = ("factor_a", "factor_b", "score")
+    group_columns = ("factor_a", "factor_b")
+
+    def run(self, df: pd.DataFrame, resampling=None):
+        return SectionResult.of(two_way_anova(df, resampling))
+
+
+if __name__ == "__main__":
+    df = generate_two_way_test_data()
+    result = two_way_anova(df)
+
+    print(pd.DataFrame(result['pretest']))
+    for title, table in result['tables']:
+        print(title)
+        print(pd.DataFrame(table))
@@ -12,8 +12,17 @@ window.API_CONFIG = {
     independentTtest: "/ttest/independentTtest/upload",
     pairedTtest: "/ttest/pairedTtest/upload",
     anova: "/anova/anova/upload",
+    repeatedAnova: "/anova/repeatedAnova/upload",
+    twoWayAnova: "/anova/twoWayAnova/upload",
     download: "/stat/download",
-    downloadZip: "/stat/download_zip"
+    downloadZip: "/stat/download_zip",
+    // 非同步工作：submit 後以 status / result 輪詢
+    submit: "/stat/{test_name}/submit",
+    status: "/stat/status/",
+    result: "/stat/result/",
+    // 批次上傳：一次多個檔案，NDJSON 串流每個檔案的結果，最後以 batch_id 下載整批 zip
+    batch: "/stat/{test_name}/batch",
+    batchDownload: "/stat/batch/{batch_id}/download"
   }
 };
 